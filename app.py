@@ -69,75 +69,212 @@ def _():
 
     from pathlib import Path
 
-    from pandas import DataFrame
-    from sqlalchemy import create_engine
-
     from src import config
-    from src.extract import extract
-    from src.load import load
+    from src.cache import interactive_cache, shared_cache
+    from src.database import create_database_engine, get_database_path
+    from src.leaderboard import MAX_LEADERBOARD_SIZE, read_seller_leaderboard
+    from src.load import has_stale_money_columns
+    from src.pipeline import count_pipeline_steps, run_pipeline
     from src.plots import (
-        plot_freight_value_weight_relationship,
-        plot_global_amount_order_status,
-        plot_order_amount_per_day_with_holidays,
-        plot_real_vs_predicted_delivered_time,
-        plot_revenue_by_month_year,
+        get_plots_for_query,
+        plot_holiday_impact,
+        plot_revenue_by_month,
+        plot_revenue_per_category,
         plot_revenue_per_state,
-        plot_top_10_least_revenue_categories,
-        plot_top_10_revenue_categories,
-        plot_top_10_revenue_categories_amount,
+        plot_seller_leaderboard,
+        render_figures,
+    )
+    from src.snapshot import load_snapshot
+    from src.transform import (
+        FilteredQueryEnum,
+        QueryEnum,
+        QueryFilters,
+        get_filter_options,
+        read_order_volume,
+        read_public_holidays,
+        run_filtered_queries,
     )
-    from src.transform import QueryEnum, run_queries
+    from src.utils.fingerprint import get_database_fingerprint
     return (
-        DataFrame,
+        FilteredQueryEnum,
+        MAX_LEADERBOARD_SIZE,
         Path,
         QueryEnum,
+        QueryFilters,
         config,
-        create_engine,
-        extract,
-        load,
-        plot_freight_value_weight_relationship,
-        plot_global_amount_order_status,
-        plot_order_amount_per_day_with_holidays,
-        plot_real_vs_predicted_delivered_time,
-        plot_revenue_by_month_year,
+        count_pipeline_steps,
+        create_database_engine,
+        get_database_fingerprint,
+        get_database_path,
+        get_filter_options,
+        get_plots_for_query,
+        has_stale_money_columns,
+        interactive_cache,
+        load_snapshot,
+        plot_holiday_impact,
+        plot_revenue_by_month,
+        plot_revenue_per_category,
         plot_revenue_per_state,
-        plot_top_10_least_revenue_categories,
-        plot_top_10_revenue_categories,
-        plot_top_10_revenue_categories_amount,
-        run_queries,
+        plot_seller_leaderboard,
+        read_order_volume,
+        read_public_holidays,
+        read_seller_leaderboard,
+        render_figures,
+        run_filtered_queries,
+        run_pipeline,
+        shared_cache,
     )
 
 
 @app.cell
-def _(DataFrame, Path, config, create_engine, extract, load, run_queries):
-    # 📌 LOAD SQLITE DATABASE
-
-    DB_PATH = Path(config.SQLITE_DB_ABSOLUTE_PATH)
-
-    if DB_PATH.exists() and DB_PATH.stat().st_size > 0:
-        print("Database found. Skipping ETL process.")
-        ENGINE = create_engine(f"sqlite:///{DB_PATH}", echo=False)
-    else:
-        print("Database not found or empty. Starting ETL process...")
-        ENGINE = create_engine(f"sqlite:///{DB_PATH}", echo=False)
-
-        csv_dataframes = extract(
-            csv_folder=config.DATASET_ROOT_PATH,
-            csv_table_mapping=config.get_csv_to_table_mapping(),
-            public_holidays_url=config.PUBLIC_HOLIDAYS_URL,
+def _(
+    Path,
+    config,
+    create_database_engine,
+    get_database_fingerprint,
+    get_database_path,
+    has_stale_money_columns,
+    load_snapshot,
+    mo,
+    shared_cache,
+):
+    # 📌 LOAD DASHBOARD SNAPSHOT
+
+    DB_PATH = Path(get_database_path())
+    DB_READY = DB_PATH.exists() and DB_PATH.stat().st_size > 0
+    if DB_READY:
+        # A database that stores the money as reais is loaded again, its loads have
+        # no pipeline keys of the current format to compare with
+        _engine = create_database_engine(str(DB_PATH))
+        DB_READY = not has_stale_money_columns(_engine)
+        _engine.dispose()
+
+    # Every session of the process shares the dashboard of a database version
+    dashboard_key = (
+        "dashboard",
+        get_database_fingerprint(str(DB_PATH)) if DB_READY else None,
+    )
+    dashboard = shared_cache.get(dashboard_key)
+
+    if dashboard is None and DB_READY:
+        snapshot = load_snapshot(
+            database_path=str(DB_PATH), snapshot_folder=config.SNAPSHOT_ROOT_PATH
         )
+        if snapshot is not None:
+            dashboard = (snapshot.query_results, snapshot.figures)
+            shared_cache.put(dashboard_key, dashboard)
+
+    # Query results and figures are published here as soon as they are ready
+    get_query_results, set_query_results = mo.state(
+        dashboard[0] if dashboard is not None else {}
+    )
+    get_figures, set_figures = mo.state(dashboard[1] if dashboard is not None else {})
+    return (
+        DB_PATH,
+        DB_READY,
+        dashboard,
+        dashboard_key,
+        get_figures,
+        get_query_results,
+        set_figures,
+        set_query_results,
+    )
 
-        load(dataframes=csv_dataframes, database=ENGINE)
-        print("ETL process complete.")
 
-    query_results: dict[str, DataFrame] = run_queries(database=ENGINE)
-    return (query_results,)
+@app.cell
+def _(
+    DB_PATH,
+    DB_READY,
+    QueryEnum,
+    config,
+    count_pipeline_steps,
+    create_database_engine,
+    dashboard,
+    dashboard_key,
+    get_database_fingerprint,
+    get_plots_for_query,
+    mo,
+    render_figures,
+    run_pipeline,
+    set_figures,
+    set_query_results,
+    shared_cache,
+):
+    # 📌 RUN THE PIPELINE IN THE BACKGROUND
+
+    def build_dashboard():
+        engine = create_database_engine(str(DB_PATH))
+        query_results, figures = {}, {}
+
+        with mo.status.progress_bar(
+            total=count_pipeline_steps(
+                not DB_READY, config.get_csv_to_table_mapping(), config.ENCODE_IDS
+            ),
+            title="Running queries..." if DB_READY else "Running ETL process...",
+            completion_title="Dashboard ready.",
+            show_eta=False,
+            remove_on_exit=True,
+        ) as bar:
+
+            def report(progress):
+                bar.update(
+                    subtitle=f"{progress.stage.title()}: {progress.name} ({progress.rows:,} rows)"
+                )
+
+            def publish(query_result):
+                query_results[query_result.query] = query_result.result
+                figures.update(
+                    render_figures(
+                        {query_result.query: query_result.result},
+                        plots=get_plots_for_query(QueryEnum(query_result.query)),
+                    )
+                )
+                set_query_results(dict(query_results))
+                set_figures(dict(figures))
+
+            run_pipeline(
+                database=engine,
+                run_etl=not DB_READY,
+                csv_folder=config.DATASET_ROOT_PATH,
+                csv_table_mapping=config.get_csv_to_table_mapping(),
+                public_holidays_url=config.PUBLIC_HOLIDAYS_URL,
+                on_progress=report,
+                on_result=publish,
+                chunk_size=config.ETL_CHUNK_SIZE,
+                encode_ids=config.ENCODE_IDS,
+            )
+
+        engine.dispose()
+        return query_results, figures
+
+    def run_pipeline_in_background():
+        # Concurrent sessions wait here on the session that builds the dashboard
+        query_results, figures = shared_cache.get_or_compute(
+            dashboard_key, build_dashboard
+        )
+        set_query_results(query_results)
+        set_figures(figures)
+
+        # The ETL created the database, or the pipeline built the materializations
+        # it was missing, later sessions look it up by its new content
+        fingerprint = get_database_fingerprint(str(DB_PATH))
+        if ("dashboard", fingerprint) != dashboard_key:
+            shared_cache.put(("dashboard", fingerprint), (query_results, figures))
+
+    if dashboard is None:
+        mo.Thread(target=run_pipeline_in_background, daemon=True).start()
+    return
 
 
 @app.cell
-def _(QueryEnum, query_results: "dict[str, DataFrame]"):
+def _(QueryEnum, get_query_results, mo):
     # 📌 RETRIEVE RELEVANT DATA FROM DATABASE
 
+    query_results = get_query_results()
+
+    # Insights and tables need every query, the charts below render progressively
+    mo.stop(len(query_results) < len(QueryEnum))
+
     revenue_by_month_year = query_results[QueryEnum.REVENUE_BY_MONTH_YEAR.value]
 
     top_10_revenue_categories = query_results[
@@ -303,33 +440,22 @@ def _(mo):
 
 
 @app.cell
-def _(
-    freight_value_weight_relationship,
-    global_amount_order_status,
-    mo,
-    orders_per_day_and_holidays,
-    plot_freight_value_weight_relationship,
-    plot_global_amount_order_status,
-    plot_order_amount_per_day_with_holidays,
-    plot_real_vs_predicted_delivered_time,
-    plot_revenue_by_month_year,
-    plot_revenue_per_state,
-    plot_top_10_least_revenue_categories,
-    plot_top_10_revenue_categories,
-    plot_top_10_revenue_categories_amount,
-    real_vs_estimated_delivery_time,
-    revenue_by_month_year,
-    revenue_per_state,
-    top_10_least_revenue_categories,
-    top_10_revenue_categories,
-):
+def _(get_figures, mo):
+    figures = get_figures()
+
+    def show(figure_name):
+        # Each figure appears as soon as the query feeding it completes
+        if figure_name in figures:
+            return figures[figure_name]
+        return mo.md("⏳ *Loading...*")
+
     overview_tab = mo.vstack(
         align="center",
         justify="center",
         gap=2,
         items=[
             mo.center(mo.md("## Global Order Status Overview")),
-            plot_global_amount_order_status(df=global_amount_order_status),
+            show("global_amount_order_status"),
         ],
     )
 
@@ -339,9 +465,9 @@ def _(
         gap=2,
         items=[
             mo.center(mo.md("## Revenue by Month and Year")),
-            plot_revenue_by_month_year(df=revenue_by_month_year, year=2017),
+            show("revenue_by_month_year"),
             mo.center(mo.md("## Revenue by State")),
-            plot_revenue_per_state(revenue_per_state),
+            show("revenue_per_state"),
         ],
     )
 
@@ -351,11 +477,11 @@ def _(
         gap=2,
         items=[
             mo.center(mo.md("## Top 10 Revenue Categories")),
-            plot_top_10_revenue_categories(top_10_revenue_categories),
+            show("top_10_revenue_categories"),
             mo.center(mo.md("## Top 10 Revenue Categories by Amount")),
-            plot_top_10_revenue_categories_amount(top_10_revenue_categories),
+            show("top_10_revenue_categories_amount"),
             mo.center(mo.md("## Bottom 10 Revenue Categories")),
-            plot_top_10_least_revenue_categories(top_10_least_revenue_categories),
+            show("top_10_least_revenue_categories"),
         ],
     )
 
@@ -366,28 +492,41 @@ def _(
         heights="equal",
         items=[
             mo.center(mo.md("## Real vs Estimated Delivery Time")),
-            plot_real_vs_predicted_delivered_time(
-                df=real_vs_estimated_delivery_time, year=2017
-            ),
+            show("real_vs_predicted_delivered_time"),
             mo.center(mo.md("## Freight Value vs Product Weight")),
-            plot_freight_value_weight_relationship(
-                freight_value_weight_relationship
-            ),
+            show("freight_value_weight_relationship"),
+            mo.center(mo.md("## Freight Value vs Distance")),
+            show("freight_value_distance_relationship"),
             mo.center(mo.md("## Orders and Holidays")),
-            plot_order_amount_per_day_with_holidays(orders_per_day_and_holidays),
+            show("order_amount_per_day_with_holidays"),
+            mo.center(mo.md("## Orders around the Holidays")),
+            show("holiday_impact"),
+        ],
+    )
+
+    customers_tab = mo.vstack(
+        align="center",
+        justify="center",
+        gap=2,
+        items=[
+            mo.center(mo.md("## Customer RFM Segments")),
+            show("customer_rfm_segments"),
+            mo.center(mo.md("## Monthly Cohort Retention")),
+            show("customer_cohort_retention"),
         ],
     )
-    return categories_tab, delivery_tab, overview_tab, revenue_tab
+    return categories_tab, customers_tab, delivery_tab, overview_tab, revenue_tab
 
 
 @app.cell
-def _(categories_tab, delivery_tab, mo, overview_tab, revenue_tab):
+def _(categories_tab, customers_tab, delivery_tab, mo, overview_tab, revenue_tab):
     mo.ui.tabs(
         {
             "📊 Overview": overview_tab,
             "💰 Revenue": revenue_tab,
             "📦 Categories": categories_tab,
             "🚚 Freight & Delivery": delivery_tab,
+            "👥 Customers": customers_tab,
         }
     )
     return
@@ -399,6 +538,249 @@ def _(mo):
     return
 
 
+@app.cell
+def _(mo):
+    mo.md(r"""# 🔎 Explore""")
+    return
+
+
+@app.cell
+def _(
+    DB_PATH,
+    QueryEnum,
+    create_database_engine,
+    get_database_fingerprint,
+    get_filter_options,
+    get_query_results,
+    mo,
+    shared_cache,
+):
+    # 📌 FILTER CONTROLS
+
+    # The filters query the database, so they wait for the pipeline to finish
+    mo.stop(len(get_query_results()) < len(QueryEnum))
+
+    ENGINE = create_database_engine(str(DB_PATH))
+    DB_FINGERPRINT = get_database_fingerprint(str(DB_PATH))
+
+    filter_options = shared_cache.get_or_compute(
+        ("filter_options", DB_FINGERPRINT), lambda: get_filter_options(ENGINE)
+    )
+
+    year_range = mo.ui.range_slider(
+        start=min(filter_options.years),
+        stop=max(filter_options.years),
+        step=1,
+        value=[min(filter_options.years), max(filter_options.years)],
+        debounce=True,
+        show_value=True,
+        label="Years",
+    )
+    state_filter = mo.ui.multiselect(
+        options=filter_options.states, label="States (all if empty)"
+    )
+    category_filter = mo.ui.multiselect(
+        options=filter_options.categories, label="Categories (all if empty)"
+    )
+
+    mo.hstack([year_range, state_filter, category_filter], justify="center", gap=2)
+    return DB_FINGERPRINT, ENGINE, category_filter, state_filter, year_range
+
+
+@app.cell
+def _(
+    DB_FINGERPRINT,
+    ENGINE,
+    FilteredQueryEnum,
+    QueryFilters,
+    category_filter,
+    interactive_cache,
+    mo,
+    plot_revenue_by_month,
+    plot_revenue_per_category,
+    plot_revenue_per_state,
+    run_filtered_queries,
+    state_filter,
+    year_range,
+):
+    # 📌 FILTERED CHARTS
+
+    filters = QueryFilters(
+        start_year=year_range.value[0],
+        end_year=year_range.value[1],
+        states=tuple(sorted(state_filter.value)),
+        categories=tuple(sorted(category_filter.value)),
+    )
+
+    def render_filtered_figures():
+        results = run_filtered_queries(database=ENGINE, filters=filters)
+        return {
+            "revenue_by_month": plot_revenue_by_month(
+                results[FilteredQueryEnum.FILTERED_REVENUE_BY_MONTH.value]
+            ),
+            "revenue_per_state": plot_revenue_per_state(
+                results[FilteredQueryEnum.FILTERED_REVENUE_PER_STATE.value]
+            ),
+            "revenue_per_category": plot_revenue_per_category(
+                results[FilteredQueryEnum.FILTERED_REVENUE_PER_CATEGORY.value]
+            ),
+        }
+
+    # Filter values seen before, in any session, are served from the cache
+    filtered_figures = interactive_cache.get_or_compute(
+        ("filtered", DB_FINGERPRINT, filters), render_filtered_figures
+    )
+
+    mo.vstack(
+        align="center",
+        justify="center",
+        gap=2,
+        items=[
+            mo.center(mo.md("## Revenue by Month")),
+            filtered_figures["revenue_by_month"],
+            mo.center(mo.md("## Revenue by State")),
+            filtered_figures["revenue_per_state"],
+            mo.center(mo.md("## Revenue by Category")),
+            filtered_figures["revenue_per_category"],
+        ],
+    )
+    return
+
+
+@app.cell
+def _(MAX_LEADERBOARD_SIZE, mo):
+    # 📌 SELLER LEADERBOARD CONTROLS
+
+    leaderboard_size = mo.ui.slider(
+        start=5,
+        stop=MAX_LEADERBOARD_SIZE,
+        step=5,
+        value=10,
+        show_value=True,
+        label="Sellers",
+    )
+
+    mo.vstack(
+        align="center",
+        gap=1,
+        items=[mo.center(mo.md("## Seller Leaderboard")), leaderboard_size],
+    )
+    return (leaderboard_size,)
+
+
+@app.cell
+def _(
+    DB_FINGERPRINT,
+    ENGINE,
+    interactive_cache,
+    leaderboard_size,
+    mo,
+    plot_seller_leaderboard,
+    read_seller_leaderboard,
+):
+    # 📌 SELLER LEADERBOARD
+
+    def render_leaderboard(direction):
+        # Only the sellers shown are read from the leaderboard, whatever their number
+        sellers = read_seller_leaderboard(ENGINE, leaderboard_size.value, direction)
+        if sellers.empty:
+            # Reading never builds it, that would change the database of the snapshot
+            return sellers, mo.callout(
+                mo.md(
+                    "The seller leaderboard is not built yet, run the pipeline or "
+                    "`python -m src.snapshot`."
+                ),
+                kind="warn",
+            )
+        return sellers, plot_seller_leaderboard(sellers)
+
+    leaderboard_tabs = {}
+    for leaderboard_title, leaderboard_direction in (
+        ("🔝 Top Sellers", "top"),
+        ("🔻 Bottom Sellers", "bottom"),
+    ):
+        leaderboard, leaderboard_figure = interactive_cache.get_or_compute(
+            (
+                "seller_leaderboard",
+                DB_FINGERPRINT,
+                leaderboard_direction,
+                leaderboard_size.value,
+            ),
+            lambda direction=leaderboard_direction: render_leaderboard(direction),
+        )
+        leaderboard_tabs[leaderboard_title] = mo.vstack(
+            align="center",
+            justify="center",
+            gap=2,
+            items=[leaderboard_figure, leaderboard],
+        )
+
+    mo.ui.tabs(leaderboard_tabs)
+    return
+
+
+@app.cell
+def _(config, mo):
+    # 📌 HOLIDAY WINDOW CONTROLS
+
+    holiday_window = mo.ui.slider(
+        start=0,
+        stop=14,
+        step=1,
+        value=config.HOLIDAY_WINDOW_DAYS,
+        debounce=True,
+        show_value=True,
+        label="Days before and after each holiday",
+    )
+
+    mo.vstack(
+        align="center",
+        gap=1,
+        items=[mo.center(mo.md("## Orders around the Holidays")), holiday_window],
+    )
+    return (holiday_window,)
+
+
+@app.cell
+def _(
+    DB_FINGERPRINT,
+    ENGINE,
+    holiday_window,
+    interactive_cache,
+    mo,
+    plot_holiday_impact,
+    read_order_volume,
+    read_public_holidays,
+    shared_cache,
+):
+    # 📌 HOLIDAY IMPACT
+
+    # The orders per day are read once, each window is compared once per holiday set
+    order_volume, public_holidays = shared_cache.get_or_compute(
+        ("order_volume", DB_FINGERPRINT),
+        lambda: (read_order_volume(ENGINE), read_public_holidays(ENGINE)),
+    )
+    holiday_impact = order_volume.holiday_impact(public_holidays, holiday_window.value)
+    holiday_impact_figure = interactive_cache.get_or_compute(
+        ("holiday_impact", DB_FINGERPRINT, holiday_window.value),
+        lambda: plot_holiday_impact(holiday_impact),
+    )
+
+    mo.vstack(
+        align="center",
+        justify="center",
+        gap=2,
+        items=[holiday_impact_figure, holiday_impact],
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.Html("<br><hr><br>")
+    return
+
+
 @app.cell
 def _(mo):
     mo.md(r"""# 📋 Tables""")
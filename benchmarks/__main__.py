@@ -0,0 +1,307 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from benchmarks.holidays_stub import serve_public_holidays
+from src import config
+from src.compaction import compact_geolocation
+from src.database import BACKENDS, create_database_engine
+from src.extract import extract
+from src.load import load
+from src.materializations import build_materializations
+from src.plots import (
+    PlotSpec,
+    get_all_plots,
+    plot_delivery_date_difference,
+    plot_revenue_by_month,
+    plot_revenue_per_category,
+)
+from src.synthetic import generate_dataset
+from src.transform import (
+    FilteredQueryEnum,
+    QueryEnum,
+    QueryFilters,
+    get_filter_options,
+    get_query_implementations,
+    query_filtered_revenue_by_month,
+    query_filtered_revenue_per_category,
+    query_filtered_revenue_per_state,
+)
+from src.utils.profiling import StageStats, format_stage_report, measure_stage
+
+RESULTS_VERSION = 1
+
+
+def get_benchmark_plots() -> list[PlotSpec]:
+    """
+    Get every plot function of src.plots with the query that feeds it
+
+    Returns:
+        list[PlotSpec]: The dashboard plots, followed by the plots that are not in get_all_plots
+    """
+    return get_all_plots() + [
+        PlotSpec(
+            name="delivery_date_difference",
+            query=QueryEnum.DELIVERY_DATE_DIFFERENCE,
+            plot=plot_delivery_date_difference,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="revenue_by_month",
+            query=FilteredQueryEnum.FILTERED_REVENUE_BY_MONTH,
+            plot=plot_revenue_by_month,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="revenue_per_category",
+            query=FilteredQueryEnum.FILTERED_REVENUE_PER_CATEGORY,
+            plot=plot_revenue_per_category,
+            kwargs={},
+        ),
+    ]
+
+
+def run_once(
+    csv_folder: str,
+    public_holidays_url: str,
+    database_path: Path,
+    backend: str = config.DATABASE_BACKEND,
+) -> list[StageStats]:
+    """
+    Run every stage once against a fresh database
+
+    Args:
+        csv_folder (str): The folder where the csv files are
+        public_holidays_url (str): The url to get the public holidays
+        database_path (Path): The database file, replaced if it exists
+        backend (str, optional): The storage backend. Defaults to config.DATABASE_BACKEND
+
+    Returns:
+        list[StageStats]: The stats of extract, compact, load, each query and each plot
+    """
+    database_path.unlink(missing_ok=True)
+    engine = create_database_engine(str(database_path), backend)
+    report = []
+
+    with measure_stage("extract") as stats:
+        dataframes = extract(
+            csv_folder=csv_folder,
+            csv_table_mapping=config.get_csv_to_table_mapping(),
+            public_holidays_url=public_holidays_url,
+        )
+        stats.rows = sum(len(dataframe) for dataframe in dataframes.values())
+    report.append(stats)
+
+    with measure_stage("compact") as stats:
+        dataframes = dict(compact_geolocation(dataframes.items()))
+        stats.rows = sum(len(dataframe) for dataframe in dataframes.values())
+    report.append(stats)
+
+    with measure_stage("load") as stats:
+        load(dataframes=dataframes, database=engine)
+        stats.rows = sum(len(dataframe) for dataframe in dataframes.values())
+    report.append(stats)
+    del dataframes
+
+    # The aggregates the filtered queries read, the sketches and the leaderboard
+    with measure_stage("materialize") as stats:
+        stats.rows = len(build_materializations(engine))
+    report.append(stats)
+
+    query_results = {}
+    queries = []
+    # The alternative implementations are timed too, as query:<name>:<implementation>
+    for name, implementations in get_query_implementations().items():
+        for index, (implementation_name, query) in enumerate(implementations.items()):
+            queries.append(
+                (name if index == 0 else f"{name}:{implementation_name}", query)
+            )
+
+    # The filtered queries run without filters, the same work as the dashboard default
+    years = get_filter_options(engine).years
+    filters = QueryFilters(min(years), max(years), (), ())
+    for query in [
+        query_filtered_revenue_by_month,
+        query_filtered_revenue_per_state,
+        query_filtered_revenue_per_category,
+    ]:
+        queries.append(
+            (
+                query.__name__.removeprefix("query_"),
+                lambda database, query=query: query(database, filters),
+            )
+        )
+
+    for name, query in queries:
+        with measure_stage(f"query:{name}") as stats:
+            query_result = query(engine)
+            stats.rows = len(query_result.result)
+        query_results[query_result.query] = query_result.result
+        report.append(stats)
+
+    for spec in get_benchmark_plots():
+        dataframe = query_results[spec.query.value]
+        with measure_stage(f"plot:{spec.name}") as stats:
+            figure = spec.plot(dataframe, **spec.kwargs)
+            stats.rows = len(dataframe)
+        if isinstance(figure, Figure):
+            plt.close(figure)
+        report.append(stats)
+
+    engine.dispose()
+    return report
+
+
+def summarize(runs: list[list[StageStats]]) -> dict[str, dict]:
+    """
+    Summarize the repeated runs of each stage
+
+    Args:
+        runs (list[list[StageStats]]): The stats returned by run_once for each run
+
+    Returns:
+        dict[str, dict]: The raw and median measures, keyed by stage name
+    """
+    stages = {}
+
+    for run in runs:
+        for stats in run:
+            stage = stages.setdefault(
+                stats.stage, {"rows": stats.rows, "seconds": [], "peak_rss_mb": []}
+            )
+            stage["seconds"].append(stats.seconds)
+            stage["peak_rss_mb"].append(stats.peak_rss_mb)
+
+    for stage in stages.values():
+        stage["median_seconds"] = statistics.median(stage["seconds"])
+        stage["max_peak_rss_mb"] = max(stage["peak_rss_mb"])
+        stage["rows_per_second"] = (
+            stage["rows"] / stage["median_seconds"]
+            if stage["median_seconds"] > 0
+            else 0.0
+        )
+
+    return stages
+
+
+def get_commit() -> str | None:
+    """
+    Get the commit being benchmarked
+
+    Returns:
+        str | None: The hash of HEAD, None outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time extract, load, every query and every plot, fully offline",
+    )
+    dataset = parser.add_mutually_exclusive_group()
+    dataset.add_argument(
+        "--csv-folder",
+        default=config.DATASET_ROOT_PATH,
+        help="The folder where the csv files are",
+    )
+    dataset.add_argument(
+        "--scale-factor",
+        type=float,
+        help="Benchmark a synthetic dataset of this scale factor instead",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=config.DATABASE_BACKEND,
+        help="The storage backend of the database",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="The seed of the synthetic dataset"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs")
+    parser.add_argument(
+        "--output",
+        default="benchmark_results.json",
+        help="The json file where the results are written",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Run the benchmarks, print the median of each stage and write the results file
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+    """
+    args = parse_args(argv)
+
+    with (
+        tempfile.TemporaryDirectory() as work_folder,
+        serve_public_holidays() as public_holidays_url,
+    ):
+        csv_folder = args.csv_folder
+        if args.scale_factor is not None:
+            csv_folder = str(Path(work_folder) / "dataset")
+            generate_dataset(csv_folder, scale_factor=args.scale_factor, seed=args.seed)
+
+        database_path = Path(work_folder) / "benchmark.db"
+        runs = [
+            run_once(csv_folder, public_holidays_url, database_path, args.backend)
+            for _ in range(args.repeat)
+        ]
+
+    stages = summarize(runs)
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dataset": {
+            "csv_folder": None if args.scale_factor is not None else args.csv_folder,
+            "scale_factor": args.scale_factor,
+            "seed": args.seed if args.scale_factor is not None else None,
+        },
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "stages": stages,
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2))
+
+    medians = []
+    for name, stage in stages.items():
+        stats = StageStats(name)
+        stats.seconds = stage["median_seconds"]
+        stats.peak_rss_mb = stage["max_peak_rss_mb"]
+        stats.rows = stage["rows"]
+        medians.append(stats)
+
+    print(format_stage_report(medians))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
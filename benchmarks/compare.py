@@ -0,0 +1,71 @@
+import argparse
+import json
+from pathlib import Path
+
+
+def compare(baseline: dict, candidate: dict) -> str:
+    """
+    Compare the median wall time and peak memory of two benchmark results
+
+    Args:
+        baseline (dict): The results file of the reference commit
+        candidate (dict): The results file of the commit being compared
+
+    Returns:
+        str: A table with one line per stage, ratios below 1 are improvements
+    """
+    header = (
+        f"{'stage':<48}{'baseline (s)':>14}{'candidate (s)':>15}{'ratio':>8}"
+        f"{'baseline (MiB)':>16}{'candidate (MiB)':>17}"
+    )
+    lines = [header, "-" * len(header)]
+
+    for name, stage in candidate["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            lines.append(
+                f"{name:<48}{'-':>14}{stage['median_seconds']:>15.3f}{'-':>8}{'-':>16}{stage['max_peak_rss_mb']:>17.1f}"
+            )
+            continue
+
+        ratio = (
+            stage["median_seconds"] / reference["median_seconds"]
+            if reference["median_seconds"] > 0
+            else float("inf")
+        )
+        lines.append(
+            f"{name:<48}"
+            f"{reference['median_seconds']:>14.3f}"
+            f"{stage['median_seconds']:>15.3f}"
+            f"{ratio:>8.2f}"
+            f"{reference['max_peak_rss_mb']:>16.1f}"
+            f"{stage['max_peak_rss_mb']:>17.1f}"
+        )
+
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Print the comparison of two results files written by python -m benchmarks
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Compare two benchmark results files",
+    )
+    parser.add_argument("baseline", help="The results file of the reference commit")
+    parser.add_argument(
+        "candidate", help="The results file of the commit being compared"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    candidate = json.loads(Path(args.candidate).read_text())
+    print(compare(baseline, candidate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import re
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+# The Brazilian public holidays of 2017 as returned by date.nager.at, the month and
+# day are reused for any other year
+PUBLIC_HOLIDAYS_2017 = [
+    ("01-01", "Confraternização Universal", "New Year's Day", None),
+    ("02-28", "Carnaval", "Carnival", None),
+    ("04-14", "Sexta-feira Santa", "Good Friday", None),
+    ("04-16", "Domingo de Páscoa", "Easter Sunday", None),
+    ("04-21", "Dia de Tiradentes", "Tiradentes", None),
+    ("05-01", "Dia do Trabalhador", "Labour Day", None),
+    ("06-15", "Corpus Christi", "Corpus Christi", None),
+    (
+        "07-09",
+        "Revolução Constitucionalista de 1932",
+        "Constitutionalist Revolution of 1932",
+        ["BR-SP"],
+    ),
+    ("09-07", "Dia da Independência", "Independence Day", None),
+    ("10-12", "Nossa Senhora Aparecida", "Our Lady of Aparecida", None),
+    ("11-02", "Dia de Finados", "All Souls' Day", None),
+    ("11-15", "Proclamação da República", "Republic Proclamation Day", None),
+    (
+        "11-20",
+        "Dia da Consciência Negra",
+        "Black Consciousness Day",
+        ["BR-AL", "BR-AM", "BR-AP", "BR-MT", "BR-RJ", "BR-RS", "BR-SP"],
+    ),
+    ("12-25", "Natal", "Christmas Day", None),
+]
+
+PATH_PATTERN = re.compile(r"^/api/v3/publicholidays/(\d{4})/BR$", re.IGNORECASE)
+
+
+def get_public_holidays_payload(year: int) -> list[dict]:
+    """
+    Build the json body of the public holidays endpoint for Brazil
+
+    Args:
+        year (int): The year of the holidays
+
+    Returns:
+        list[dict]: The holidays, with the same fields as date.nager.at
+    """
+    return [
+        {
+            "date": f"{year}-{month_day}",
+            "localName": local_name,
+            "name": name,
+            "countryCode": "BR",
+            "fixed": False,
+            "global": counties is None,
+            "counties": counties,
+            "launchYear": None,
+            "types": ["Public"],
+        }
+        for month_day, local_name, name, counties in PUBLIC_HOLIDAYS_2017
+    ]
+
+
+class PublicHolidaysHandler(BaseHTTPRequestHandler):
+    """Answer GET /api/v3/publicholidays/<year>/BR like date.nager.at"""
+
+    def do_GET(self) -> None:
+        match = PATH_PATTERN.match(self.path)
+        if match is None:
+            self.send_error(404)
+            return
+
+        body = json.dumps(get_public_holidays_payload(int(match.group(1)))).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the benchmark output clean
+        pass
+
+
+@contextmanager
+def serve_public_holidays() -> Iterator[str]:
+    """
+    Serve the public holidays on a free local port for the duration of the block
+
+    Yields:
+        str: The url to pass as public_holidays_url to extract
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PublicHolidaysHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/api/v3/publicholidays"
+    finally:
+        server.shutdown()
+        server.server_close()
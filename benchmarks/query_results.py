@@ -0,0 +1,128 @@
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from src import config
+from src.extract import extract
+from src.load import load
+from src.synthetic import generate_dataset
+from src.transform import QueryEnum, run_queries
+
+# The category queries changed when the payments were shared between the categories
+CATEGORY_QUERIES = [
+    QueryEnum.TOP_10_REVENUE_CATEGORIES.value,
+    QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value,
+]
+# The folder of the query results of the synthetic dataset used by the tests
+SYNTHETIC_QUERY_RESULTS_PATH = str(Path(config.QUERY_RESULTS_ROOT_PATH) / "synthetic")
+SYNTHETIC_SCALE_FACTOR = 0.01
+
+
+def write_query_results(
+    csv_folder: str,
+    output_folder: str,
+    query_names: list[str],
+    public_holidays_url: str | None = None,
+) -> list[str]:
+    """
+    Write the json file of each query, from a dataset and the current SQL
+
+    Args:
+        csv_folder (str): The folder where the csv files are
+        output_folder (str): The folder where the json files are written
+        query_names (list[str]): The queries to write, named after their QueryEnum value
+        public_holidays_url (str, optional): The url to get the public holidays.
+            Defaults to None, only the holidays query needs them
+
+    Returns:
+        list[str]: The paths of the files written
+    """
+    engine = create_engine("sqlite://")
+    load(
+        dataframes=extract(
+            csv_folder, config.get_csv_to_table_mapping(), public_holidays_url
+        ),
+        database=engine,
+    )
+    query_results = run_queries(engine, queries=query_names)
+    engine.dispose()
+
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    paths = []
+    for query_name, result in query_results.items():
+        path = Path(output_folder) / f"{query_name}.json"
+        with open(path, "w") as file:
+            json.dump(json.loads(result.to_json(orient="records")), file, indent=2)
+            file.write("\n")
+        paths.append(str(path))
+    return paths
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Regenerate the json files the tests compare the query results against
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.query_results",
+        description="Regenerate the query result files of tests/query_results",
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Use the synthetic dataset of the tests instead of the csv folder, and "
+        f"write into {SYNTHETIC_QUERY_RESULTS_PATH} by default",
+    )
+    parser.add_argument(
+        "--csv-folder",
+        default=config.DATASET_ROOT_PATH,
+        help="The folder where the csv files are",
+    )
+    parser.add_argument(
+        "--output",
+        help="The folder where the json files are written. Defaults to "
+        f"{config.QUERY_RESULTS_ROOT_PATH}",
+    )
+    parser.add_argument(
+        "--queries",
+        nargs="+",
+        choices=[query.value for query in QueryEnum],
+        default=CATEGORY_QUERIES,
+        metavar="QUERY",
+        help="The queries to write, named after their QueryEnum value. Defaults to the "
+        "category queries",
+    )
+    parser.add_argument(
+        "--public-holidays-url",
+        help="The url to get the public holidays, e.g. "
+        f"{config.PUBLIC_HOLIDAYS_URL}. Only the holidays query needs them",
+    )
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as folder:
+            generate_dataset(folder, scale_factor=SYNTHETIC_SCALE_FACTOR)
+            paths = write_query_results(
+                folder,
+                args.output or SYNTHETIC_QUERY_RESULTS_PATH,
+                args.queries,
+                args.public_holidays_url,
+            )
+    else:
+        paths = write_query_results(
+            args.csv_folder,
+            args.output or config.QUERY_RESULTS_ROOT_PATH,
+            args.queries,
+            args.public_holidays_url,
+        )
+    for path in paths:
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
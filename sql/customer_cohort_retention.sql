@@ -0,0 +1,54 @@
+-- Counts the customers of each monthly cohort ordering in each month
+--
+-- It will have different columns:
+-- 1. cohort, the month of the first order of the customers, as months since year 0
+-- 2. month, a month they ordered in, as months since year 0
+-- 3. customers, the number of customers of the cohort ordering that month
+--
+-- Explanation step by step:
+-- 1. Calculate the months each customer (customer_unique_id) ordered in, once per month
+-- 2. Find the first of them, the cohort of the customer, with a window over the customer
+-- 3. Group the months by cohort and month
+--
+-- src.customers.summarize_cohorts turns the counts into retention rates.
+-- Only the delivered orders with payments count, like in the RFM segments.
+WITH
+    customer_months AS (
+        SELECT DISTINCT
+            oc.customer_unique_id,
+            CAST(STRFTIME ('%Y', oo.order_purchase_timestamp) AS INTEGER) * 12 + CAST(STRFTIME ('%m', oo.order_purchase_timestamp) AS INTEGER) - 1 AS month
+        FROM
+            olist_orders oo
+            JOIN olist_customers oc ON oo.customer_id = oc.customer_id
+        WHERE
+            oo.order_status = 'delivered'
+            AND oo.order_delivered_customer_date IS NOT NULL
+            AND oo.order_id IN (
+                SELECT
+                    order_id
+                FROM
+                    olist_order_payments
+            )
+    ),
+    cohorts AS (
+        SELECT
+            MIN(month) OVER (
+                PARTITION BY
+                    customer_unique_id
+            ) AS cohort,
+            month
+        FROM
+            customer_months
+    )
+SELECT
+    cohort,
+    month,
+    COUNT(*) AS customers
+FROM
+    cohorts
+GROUP BY
+    cohort,
+    month
+ORDER BY
+    cohort,
+    month;
@@ -0,0 +1,86 @@
+-- Counts the customers of each recency and frequency score, for the RFM segments
+--
+-- It will have different columns:
+-- 1. r_score, the recency quintile of the customers, 5 for the most recent
+-- 2. f_score, their number of orders, up to 5
+-- 3. customers, the number of customers with these scores
+-- 4. recency, frequency and monetary, the totals of their days since the last
+--    order, orders and payments
+--
+-- Explanation step by step:
+-- 1. Calculate the payments of each order, once per order
+-- 2. Calculate the last order, number of orders and payments of each customer
+--    (customer_unique_id, a customer_id is only used for one order)
+-- 3. Calculate the days from the last order of each customer to the last order of all
+-- 4. Rank the customers by recency, the customers with the same recency get the rank
+--    of the last of them, and turn the ranks into quintiles with integer arithmetic
+-- 5. Group the customers by scores
+--
+-- src.customers.summarize_rfm_scores maps the scores to the segments.
+-- The payments are stored as integer cents, the totals stay in cents.
+WITH
+    order_payments AS (
+        SELECT
+            oop.order_id,
+            SUM(oop.payment_value) AS payment_value
+        FROM
+            olist_order_payments oop
+        GROUP BY
+            oop.order_id
+    ),
+    customers AS (
+        SELECT
+            MAX(CAST(STRFTIME ('%s', oo.order_purchase_timestamp) AS INTEGER)) AS last_purchase,
+            COUNT(*) AS frequency,
+            SUM(p.payment_value) AS monetary
+        FROM
+            olist_orders oo
+            JOIN olist_customers oc ON oo.customer_id = oc.customer_id
+            JOIN order_payments p ON p.order_id = oo.order_id
+        WHERE
+            oo.order_status = 'delivered'
+            AND oo.order_delivered_customer_date IS NOT NULL
+        GROUP BY
+            oc.customer_unique_id
+    ),
+    recencies AS (
+        SELECT
+            CAST(
+                (MAX(last_purchase) OVER () - last_purchase) / 86400 AS INTEGER
+            ) AS recency,
+            frequency,
+            monetary
+        FROM
+            customers
+    ),
+    ranks AS (
+        SELECT
+            recency,
+            frequency,
+            monetary,
+            COUNT(*) OVER (
+                ORDER BY
+                    recency DESC
+            ) AS recency_rank,
+            COUNT(*) OVER () AS total
+        FROM
+            recencies
+    )
+SELECT
+    CAST((5 * recency_rank + total - 1) / total AS INTEGER) AS r_score,
+    CASE
+        WHEN frequency < 5 THEN frequency
+        ELSE 5
+    END AS f_score,
+    COUNT(*) AS customers,
+    SUM(recency) AS recency,
+    SUM(frequency) AS frequency,
+    SUM(monetary) AS monetary
+FROM
+    ranks
+GROUP BY
+    r_score,
+    f_score
+ORDER BY
+    r_score,
+    f_score;
@@ -5,7 +5,7 @@
 -- 2. Join the olist_orders table with the olist_customers table on the customer_id column.
 -- 3. Filter the results to only include orders that have been delivered and have an actual delivery date.
 -- 4. Group the results by the customer state.
--- 5. Order the results by the average difference in days between the estimated delivery date and the actual delivery date.
+-- 5. Order the results by the average difference in days between the estimated delivery date and the actual delivery date, then by state.
 SELECT
     oc.customer_state AS State,
     CAST(
@@ -26,4 +26,5 @@ WHERE
 GROUP BY
     oc.customer_state
 ORDER BY
-    Delivery_Difference ASC;
\ No newline at end of file
+    Delivery_Difference ASC,
+    State ASC;
\ No newline at end of file
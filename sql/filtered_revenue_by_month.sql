@@ -0,0 +1,66 @@
+-- Calculates the revenue per month for the orders matching the dashboard filters
+--
+-- It will have different columns:
+-- 1. year, with the year of the delivery date
+-- 2. month_no, with the month numbers going from 01 to 12
+-- 3. Revenue, with the revenue of the month
+--
+-- Bound parameters:
+-- 1. start_year and end_year, the inclusive range of delivery years
+-- 2. states, the customer states to keep, ignored when all_states is true
+-- 3. categories, the english category names to keep, ignored when all_categories is true
+--
+-- Explanation step by step:
+-- 1. Read the revenue of the delivered orders per delivery month and customer state,
+--    or its share per category when categories are selected
+-- 2. Filter the rows by year, customer state and category
+-- 3. Group the data by year and month
+--
+-- The aggregate tables are built with the loaded tables and kept up to date by
+-- ingest_batch, see src/incremental.py. They hold a few rows per month and state,
+-- so a filter reads them instead of joining the orders, payments, items and products.
+-- With categories selected, an order only counts for the share of its payments of
+-- these categories, like in top_10_revenue_categories.sql.
+--
+-- The payments are stored as integer cents, they are summed exactly and converted to reais last.
+WITH
+    filtered_revenue AS (
+        SELECT
+            afr.year,
+            afr.month_no,
+            afr.customer_state,
+            afr.Revenue
+        FROM
+            aggregate_filtered_revenue afr
+        WHERE
+            :all_categories
+        UNION ALL
+        SELECT
+            afcr.year,
+            afcr.month_no,
+            afcr.customer_state,
+            afcr.Revenue
+        FROM
+            aggregate_filtered_category_revenue afcr
+        WHERE
+            NOT :all_categories
+            AND afcr.Category IN :categories
+    )
+SELECT
+    CAST(fr.year AS TEXT) AS year,
+    fr.month_no,
+    SUM(fr.Revenue) / 100.0 AS Revenue
+FROM
+    filtered_revenue fr
+WHERE
+    fr.year BETWEEN :start_year AND :end_year
+    AND (
+        :all_states
+        OR fr.customer_state IN :states
+    )
+GROUP BY
+    fr.year,
+    fr.month_no
+ORDER BY
+    fr.year,
+    fr.month_no;
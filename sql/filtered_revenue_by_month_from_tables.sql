@@ -0,0 +1,111 @@
+-- Calculates the revenue per month for the orders matching the dashboard filters,
+-- from the loaded tables
+--
+-- It will have different columns:
+-- 1. year, with the year of the delivery date
+-- 2. month_no, with the month numbers going from 01 to 12
+-- 3. Revenue, with the revenue of the month
+--
+-- Bound parameters:
+-- 1. start_year and end_year, the inclusive range of delivery years
+-- 2. states, the customer states to keep, ignored when all_states is true
+-- 3. categories, the english category names to keep, ignored when all_categories is true
+--
+-- Explanation step by step:
+-- 1. Calculate the payments of each order
+-- 2. Calculate the share of each selected category in the price of the items of each order
+-- 3. Filter delivered orders by year and customer state
+-- 4. Take the payments of the orders, or their share of the selected categories
+-- 5. Group the data by year and month
+--
+-- Runs when the aggregate tables of filtered_revenue_by_month.sql are not built, and
+-- gives the same result: with categories selected, an order only counts for the share
+-- of its payments of these categories, like in top_10_revenue_categories.sql.
+--
+-- The payments and prices are stored as integer cents, the revenue is converted to reais last.
+WITH
+    order_payments AS (
+        SELECT
+            oop.order_id,
+            SUM(oop.payment_value) AS payment_value
+        FROM
+            olist_order_payments oop
+        GROUP BY
+            oop.order_id
+    ),
+    order_prices AS (
+        SELECT
+            ooi.order_id,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+        GROUP BY
+            ooi.order_id
+    ),
+    category_prices AS (
+        SELECT
+            ooi.order_id,
+            pcnt.product_category_name_english AS Category,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+            JOIN olist_products op ON ooi.product_id = op.product_id
+            JOIN product_category_name_translation pcnt ON op.product_category_name = pcnt.product_category_name
+        WHERE
+            pcnt.product_category_name_english IN :categories
+        GROUP BY
+            ooi.order_id,
+            Category
+    ),
+    filtered_orders AS (
+        SELECT
+            oo.order_id,
+            CAST(STRFTIME ('%Y', oo.order_delivered_customer_date) AS INTEGER) AS year,
+            STRFTIME ('%m', oo.order_delivered_customer_date) AS month_no
+        FROM
+            olist_orders oo
+            JOIN olist_customers oc ON oo.customer_id = oc.customer_id
+        WHERE
+            oo.order_status = 'delivered'
+            AND oo.order_delivered_customer_date IS NOT NULL
+            AND CAST(STRFTIME ('%Y', oo.order_delivered_customer_date) AS INTEGER) BETWEEN :start_year AND :end_year
+            AND (
+                :all_states
+                OR oc.customer_state IN :states
+            )
+    ),
+    filtered_revenue AS (
+        SELECT
+            fo.year,
+            fo.month_no,
+            p.payment_value AS Revenue
+        FROM
+            filtered_orders fo
+            JOIN order_payments p ON p.order_id = fo.order_id
+        WHERE
+            :all_categories
+        UNION ALL
+        SELECT
+            fo.year,
+            fo.month_no,
+            p.payment_value * (cp.price * 1.0 / o.price) AS Revenue
+        FROM
+            filtered_orders fo
+            JOIN category_prices cp ON cp.order_id = fo.order_id
+            JOIN order_prices o ON o.order_id = fo.order_id
+            JOIN order_payments p ON p.order_id = fo.order_id
+        WHERE
+            NOT :all_categories
+    )
+SELECT
+    CAST(fr.year AS TEXT) AS year,
+    fr.month_no,
+    SUM(fr.Revenue) / 100.0 AS Revenue
+FROM
+    filtered_revenue fr
+GROUP BY
+    fr.year,
+    fr.month_no
+ORDER BY
+    fr.year,
+    fr.month_no;
@@ -0,0 +1,44 @@
+-- Calculates the revenue per category for the orders matching the dashboard filters
+--
+-- It will have different columns:
+-- 1. Category, with the category name
+-- 2. Num_order, with the number of orders
+-- 3. Revenue, with the revenue
+--
+-- Bound parameters:
+-- 1. start_year and end_year, the inclusive range of delivery years
+-- 2. states, the customer states to keep, ignored when all_states is true
+-- 3. categories, the english category names to keep, ignored when all_categories is true
+--
+-- Explanation step by step:
+-- 1. Read the share of each category in the revenue of the delivered orders, per
+--    delivery month and customer state
+-- 2. Filter the rows by year, customer state and category
+-- 3. Group the data by category
+-- 4. Order the data by revenue
+--
+-- The aggregate table is the one of filtered_revenue_by_month.sql. The payments are
+-- shared like in top_10_revenue_categories.sql, so they are not counted once per item
+-- of their order.
+--
+-- The payments and prices are stored as integer cents, the revenue is converted to reais last.
+SELECT
+    afcr.Category,
+    SUM(afcr.Num_order) AS Num_order,
+    SUM(afcr.Revenue) / 100.0 AS Revenue
+FROM
+    aggregate_filtered_category_revenue afcr
+WHERE
+    afcr.year BETWEEN :start_year AND :end_year
+    AND (
+        :all_states
+        OR afcr.customer_state IN :states
+    )
+    AND (
+        :all_categories
+        OR afcr.Category IN :categories
+    )
+GROUP BY
+    afcr.Category
+ORDER BY
+    Revenue DESC;
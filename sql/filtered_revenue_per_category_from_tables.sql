@@ -0,0 +1,89 @@
+-- Calculates the revenue per category for the orders matching the dashboard filters,
+-- from the loaded tables
+--
+-- It will have different columns:
+-- 1. Category, with the category name
+-- 2. Num_order, with the number of orders
+-- 3. Revenue, with the revenue
+--
+-- Bound parameters:
+-- 1. start_year and end_year, the inclusive range of delivery years
+-- 2. states, the customer states to keep, ignored when all_states is true
+-- 3. categories, the english category names to keep, ignored when all_categories is true
+--
+-- Explanation step by step:
+-- 1. Calculate the payments of each order
+-- 2. Calculate the share of each category in the price of the items of each order
+-- 3. Filter delivered orders by year and customer state
+-- 4. Give each category its share of the payments of the order
+-- 5. Group the data by category
+-- 6. Order the data by revenue
+--
+-- Runs when the aggregate table of filtered_revenue_per_category.sql is not built,
+-- and gives the same result. The payments are shared like in
+-- top_10_revenue_categories.sql, so they are not counted once per item of their order.
+--
+-- The payments and prices are stored as integer cents, the revenue is converted to reais last.
+WITH
+    order_payments AS (
+        SELECT
+            oop.order_id,
+            SUM(oop.payment_value) AS payment_value
+        FROM
+            olist_order_payments oop
+        GROUP BY
+            oop.order_id
+    ),
+    order_prices AS (
+        SELECT
+            ooi.order_id,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+        GROUP BY
+            ooi.order_id
+    ),
+    category_prices AS (
+        SELECT
+            ooi.order_id,
+            pcnt.product_category_name_english AS Category,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+            JOIN olist_products op ON ooi.product_id = op.product_id
+            JOIN product_category_name_translation pcnt ON op.product_category_name = pcnt.product_category_name
+        WHERE
+            :all_categories
+            OR pcnt.product_category_name_english IN :categories
+        GROUP BY
+            ooi.order_id,
+            Category
+    ),
+    filtered_orders AS (
+        SELECT
+            oo.order_id
+        FROM
+            olist_orders oo
+            JOIN olist_customers oc ON oo.customer_id = oc.customer_id
+        WHERE
+            oo.order_status = 'delivered'
+            AND oo.order_delivered_customer_date IS NOT NULL
+            AND CAST(STRFTIME ('%Y', oo.order_delivered_customer_date) AS INTEGER) BETWEEN :start_year AND :end_year
+            AND (
+                :all_states
+                OR oc.customer_state IN :states
+            )
+    )
+SELECT
+    cp.Category,
+    COUNT(*) AS Num_order,
+    SUM(p.payment_value * (cp.price * 1.0 / o.price)) / 100.0 AS Revenue
+FROM
+    filtered_orders fo
+    JOIN category_prices cp ON cp.order_id = fo.order_id
+    JOIN order_prices o ON o.order_id = fo.order_id
+    JOIN order_payments p ON p.order_id = fo.order_id
+GROUP BY
+    cp.Category
+ORDER BY
+    Revenue DESC;
@@ -0,0 +1,58 @@
+-- Calculates the revenue per state for the orders matching the dashboard filters
+--
+-- It will have different columns:
+-- 1. customer_state, with the state of the customer
+-- 2. Revenue, with the revenue per state
+--
+-- Bound parameters:
+-- 1. start_year and end_year, the inclusive range of delivery years
+-- 2. states, the customer states to keep, ignored when all_states is true
+-- 3. categories, the english category names to keep, ignored when all_categories is true
+--
+-- Explanation step by step:
+-- 1. Read the revenue of the delivered orders per delivery month and customer state,
+--    or its share per category when categories are selected
+-- 2. Filter the rows by year, customer state and category
+-- 3. Group the data by state
+-- 4. Order the data by revenue
+--
+-- The aggregate tables are the ones of filtered_revenue_by_month.sql. With categories
+-- selected, an order only counts for the share of its payments of these categories.
+--
+-- The payments are stored as integer cents, they are summed exactly and converted to reais last.
+WITH
+    filtered_revenue AS (
+        SELECT
+            afr.year,
+            afr.customer_state,
+            afr.Revenue
+        FROM
+            aggregate_filtered_revenue afr
+        WHERE
+            :all_categories
+        UNION ALL
+        SELECT
+            afcr.year,
+            afcr.customer_state,
+            afcr.Revenue
+        FROM
+            aggregate_filtered_category_revenue afcr
+        WHERE
+            NOT :all_categories
+            AND afcr.Category IN :categories
+    )
+SELECT
+    fr.customer_state AS customer_state,
+    SUM(fr.Revenue) / 100.0 AS Revenue
+FROM
+    filtered_revenue fr
+WHERE
+    fr.year BETWEEN :start_year AND :end_year
+    AND (
+        :all_states
+        OR fr.customer_state IN :states
+    )
+GROUP BY
+    fr.customer_state
+ORDER BY
+    Revenue DESC;
@@ -7,10 +7,14 @@
 -- 4. Filter the results to only include orders where the order status is 'delivered'.
 -- 5. Group the results by the order ID.
 -- 6. Order the results by the order ID.
+--
+-- Orders whose products have no weight get a weight of 0, like the pandas sum.
+--
+-- The freight values are stored as integer cents, they are summed exactly and converted to reais last.
 SELECT
     ooi.order_id,
-    SUM(ooi.freight_value) AS freight_value,
-    SUM(op.product_weight_g) AS product_weight_g
+    SUM(ooi.freight_value) / 100.0 AS freight_value,
+    COALESCE(SUM(op.product_weight_g), 0) AS product_weight_g
 FROM
     olist_orders o
     JOIN olist_order_items ooi ON o.order_id = ooi.order_id
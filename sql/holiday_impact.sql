@@ -0,0 +1,22 @@
+-- Counts the orders of each day, for the holiday impact analysis
+--
+-- It will have different columns:
+-- 1. day, the purchase date ("YYYY-MM-DD")
+-- 2. orders, the number of orders placed that day
+--
+-- Explanation step by step:
+-- 1. Take the date of the purchase timestamp of every order, whatever its status
+-- 2. Group the orders by date
+-- 3. Order the results by date
+--
+-- src.holidays.OrderVolume compares the windows around the holidays with cumulative
+-- sums of these counts.
+SELECT
+    DATE(order_purchase_timestamp) AS day,
+    COUNT(order_id) AS orders
+FROM
+    olist_orders
+GROUP BY
+    DATE(order_purchase_timestamp)
+ORDER BY
+    day;
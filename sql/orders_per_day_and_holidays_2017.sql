@@ -1,26 +1,35 @@
 -- Calculates the number of orders per day and whether each day is a holiday.
 --
 -- Explanation step by step:
--- 1. Select the number of orders per day and whether each day is a holiday.
--- 2. Join the olist_orders table with the public_holidays table on the date column.
--- 3. Filter the results to only include orders from 2017.
--- 4. Group the results by the date.
+-- 1. Count the orders of each day of 2017 in the olist_orders table.
+-- 2. Get the distinct holiday dates of the public_holidays table, so a day with two holidays is counted once.
+-- 3. Left join the days with the holidays on the date.
+-- 4. Select the number of orders, the day in milliseconds and whether the day is a holiday.
 -- 5. Order the results by the date.
+WITH
+    orders_per_day AS (
+        SELECT
+            DATE(order_purchase_timestamp) AS purchase_date,
+            COUNT(order_id) AS order_count
+        FROM
+            olist_orders
+        WHERE
+            STRFTIME ('%Y', order_purchase_timestamp) = '2017'
+        GROUP BY
+            DATE(order_purchase_timestamp)
+    ),
+    holiday_dates AS (
+        SELECT DISTINCT
+            DATE(date) AS holiday_date
+        FROM
+            public_holidays
+    )
 SELECT
-    COUNT(o.order_id) AS order_count,
-    CAST(
-        STRFTIME ('%s', DATE(o.order_purchase_timestamp)) AS INTEGER
-    ) * 1000 AS date,
-    CASE
-        WHEN DATE(h.date) IS NOT NULL THEN 'true'
-        ELSE 'false'
-    END AS holiday
+    opd.order_count,
+    CAST(STRFTIME ('%s', opd.purchase_date) AS INTEGER) * 1000 AS date,
+    hd.holiday_date IS NOT NULL AS holiday
 FROM
-    olist_orders o
-    LEFT JOIN public_holidays h ON DATE(o.order_purchase_timestamp) = DATE(h.date)
-WHERE
-    STRFTIME ('%Y', o.order_purchase_timestamp) = '2017'
-GROUP BY
-    DATE(o.order_purchase_timestamp)
+    orders_per_day opd
+    LEFT JOIN holiday_dates hd ON opd.purchase_date = hd.holiday_date
 ORDER BY
-    DATE(o.order_purchase_timestamp);
\ No newline at end of file
+    opd.purchase_date;
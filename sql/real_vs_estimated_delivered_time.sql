@@ -27,7 +27,7 @@ WITH
             oo.order_status = 'delivered'
             AND oo.order_delivered_customer_date IS NOT NULL
     ),
-    pivot AS (
+    monthly AS (
         SELECT
             b.month_no,
             AVG(
@@ -88,6 +88,6 @@ SELECT
     p.Year2017_estimated_time,
     p.Year2018_estimated_time
 FROM
-    pivot p
+    monthly p
 ORDER BY
     p.month_no;
\ No newline at end of file
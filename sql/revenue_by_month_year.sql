@@ -11,6 +11,8 @@
 -- 1. Calculate the revenue for each order
 -- 2. Group the data by month
 -- 3. Calculate the average revenue for each month
+--
+-- The payments are stored as integer cents, they are summed exactly and converted to reais last.
 WITH
     month_names AS (
         SELECT
@@ -76,7 +78,7 @@ WITH
         SELECT
             strftime ('%m', oo.order_delivered_customer_date) AS month_no,
             strftime ('%Y', oo.order_delivered_customer_date) AS year,
-            SUM(mp.min_payment) AS total_revenue
+            SUM(mp.min_payment) / 100.0 AS total_revenue
         FROM
             olist_orders oo
             JOIN min_payments mp ON oo.order_id = mp.order_id
@@ -10,9 +10,11 @@
 -- 3. Calculate the average revenue for each state
 -- 4. Order the data by revenue
 -- 5. Limit the data to the top 10
+--
+-- The payments are stored as integer cents, they are summed exactly and converted to reais last.
 SELECT
     oc.customer_state AS customer_state,
-    SUM(oop.payment_value) AS Revenue
+    SUM(oop.payment_value) / 100.0 AS Revenue
 FROM
     olist_orders oo
     JOIN olist_customers oc ON oo.customer_id = oc.customer_id
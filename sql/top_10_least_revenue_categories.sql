@@ -1,32 +1,70 @@
 -- Calculates the top 10 least revenue categories
 --
--- It will have different columns: 
+-- It will have different columns:
 -- 1. Category, with the category name
 -- 2. Num_order, with the number of orders
 -- 3. Revenue, with the revenue
 --
 -- Explanation step by step:
--- 1. Calculate the revenue for each order
--- 2. Group the data by category
--- 3. Calculate the average revenue for each category
--- 4. Order the data by revenue
--- 5. Limit the data to the top 10
+-- 1. Calculate the payments of each order, once per order
+-- 2. Calculate the share of each category in the price of the items of each order
+-- 3. Give each category its share of the payments of the order
+-- 4. Group the data by category
+-- 5. Order the data by revenue
+-- 6. Limit the data to the top 10
+--
+-- Joining the payments to the items directly would count every payment once per
+-- item of its order. Both stages have one row per order, or per order and category,
+-- so the query grows with the number of orders instead of items times payments.
+-- Items whose product has no category keep their share, it is not given to the others.
+--
+-- The payments and prices are stored as integer cents, the revenue is converted to reais last.
+WITH
+    order_payments AS (
+        SELECT
+            oop.order_id,
+            SUM(oop.payment_value) AS payment_value
+        FROM
+            olist_order_payments oop
+        GROUP BY
+            oop.order_id
+    ),
+    order_prices AS (
+        SELECT
+            ooi.order_id,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+        GROUP BY
+            ooi.order_id
+    ),
+    category_prices AS (
+        SELECT
+            ooi.order_id,
+            pcnt.product_category_name_english AS Category,
+            SUM(ooi.price) AS price
+        FROM
+            olist_order_items ooi
+            JOIN olist_products op ON ooi.product_id = op.product_id
+            JOIN product_category_name_translation pcnt ON op.product_category_name = pcnt.product_category_name
+        GROUP BY
+            ooi.order_id,
+            Category
+    )
 SELECT
-    pcnt.product_category_name_english AS Category,
-    COUNT(DISTINCT oo.order_id) AS Num_order,
-    SUM(p.payment_value) AS Revenue
+    cp.Category,
+    COUNT(*) AS Num_order,
+    SUM(p.payment_value * (cp.price * 1.0 / o.price)) / 100.0 AS Revenue
 FROM
     olist_orders oo
-    JOIN olist_order_items ooi ON oo.order_id = ooi.order_id
-    JOIN olist_products op ON ooi.product_id = op.product_id
-    JOIN product_category_name_translation pcnt ON op.product_category_name = pcnt.product_category_name
-    JOIN olist_order_payments p ON oo.order_id = p.order_id
+    JOIN category_prices cp ON cp.order_id = oo.order_id
+    JOIN order_prices o ON o.order_id = oo.order_id
+    JOIN order_payments p ON p.order_id = oo.order_id
 WHERE
     oo.order_status = 'delivered'
     AND oo.order_delivered_customer_date IS NOT NULL
-    AND op.product_category_name IS NOT NULL
 GROUP BY
-    Category
+    cp.Category
 ORDER BY
     Revenue ASC
 LIMIT
@@ -0,0 +1,277 @@
+import argparse
+from pathlib import Path
+
+from sqlalchemy import inspect
+
+from src import config
+from src.database import BACKENDS, create_database_engine, get_database_path
+from src.compaction import GEOLOCATION_MODES, compact_geolocation
+from src.encoding import ID_DICTIONARY_TABLE, IdEncoder, read_id_encoder
+from src.extract import extract, iter_extract
+from src.inmemory import run_queries as run_in_memory_queries
+from src.lineage import get_affected_queries
+from src.load import load, load_chunks
+from src.materializations import MATERIALIZATIONS, build_materializations
+from src.planner import get_query_plan
+from src.transform import QueryEnum, run_queries
+from src.utils.profiling import (
+    format_memory_report,
+    format_stage_report,
+    get_dataframes_memory_mb,
+    measure_stage,
+)
+
+STAGES = ["extract", "load", "queries"]
+PUBLIC_HOLIDAYS_TABLE = "public_holidays"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    table_names = list(config.get_csv_to_table_mapping().values())
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Run the E-Commerce ELT pipeline without the dashboard",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        default=STAGES,
+        help="The stages to run, all of them by default. load also runs extract",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=config.DATABASE_BACKEND,
+        help="The storage backend of the database",
+    )
+    parser.add_argument(
+        "--database",
+        help="The database file to load into and query. Defaults to the file of the backend",
+    )
+    parser.add_argument(
+        "--csv-folder",
+        default=config.DATASET_ROOT_PATH,
+        help="The folder where the csv files are",
+    )
+    parser.add_argument(
+        "--public-holidays-url",
+        default=config.PUBLIC_HOLIDAYS_URL,
+        help="The url to get the public holidays",
+    )
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=table_names + [PUBLIC_HOLIDAYS_TABLE],
+        metavar="TABLE",
+        help="Only extract and load these tables, the others are left untouched",
+    )
+    parser.add_argument(
+        "--queries",
+        nargs="+",
+        choices=[query.value for query in QueryEnum],
+        metavar="QUERY",
+        help="Only run these queries, named after their QueryEnum value. Defaults to every "
+        "query, or with --tables and the load stage, to the queries that read the loaded tables",
+    )
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Stream the csv files into the database this many rows at a time. "
+        "extract and load then run as a single extract+load stage",
+    )
+    storage.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="Run the queries with pandas on the extracted tables instead of a database. "
+        "load is skipped and queries also runs extract",
+    )
+    parser.add_argument(
+        "--encode-ids",
+        action="store_true",
+        help="Store the hex ids as integer codes, with an id_dictionary table to decode them. "
+        "Pass it again when reloading some tables of an encoded database, they keep its codes",
+    )
+    parser.add_argument(
+        "--geolocation-mode",
+        choices=GEOLOCATION_MODES,
+        default=config.GEOLOCATION_MODE,
+        help="Store the raw olist_geolocation table, olist_geolocation_compacted with one row "
+        "per zip code prefix, or both",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Trace the allocations of each stage and of each query and report the memory of each table. Slower",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Run the selected stages and print a wall time and peak memory summary
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+    """
+    args = parse_args(argv)
+    stages = set(args.stages)
+    if "load" in stages:
+        stages.add("extract")
+    if args.in_memory:
+        stages.discard("load")
+        if "queries" in stages:
+            stages.add("extract")
+
+    csv_table_mapping = config.get_csv_to_table_mapping()
+    public_holidays_url = args.public_holidays_url
+    if args.tables is not None:
+        csv_table_mapping = {
+            csv_file: table_name
+            for csv_file, table_name in csv_table_mapping.items()
+            if table_name in args.tables
+        }
+        if PUBLIC_HOLIDAYS_TABLE not in args.tables:
+            public_holidays_url = None
+
+    queries = args.queries
+    if queries is None and args.tables is not None and "load" in stages:
+        # The other queries read none of the reloaded tables, their results still hold
+        loaded_tables = (
+            [*args.tables, ID_DICTIONARY_TABLE] if args.encode_ids else args.tables
+        )
+        queries = get_affected_queries(loaded_tables)
+
+    database_path = Path(args.database or get_database_path(args.backend))
+    engine = None
+    if args.in_memory:
+
+        def execute_queries(queries: list[str] | None) -> dict:
+            return run_in_memory_queries(dataframes=dataframes, queries=queries)
+
+    else:
+        engine = create_database_engine(str(database_path), args.backend)
+
+        def execute_queries(queries: list[str] | None) -> dict:
+            return run_queries(database=engine, queries=queries, plan=plan)
+
+    profile_memory = args.profile_memory
+    report = []
+    tables_memory_mb = None
+
+    streaming = args.chunk_size is not None and "load" in stages
+
+    encoder = None
+    if args.encode_ids:
+        # Tables reloaded on their own must keep the codes of the others
+        reuse_codes = args.tables is not None and engine is not None
+        encoder = read_id_encoder(engine) if reuse_codes else IdEncoder()
+
+    if streaming:
+        with measure_stage("extract+load", trace_allocations=profile_memory) as stats:
+
+            def count_rows(table_name: str, rows: int) -> None:
+                stats.rows += rows
+
+            chunks = iter_extract(
+                csv_folder=args.csv_folder,
+                csv_table_mapping=csv_table_mapping,
+                public_holidays_url=public_holidays_url,
+                chunk_size=args.chunk_size,
+                encoder=encoder,
+            )
+            load_chunks(
+                chunks=compact_geolocation(chunks, args.geolocation_mode),
+                database=engine,
+                on_progress=count_rows,
+                rebuild_materializations=False,
+            )
+        report.append(stats)
+
+    if "extract" in stages and not streaming:
+        with measure_stage("extract", trace_allocations=profile_memory) as stats:
+            dataframes = extract(
+                csv_folder=args.csv_folder,
+                csv_table_mapping=csv_table_mapping,
+                public_holidays_url=public_holidays_url,
+                encoder=encoder,
+            )
+            stats.rows = sum(len(dataframe) for dataframe in dataframes.values())
+            dataframes = dict(
+                compact_geolocation(dataframes.items(), args.geolocation_mode)
+            )
+        report.append(stats)
+        if profile_memory:
+            tables_memory_mb = get_dataframes_memory_mb(dataframes)
+
+    if "load" in stages and not streaming:
+        with measure_stage("load", trace_allocations=profile_memory) as stats:
+            load(dataframes=dataframes, database=engine, rebuild_materializations=False)
+            stats.rows = sum(len(dataframe) for dataframe in dataframes.values())
+        report.append(stats)
+
+    if "extract" in stages and not streaming and not args.in_memory:
+        del dataframes
+
+    if "load" in stages and not args.in_memory:
+        # Timed on its own, like the materialize steps of the pipeline. The tables the
+        # load dropped are built again, and the missing ones once their sources are loaded
+        tables = set(inspect(engine).get_table_names())
+        with measure_stage("materialize", trace_allocations=profile_memory) as stats:
+            built = build_materializations(
+                engine,
+                [
+                    name
+                    for name, materialization in MATERIALIZATIONS.items()
+                    if tables.issuperset(materialization.source_tables)
+                ],
+            )
+            stats.rows = len(built)
+        report.append(stats)
+
+    if "queries" in stages and not args.in_memory:
+        # Timed on its own, the implementations only run when the data changed
+        with measure_stage("plan") as stats:
+            plan = get_query_plan(engine)
+            stats.rows = len(plan)
+        report.append(stats)
+
+    if "queries" in stages and profile_memory:
+        # One stage per query, to find the query that dominates memory
+        for query_name in (
+            queries if queries is not None else [query.value for query in QueryEnum]
+        ):
+            with measure_stage(f"query:{query_name}", trace_allocations=True) as stats:
+                query_results = execute_queries([query_name])
+                stats.rows = len(query_results[query_name])
+            report.append(stats)
+    elif "queries" in stages:
+        with measure_stage("queries") as stats:
+            query_results = execute_queries(queries)
+            stats.rows = sum(len(result) for result in query_results.values())
+        report.append(stats)
+
+    if engine is None:
+        print("Database: none, queries ran in memory")
+    else:
+        engine.dispose()
+        print(f"Database: {database_path}")
+    print(format_stage_report(report))
+    if profile_memory:
+        print()
+        print(format_memory_report(report, tables_memory_mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 64
+
+
+class ResultCache:
+    """
+    Thread-safe cache shared by every session running in the process
+
+    Values are computed once per key. Concurrent callers asking for a key that is
+    being computed wait for that single computation instead of starting their own.
+    The least recently used entries are dropped once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._values: OrderedDict[Hashable, Any] = OrderedDict()
+        self._pending: dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value without computing it
+
+        Args:
+            key (Hashable): The cache key
+            default (Any, optional): The value returned on a miss. Defaults to None
+
+        Returns:
+            Any: The cached value or the default
+        """
+        with self._lock:
+            if key not in self._values:
+                return default
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, replacing any previous value for the key
+
+        Args:
+            key (Hashable): The cache key
+            value (Any): The value to store
+        """
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Get the cached value, computing it once if it is missing
+
+        Args:
+            key (Hashable): The cache key
+            compute (Callable[[], T]): Computes the value on a miss
+
+        Raises:
+            Exception: Whatever compute raised, for the caller that ran it and for
+                every caller that was waiting on it. Failures are not cached
+
+        Returns:
+            T: The cached or computed value
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                return self._values[key]
+
+            future = self._pending.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._pending[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(error)
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            del self._pending[key]
+        future.set_result(value)
+
+        return value
+
+    def clear(self) -> None:
+        """Drop every cached value. Computations in flight are not affected"""
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self._max_entries:
+            self._values.popitem(last=False)
+
+
+# Module level instances, shared by every marimo session of the process. The
+# dashboard and the other values computed once per database version are kept apart
+# from the figures of the interactive controls, so that moving a slider through its
+# values never evicts the dashboard
+shared_cache = ResultCache()
+interactive_cache = ResultCache()
@@ -0,0 +1,145 @@
+from typing import Iterable, Iterator
+
+from pandas import DataFrame, concat
+
+from src import config
+
+GEOLOCATION_TABLE = "olist_geolocation"
+COMPACTED_GEOLOCATION_TABLE = "olist_geolocation_compacted"
+GEOLOCATION_MODES = ["raw", "compacted", "both"]
+
+ZIP_CODE_PREFIX = "geolocation_zip_code_prefix"
+
+
+class GeolocationCompactor:
+    """
+    Aggregates the geolocation rows to one row per zip code prefix, chunk by chunk
+
+    Only the running sums and the row counts of each prefix and of each city of a
+    prefix are kept, a few tens of thousands of rows, whatever the number of chunks.
+    """
+
+    def __init__(self) -> None:
+        self._coordinates = DataFrame()
+        self._places = DataFrame()
+
+    def add(self, chunk: DataFrame) -> None:
+        """
+        Add a chunk of the olist_geolocation table
+
+        Args:
+            chunk (DataFrame): The chunk
+        """
+        coordinates = chunk.groupby(ZIP_CODE_PREFIX).agg(
+            lat_sum=("geolocation_lat", "sum"),
+            lng_sum=("geolocation_lng", "sum"),
+            rows=("geolocation_lat", "size"),
+        )
+        # Each chunk has its own categories, text can be summed up across chunks
+        places = (
+            chunk.astype({"geolocation_city": object, "geolocation_state": object})
+            .groupby([ZIP_CODE_PREFIX, "geolocation_city", "geolocation_state"])
+            .size()
+            .to_frame("rows")
+        )
+
+        self._coordinates = _sum_partials(self._coordinates, coordinates)
+        self._places = _sum_partials(self._places, places)
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        Get the compacted table
+
+        Returns:
+            DataFrame: One row per zip code prefix with the centroid of its coordinates,
+                its most frequent city and state, ties going to the first in alphabetical
+                order, and the number of raw rows
+        """
+        if self._coordinates.empty:
+            return DataFrame(
+                columns=[
+                    ZIP_CODE_PREFIX,
+                    "geolocation_lat",
+                    "geolocation_lng",
+                    "geolocation_city",
+                    "geolocation_state",
+                    "geolocation_rows",
+                ]
+            )
+
+        centroids = DataFrame(
+            {
+                "geolocation_lat": self._coordinates["lat_sum"]
+                / self._coordinates["rows"],
+                "geolocation_lng": self._coordinates["lng_sum"]
+                / self._coordinates["rows"],
+            }
+        )
+        dominant_places = (
+            self._places.reset_index()
+            .sort_values(
+                [ZIP_CODE_PREFIX, "rows", "geolocation_city", "geolocation_state"],
+                ascending=[True, False, True, True],
+            )
+            .drop_duplicates(ZIP_CODE_PREFIX)
+            .set_index(ZIP_CODE_PREFIX)[["geolocation_city", "geolocation_state"]]
+        )
+
+        return (
+            centroids.join(dominant_places)
+            .assign(geolocation_rows=self._coordinates["rows"])
+            .sort_index()
+            .reset_index()
+        )
+
+
+def _sum_partials(total: DataFrame, partial: DataFrame) -> DataFrame:
+    if total.empty:
+        return partial
+    return concat([total, partial]).groupby(level=total.index.names).sum()
+
+
+def compact_geolocation(
+    chunks: Iterable[tuple[str, DataFrame]],
+    mode: str = config.GEOLOCATION_MODE,
+) -> Iterator[tuple[str, DataFrame]]:
+    """
+    Compact the olist_geolocation table of the extracted chunks. The other tables
+    are passed through untouched
+
+    Args:
+        chunks (Iterable[tuple[str, DataFrame]]): The table names and chunks, as yielded by iter_extract
+        mode (str, optional): "raw" keeps olist_geolocation, "compacted" replaces it by
+            olist_geolocation_compacted and "both" yields both. Defaults to config.GEOLOCATION_MODE
+
+    Raises:
+        ValueError: If the mode is unknown
+
+    Yields:
+        tuple[str, DataFrame]: The table name and a chunk of its rows. The compacted
+            table follows the last chunk of olist_geolocation
+    """
+    if mode not in GEOLOCATION_MODES:
+        raise ValueError(
+            f"Unknown geolocation mode {mode!r}, expected one of {GEOLOCATION_MODES}"
+        )
+
+    compactor = None
+
+    for table_name, chunk in chunks:
+        if compactor is not None and table_name != GEOLOCATION_TABLE:
+            yield COMPACTED_GEOLOCATION_TABLE, compactor.to_dataframe()
+            compactor = None
+
+        if table_name != GEOLOCATION_TABLE or mode == "raw":
+            yield table_name, chunk
+            continue
+
+        if compactor is None:
+            compactor = GeolocationCompactor()
+        compactor.add(chunk)
+        if mode == "both":
+            yield table_name, chunk
+
+    if compactor is not None:
+        yield COMPACTED_GEOLOCATION_TABLE, compactor.to_dataframe()
@@ -6,7 +6,18 @@ DATASET_ROOT_PATH = str(ROOT_PATH / "dataset")
 QUERIES_ROOT_PATH = str(ROOT_PATH / "sql")
 QUERY_RESULTS_ROOT_PATH = str(ROOT_PATH / "tests/query_results")
 PUBLIC_HOLIDAYS_URL = "https://date.nager.at/api/v3/publicholidays"
+PUBLIC_HOLIDAY_YEARS = ["2016", "2017", "2018"]  # The years of the Olist orders
+HOLIDAY_WINDOW_DAYS = 3  # Days before and after each holiday, see src/holidays.py
+HOLIDAY_BASELINE_DAYS = 28  # Days on each side of the window they are compared to
+ETL_CHUNK_SIZE = 100_000  # Rows streamed from the csv files to the database at a time
+PIPELINE_WORKERS = 4  # Pipeline steps running at once, see src/dag.py
 SQLITE_DB_ABSOLUTE_PATH = str(ROOT_PATH / "olist.db")
+DUCKDB_DB_ABSOLUTE_PATH = str(ROOT_PATH / "olist.duckdb")
+DATABASE_BACKEND = "sqlite"  # "sqlite" or "duckdb"
+ENCODE_IDS = False  # Store the hex ids as integer codes, see src/encoding.py
+GEOLOCATION_MODE = "compacted"  # "raw", "compacted" or "both", see src/compaction.py
+SNAPSHOT_ROOT_PATH = str(ROOT_PATH / "snapshot")
+QUERY_PLAN_PATH = str(ROOT_PATH / "query_plan.json")
 
 
 def get_csv_to_table_mapping() -> dict[str, str]:
@@ -32,3 +43,36 @@ def get_csv_to_table_mapping() -> dict[str, str]:
             ),
         ]
     )
+
+
+def get_categorical_columns() -> dict[str, list[str]]:
+    """
+    Get the low cardinality text columns of each table. They are extracted as pandas
+    categoricals and stored as DuckDB enums, a dictionary of the values plus a small
+    integer code per row
+
+    Returns:
+        dict[str, list[str]]: The dictionary with keys as the table names and values as the categorical columns
+    """
+    return {
+        "olist_customers": ["customer_city", "customer_state"],
+        "olist_geolocation": ["geolocation_city", "geolocation_state"],
+        "olist_orders": ["order_status"],
+        "olist_order_payments": ["payment_type"],
+        "olist_products": ["product_category_name"],
+        "olist_sellers": ["seller_city", "seller_state"],
+    }
+
+
+def get_money_columns() -> dict[str, list[str]]:
+    """
+    Get the monetary columns of each table. They are extracted and stored as integer
+    cents, so sums are exact, and the queries convert them back to reais in their result
+
+    Returns:
+        dict[str, list[str]]: The dictionary with keys as the table names and values as the monetary columns
+    """
+    return {
+        "olist_order_items": ["price", "freight_value"],
+        "olist_order_payments": ["payment_value"],
+    }
@@ -0,0 +1,278 @@
+import numpy as np
+from pandas import DataFrame, Index, Series, to_datetime
+
+from src.utils.money import from_cents
+
+# The segment of each recency score (rows) and frequency score (columns), from 1 to 5
+RFM_SEGMENT_GRID = [
+    ["Hibernating", "Hibernating", "At risk", "At risk", "Can't lose"],
+    ["Hibernating", "Hibernating", "At risk", "At risk", "Can't lose"],
+    ["About to sleep", "About to sleep", "Need attention", "Loyal", "Loyal"],
+    ["Promising", "Potential loyalist", "Potential loyalist", "Loyal", "Loyal"],
+    ["New", "Potential loyalist", "Potential loyalist", "Champions", "Champions"],
+]
+RFM_SEGMENTS = [
+    "Champions",
+    "Loyal",
+    "Potential loyalist",
+    "New",
+    "Promising",
+    "Need attention",
+    "About to sleep",
+    "At risk",
+    "Can't lose",
+    "Hibernating",
+]
+
+RFM_SCORES = 5
+
+SECONDS_PER_DAY = 86400
+
+
+def get_customer_orders(
+    orders: DataFrame, customers: DataFrame, payments: DataFrame
+) -> DataFrame:
+    """
+    Get the customer, purchase time and payments of each delivered order
+
+    Args:
+        orders (DataFrame): The olist_orders table
+        customers (DataFrame): The olist_customers table
+        payments (DataFrame): The olist_order_payments table
+
+    Returns:
+        DataFrame: The customer_unique_id, order_purchase_timestamp and payment_value,
+            in cents, of each delivered order with payments
+    """
+    delivered = orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ]
+    paid = payments.groupby("order_id", sort=False, observed=True)[
+        "payment_value"
+    ].sum()
+
+    # Look the keys up in hash indexes rather than merging, the ids are long strings
+    payment_rows = paid.index.get_indexer(delivered["order_id"])
+    customer_rows = Index(customers["customer_id"]).get_indexer(
+        delivered["customer_id"]
+    )
+    found = (payment_rows >= 0) & (customer_rows >= 0)
+
+    return DataFrame(
+        {
+            "customer_unique_id": customers["customer_unique_id"].to_numpy()[
+                customer_rows[found]
+            ],
+            "order_purchase_timestamp": delivered[
+                "order_purchase_timestamp"
+            ].to_numpy()[found],
+            "payment_value": paid.to_numpy()[payment_rows[found]],
+        }
+    )
+
+
+def _score(ranks: np.ndarray, count: int) -> np.ndarray:
+    # The quintile of each rank, in integers like customer_rfm_segments.sql
+    return (RFM_SCORES * ranks + count - 1) // count
+
+
+def _get_rfm(customer_orders: DataFrame) -> DataFrame:
+    seconds = (
+        to_datetime(customer_orders["order_purchase_timestamp"], format="ISO8601")
+        .to_numpy()
+        .astype("datetime64[s]")
+        .astype("int64")
+    )
+    codes, customer_ids = customer_orders["customer_unique_id"].factorize()
+    customers = (
+        DataFrame(
+            {
+                "code": codes,
+                "seconds": seconds,
+                "payment_value": customer_orders["payment_value"]
+                .astype("int64")
+                .to_numpy(),
+            }
+        )
+        .groupby("code", sort=True)
+        .agg(
+            last_purchase=("seconds", "max"),
+            frequency=("seconds", "size"),
+            monetary=("payment_value", "sum"),
+        )
+    )
+
+    # Equal values get the rank of the last of them, whatever their order
+    count = len(customers)
+    recency = (seconds.max() - customers["last_purchase"]) // SECONDS_PER_DAY
+    recency_ranks = (-recency).rank(method="max").to_numpy().astype("int64")
+    monetary_ranks = customers["monetary"].rank(method="max").to_numpy()
+
+    return DataFrame(
+        {
+            "customer_unique_id": customer_ids[customers.index],
+            "recency": recency.to_numpy(),
+            "frequency": customers["frequency"].to_numpy(),
+            "monetary": customers["monetary"].to_numpy(),
+            "r_score": _score(recency_ranks, count),
+            "f_score": np.minimum(customers["frequency"].to_numpy(), RFM_SCORES),
+            "m_score": _score(monetary_ranks.astype("int64"), count),
+        }
+    )
+
+
+def get_customer_rfm(customer_orders: DataFrame) -> DataFrame:
+    """
+    Score each customer on recency, frequency and monetary value, in one group-by
+    over their orders. Recency and monetary value are scored by quintile, from 1
+    to 5. Most customers order once, so the frequency score is the number of
+    orders, up to 5. The segment comes from the recency and frequency scores, see
+    RFM_SEGMENT_GRID
+
+    Args:
+        customer_orders (DataFrame): The orders returned by get_customer_orders
+
+    Returns:
+        DataFrame: The customer_unique_id, recency (days from the last order to the
+            last order of the dataset), frequency (orders), monetary (reais), their
+            scores and the segment of each customer
+    """
+    rfm = _get_rfm(customer_orders)
+    segments = np.array(RFM_SEGMENT_GRID, dtype=object)
+    return rfm.assign(
+        monetary=from_cents(rfm["monetary"]),
+        segment=segments[rfm["r_score"] - 1, rfm["f_score"] - 1],
+    )
+
+
+def get_rfm_scores(customer_orders: DataFrame) -> DataFrame:
+    """
+    Count the customers of each recency and frequency score, the pandas version of
+    customer_rfm_segments.sql
+
+    Args:
+        customer_orders (DataFrame): The orders returned by get_customer_orders
+
+    Returns:
+        DataFrame: The r_score, f_score, number of customers and their total recency,
+            frequency and monetary value, in cents, see summarize_rfm_scores
+    """
+    return (
+        _get_rfm(customer_orders)
+        .groupby(["r_score", "f_score"], sort=True)
+        .agg(
+            customers=("customer_unique_id", "size"),
+            recency=("recency", "sum"),
+            frequency=("frequency", "sum"),
+            monetary=("monetary", "sum"),
+        )
+        .reset_index()
+    )
+
+
+def summarize_rfm_scores(scores: DataFrame) -> DataFrame:
+    """
+    Summarize the customers of each RFM segment, see get_customer_rfm
+
+    Args:
+        scores (DataFrame): The customers per score, returned by get_rfm_scores or
+            customer_rfm_segments.sql
+
+    Returns:
+        DataFrame: The Segment, its number of Customers, their average Recency (days),
+            Frequency (orders) and Monetary value (reais), and the Revenue of the
+            segment, in the order of RFM_SEGMENTS. Segments without customers are left out
+    """
+    scores = scores.astype("int64")
+    segments = np.array(RFM_SEGMENT_GRID, dtype=object)[
+        scores["r_score"] - 1, scores["f_score"] - 1
+    ]
+    # The sums are integers, so the averages do not depend on the order of the customers
+    totals = (
+        scores[["customers", "recency", "frequency", "monetary"]]
+        .groupby(segments)
+        .sum()
+    )
+    totals = totals.reindex([name for name in RFM_SEGMENTS if name in totals.index])
+
+    return DataFrame(
+        {
+            "Segment": totals.index.to_numpy(),
+            "Customers": totals["customers"].to_numpy(),
+            "Recency": (totals["recency"] / totals["customers"]).to_numpy(),
+            "Frequency": (totals["frequency"] / totals["customers"]).to_numpy(),
+            "Monetary": (
+                from_cents(totals["monetary"]) / totals["customers"]
+            ).to_numpy(),
+            "Revenue": from_cents(totals["monetary"]).to_numpy(),
+        }
+    )
+
+
+def get_cohort_activity(customer_orders: DataFrame) -> DataFrame:
+    """
+    Count the customers of each monthly cohort, by the month of their first order,
+    ordering in each following month. The pandas version of customer_cohort_retention.sql
+
+    Args:
+        customer_orders (DataFrame): The orders returned by get_customer_orders
+
+    Returns:
+        DataFrame: The cohort and month, as months since year 0, and the number of
+            customers of the cohort ordering that month, see summarize_cohorts
+    """
+    purchased_at = to_datetime(
+        customer_orders["order_purchase_timestamp"], format="ISO8601"
+    )
+    codes, _ = customer_orders["customer_unique_id"].factorize()
+    months = DataFrame(
+        {
+            "customer": codes,
+            "month": (purchased_at.dt.year * 12 + purchased_at.dt.month - 1).to_numpy(),
+        }
+    ).drop_duplicates()
+    months["cohort"] = months.groupby("customer")["month"].transform("min")
+
+    return (
+        months.groupby(["cohort", "month"], sort=True)
+        .size()
+        .rename("customers")
+        .reset_index()
+    )
+
+
+def summarize_cohorts(activity: DataFrame) -> DataFrame:
+    """
+    Get the share of each monthly cohort ordering again in each following month
+
+    Args:
+        activity (DataFrame): The customers per cohort and month, returned by
+            get_cohort_activity or customer_cohort_retention.sql
+
+    Returns:
+        DataFrame: The Cohort ("YYYY-MM"), the Months since the first order, the
+            number of Customers of the cohort ordering that month and their share of
+            the cohort, Retention. Sorted by Cohort and Months, month 0 is the whole cohort
+    """
+    activity = activity.astype("int64").sort_values(
+        ["cohort", "month"], ignore_index=True
+    )
+    sizes = activity.loc[activity["month"] == activity["cohort"]]
+    cohort_sizes = Series(sizes["customers"].to_numpy(), index=sizes["cohort"])
+
+    return DataFrame(
+        {
+            "Cohort": (
+                (activity["cohort"] // 12).astype(str)
+                + "-"
+                + (activity["cohort"] % 12 + 1).astype(str).str.zfill(2)
+            ).to_numpy(),
+            "Months": (activity["month"] - activity["cohort"]).to_numpy(),
+            "Customers": activity["customers"].to_numpy(),
+            "Retention": (
+                activity["customers"].to_numpy()
+                / cohort_sizes.reindex(activity["cohort"]).to_numpy()
+            ),
+        }
+    )
@@ -0,0 +1,204 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Hashable, Protocol
+
+# A step of a DAG. run is called with the outputs of the inputs by node name. key
+# returns what the output depends on, None to run the node whenever it is needed.
+# Nodes with the same lock never run at the same time, like the writes to a database.
+# A lazy node only runs when a node that needs it runs, like an extraction that is
+# only worth its memory when its table is loaded again
+Node = namedtuple(
+    "Node",
+    ["name", "stage", "run", "inputs", "key", "lock", "lazy"],
+    defaults=((), None, None, False),
+)
+
+
+class NodeStore(Protocol):
+    """Remembers the nodes that ran, to skip them when their key did not change"""
+
+    def lookup(self, node: Node, key: Hashable) -> tuple[bool, Any]:
+        """
+        Check whether the node already ran with this key
+
+        Args:
+            node (Node): The node
+            key (Hashable): The key of the node
+
+        Returns:
+            tuple[bool, Any]: Whether the node is up to date, and its output if it is kept
+        """
+
+    def save(self, node: Node, key: Hashable, output: Any) -> None:
+        """
+        Remember that the node ran with this key
+
+        Args:
+            node (Node): The node
+            key (Hashable): The key of the node
+            output (Any): The output of the node
+        """
+
+
+def sort_nodes(nodes: list[Node]) -> list[Node]:
+    """
+    Sort the nodes so every node comes after its inputs, keeping the given order otherwise
+
+    Args:
+        nodes (list[Node]): The nodes
+
+    Raises:
+        ValueError: If two nodes have the same name, an input is not a node or the
+            dependencies have a cycle
+
+    Returns:
+        list[Node]: The sorted nodes
+    """
+    by_name = {}
+    for node in nodes:
+        if node.name in by_name:
+            raise ValueError(f"Duplicate node {node.name!r}")
+        by_name[node.name] = node
+
+    for node in nodes:
+        unknown = [name for name in node.inputs if name not in by_name]
+        if unknown:
+            raise ValueError(f"Node {node.name!r} has unknown inputs {unknown}")
+
+    ordered, done = [], set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [node for node in remaining if done.issuperset(node.inputs)]
+        if not ready:
+            names = [node.name for node in remaining]
+            raise ValueError(f"The dependencies of {names} have a cycle")
+        ordered.extend(ready)
+        done.update(node.name for node in ready)
+        remaining = [node for node in remaining if node.name not in done]
+
+    return ordered
+
+
+def _find_stale_nodes(
+    nodes: list[Node], store: NodeStore | None, outputs: dict[str, Any]
+) -> set[str]:
+    by_name = {node.name: node for node in nodes}
+    stale = set()
+
+    for node in nodes:
+        if node.lazy:
+            continue
+        # A node is rerun when an input reruns, whatever its own key says
+        if any(name in stale for name in node.inputs if not by_name[name].lazy):
+            stale.add(node.name)
+            continue
+        if node.key is None or store is None:
+            stale.add(node.name)
+            continue
+
+        is_up_to_date, output = store.lookup(node, node.key())
+        if is_up_to_date:
+            outputs[node.name] = output
+        else:
+            stale.add(node.name)
+
+    # Lazy nodes run when a node that runs needs them
+    for node in reversed(nodes):
+        if node.name in stale:
+            stale.update(name for name in node.inputs if by_name[name].lazy)
+
+    return stale
+
+
+def run_dag(
+    nodes: list[Node],
+    max_workers: int = 4,
+    store: NodeStore | None = None,
+    on_done: Callable[[Node, Any, bool], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Run the nodes in parallel, each one as soon as its inputs are ready. The nodes
+    that are up to date in the store are skipped with the output it kept, and so are
+    the lazy nodes no running node needs. The outputs of the lazy nodes are released
+    once every node that needs them is done
+
+    Args:
+        nodes (list[Node]): The nodes
+        max_workers (int, optional): The number of nodes running at once. Defaults to 4
+        store (NodeStore, optional): Tells which nodes are up to date and remembers the
+            nodes that ran. Defaults to None, every node runs
+        on_done (Callable[[Node, Any, bool], None], optional): Called with each node,
+            its output and whether it was skipped, from the calling thread. The skipped
+            nodes are reported first
+
+    Raises:
+        ValueError: If the nodes do not form a DAG, see sort_nodes
+        Exception: Whatever a node raised. The running nodes finish, the others are not started
+
+    Returns:
+        dict[str, Any]: The outputs of the nodes that are not lazy, by node name
+    """
+    nodes = sort_nodes(nodes)
+    by_name = {node.name: node for node in nodes}
+    outputs: dict[str, Any] = {}
+    stale = _find_stale_nodes(nodes, store, outputs)
+
+    for node in nodes:
+        if node.name not in stale and on_done is not None:
+            on_done(node, outputs.get(node.name), True)
+
+    # Skipped nodes count as done, the outputs of the lazy ones are only needed by their dependents
+    done = {node.name for node in nodes if node.name not in stale}
+    waiting_dependents = {
+        node.name: sum(
+            1
+            for dependent in nodes
+            if node.name in dependent.inputs and dependent.name in stale
+        )
+        for node in nodes
+    }
+    pending = [node for node in nodes if node.name in stale]
+    running: dict[Future, Node] = {}
+    held_locks: set[str] = set()
+
+    def execute(node: Node, inputs: dict[str, Any]) -> Any:
+        output = node.run(inputs)
+        if store is not None and node.key is not None:
+            # The key is read again, the inputs that ran may have changed it
+            store.save(node, node.key(), output)
+        return output
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while pending or running:
+                for node in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if not done.issuperset(node.inputs) or node.lock in held_locks:
+                        continue
+                    pending.remove(node)
+                    if node.lock is not None:
+                        held_locks.add(node.lock)
+                    inputs = {name: outputs.get(name) for name in node.inputs}
+                    running[executor.submit(execute, node, inputs)] = node
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    held_locks.discard(node.lock)
+                    outputs[node.name] = future.result()
+                    done.add(node.name)
+
+                    for name in node.inputs:
+                        waiting_dependents[name] -= 1
+                        if by_name[name].lazy and waiting_dependents[name] == 0:
+                            outputs.pop(name, None)
+
+                    if on_done is not None:
+                        on_done(node, outputs[node.name], False)
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+    return {name: output for name, output in outputs.items() if not by_name[name].lazy}
@@ -0,0 +1,52 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine.base import Engine
+
+from src import config
+
+BACKENDS = ["sqlite", "duckdb"]
+SQLITE_BUSY_TIMEOUT = 120  # Seconds
+
+
+def get_database_path(backend: str = config.DATABASE_BACKEND) -> str:
+    """
+    Get the default database file of a backend
+
+    Args:
+        backend (str, optional): The storage backend. Defaults to config.DATABASE_BACKEND
+
+    Returns:
+        str: The absolute path of the database file
+    """
+    if backend == "duckdb":
+        return config.DUCKDB_DB_ABSOLUTE_PATH
+    return config.SQLITE_DB_ABSOLUTE_PATH
+
+
+def create_database_engine(
+    database_path: str, backend: str = config.DATABASE_BACKEND
+) -> Engine:
+    """
+    Create the engine of a database file. The queries and the loader adapt to the
+    backend through the dialect name of the engine
+
+    Args:
+        database_path (str): The path of the database file
+        backend (str, optional): The storage backend. Defaults to config.DATABASE_BACKEND
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS
+
+    Returns:
+        Engine: The engine
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown database backend {backend!r}, expected one of {BACKENDS}"
+        )
+
+    # The pipeline reads and writes from several threads, a SQLite connection waits
+    # for the lock held by another one instead of failing after the default 5 seconds
+    connect_args = {"timeout": SQLITE_BUSY_TIMEOUT} if backend == "sqlite" else {}
+    return create_engine(
+        f"{backend}:///{database_path}", echo=False, connect_args=connect_args
+    )
@@ -0,0 +1,135 @@
+import numpy as np
+from pandas import DataFrame, Index, Series, concat, read_sql
+from sqlalchemy import inspect, text
+from sqlalchemy.engine.base import Engine
+
+# The 32 characters hex ids replaced by integer codes, wherever they appear
+ID_COLUMNS = ["order_id", "customer_id", "product_id", "seller_id", "review_id"]
+ID_DICTIONARY_TABLE = "id_dictionary"
+
+
+class IdEncoder:
+    """
+    Replaces the hex ids by dense integer codes, 0 to n - 1 for each id column
+
+    Codes are given in order of first appearance and never change, so the chunks of
+    every table can be encoded one after the other and still join on the codes. The
+    dictionary to decode them is stored as the id_dictionary table, with the
+    id_column, code and id columns.
+    """
+
+    def __init__(self, dictionary: DataFrame | None = None) -> None:
+        self._ids: dict[str, Index] = {
+            id_column: Index([], dtype=object) for id_column in ID_COLUMNS
+        }
+        if dictionary is not None:
+            for id_column, ids in dictionary.groupby("id_column"):
+                self._ids[id_column] = Index(ids.sort_values("code")["id"].to_numpy())
+
+    def encode(self, dataframe: DataFrame) -> DataFrame:
+        """
+        Replace the id columns of a table by their codes, giving codes to the new ids
+
+        Args:
+            dataframe (DataFrame): A table or a chunk of a table
+
+        Raises:
+            ValueError: If an id column has missing values
+
+        Returns:
+            DataFrame: A copy of the table with int64 id columns
+        """
+        id_columns = [column for column in ID_COLUMNS if column in dataframe.columns]
+        if not id_columns:
+            return dataframe
+
+        codes = {}
+        for id_column in id_columns:
+            ids = dataframe[id_column]
+            if ids.isna().any():
+                raise ValueError(f"{id_column} has missing ids, they cannot be encoded")
+
+            known = self._ids[id_column]
+            column_codes = known.get_indexer(ids)
+            is_new = column_codes == -1
+            if is_new.any():
+                # unique keeps the order of first appearance, so the codes are stable
+                self._ids[id_column] = known.append(Index(ids[is_new].unique()))
+                column_codes[is_new] = self._ids[id_column].get_indexer(ids[is_new])
+            codes[id_column] = column_codes.astype(np.int64)
+
+        return dataframe.assign(**codes)
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        Get the dictionary to decode the codes
+
+        Returns:
+            DataFrame: The id_column, code and id of every encoded id
+        """
+        return concat(
+            [
+                DataFrame(
+                    {
+                        "id_column": id_column,
+                        "code": np.arange(len(ids), dtype=np.int64),
+                        "id": ids.to_numpy(),
+                    }
+                )
+                for id_column, ids in self._ids.items()
+            ],
+            ignore_index=True,
+        )
+
+
+def read_id_encoder(database: Engine) -> IdEncoder:
+    """
+    Get an encoder that keeps the codes of the tables already in the database, to
+    encode the tables reloaded on their own
+
+    Args:
+        database (Engine): The database holding the id_dictionary table, if any
+
+    Returns:
+        IdEncoder: The encoder, empty if the database has no dictionary
+    """
+    if ID_DICTIONARY_TABLE not in inspect(database).get_table_names():
+        return IdEncoder()
+
+    return IdEncoder(read_sql(text(f"SELECT * FROM {ID_DICTIONARY_TABLE}"), database))
+
+
+def decode_ids(codes: Series, id_column: str, dictionary: DataFrame) -> Series:
+    """
+    Replace integer codes by their hex ids. Ids that are not encoded are returned as is
+
+    Args:
+        codes (Series): The codes, or the ids when the tables were loaded without encoding
+        id_column (str): The id column the codes belong to
+        dictionary (DataFrame): The id_dictionary table, or the rows of that id column
+
+    Returns:
+        Series: The hex ids
+    """
+    if codes.dtype == object:
+        return codes
+
+    ids = dictionary[dictionary["id_column"] == id_column]
+    return codes.map(Series(ids["id"].to_numpy(), index=ids["code"].to_numpy()))
+
+
+def read_id_dictionary(database: Engine, id_column: str) -> DataFrame:
+    """
+    Read the codes and ids of an id column from the database
+
+    Args:
+        database (Engine): The database holding the id_dictionary table
+        id_column (str): The id column to read
+
+    Returns:
+        DataFrame: The id_column, code and id of the encoded ids of that column
+    """
+    query = text(
+        f"SELECT id_column, code, id FROM {ID_DICTIONARY_TABLE} WHERE id_column = :id_column"
+    )
+    return read_sql(query, database, params={"id_column": id_column})
@@ -1,5 +1,15 @@
+from typing import Callable, Iterator
+
 import requests
-from pandas import DataFrame, read_csv, to_datetime
+from pandas import DataFrame, concat, read_csv, to_datetime
+
+from src.config import (
+    PUBLIC_HOLIDAY_YEARS,
+    get_categorical_columns,
+    get_money_columns,
+)
+from src.encoding import ID_DICTIONARY_TABLE, IdEncoder
+from src.utils.money import to_cents
 
 
 def get_public_holidays(url: str, year: str) -> DataFrame:
@@ -35,8 +45,87 @@ def get_public_holidays(url: str, year: str) -> DataFrame:
         raise SystemExit
 
 
+def iter_extract(
+    csv_folder: str,
+    csv_table_mapping: dict[str, str],
+    public_holidays_url: str | None,
+    chunk_size: int | None = None,
+    on_progress: Callable[[str, int], None] | None = None,
+    encoder: IdEncoder | None = None,
+) -> Iterator[tuple[str, DataFrame]]:
+    """
+    Extract the data from the csv files one chunk at a time, so only the chunk being
+    processed is held in memory. The chunks of a table are yielded one after the other.
+    The columns of get_categorical_columns are read as categoricals and the columns of
+    get_money_columns are converted to integer cents
+
+    Args:
+      csv_folder (str): The folder where the csv files are
+      csv_table_mapping (dict[str, str]): The mapping between the csv files and the table names
+      public_holidays_url (str | None): The url to get the public holidays of
+        PUBLIC_HOLIDAY_YEARS, None to skip them
+      chunk_size (int, optional): The number of rows of each chunk. Defaults to None,
+        one chunk per table
+      on_progress (Callable[[str, int], None], optional): Called with the table name and
+        the number of rows after the last chunk of each table is extracted
+      encoder (IdEncoder, optional): Replaces the hex ids of every chunk by integer codes.
+        The id_dictionary table is then yielded last. Defaults to None, ids are kept as is
+
+    Yields:
+      tuple[str, DataFrame]: The table name and a chunk of its rows
+    """
+    categorical_columns = get_categorical_columns()
+    money_columns = get_money_columns()
+
+    for csv_file, table_name in csv_table_mapping.items():
+        path = "{}/{}".format(csv_folder, csv_file)
+        dtype = {
+            column: "category" for column in categorical_columns.get(table_name, [])
+        }
+        rows = 0
+
+        if chunk_size is None:
+            chunks = iter([read_csv(path, dtype=dtype)])
+        else:
+            chunks = read_csv(path, dtype=dtype, chunksize=chunk_size)
+
+        for chunk in chunks:
+            for column in money_columns.get(table_name, []):
+                chunk[column] = to_cents(chunk[column])
+            rows += len(chunk)
+            yield table_name, chunk if encoder is None else encoder.encode(chunk)
+
+        if on_progress is not None:
+            on_progress(table_name, rows)
+
+    if public_holidays_url is not None:
+        public_holidays = concat(
+            [
+                get_public_holidays(url=public_holidays_url, year=year)
+                for year in PUBLIC_HOLIDAY_YEARS
+            ],
+            ignore_index=True,
+        )
+        yield "public_holidays", public_holidays
+        if on_progress is not None:
+            on_progress("public_holidays", len(public_holidays))
+
+    if encoder is None:
+        return
+
+    # Last, so it holds the codes of every table
+    id_dictionary = encoder.to_dataframe()
+    yield ID_DICTIONARY_TABLE, id_dictionary
+    if on_progress is not None:
+        on_progress(ID_DICTIONARY_TABLE, len(id_dictionary))
+
+
 def extract(
-    csv_folder: str, csv_table_mapping: dict[str, str], public_holidays_url: str
+    csv_folder: str,
+    csv_table_mapping: dict[str, str],
+    public_holidays_url: str | None,
+    on_progress: Callable[[str, int], None] | None = None,
+    encoder: IdEncoder | None = None,
 ) -> dict[str, DataFrame]:
     """
     Extract the data from the csv files and load them into a dictionary of dataframes
@@ -44,17 +133,21 @@ def extract(
     Args:
       csv_folder (str): The folder where the csv files are
       csv_table_mapping (dict[str, str]): The mapping between the csv files and the table names
-      public_holidays_url (str): The url to get the public holidays
+      public_holidays_url (str | None): The url to get the public holidays, None to skip them
+      on_progress (Callable[[str, int], None], optional): Called with the table name and
+        the number of rows after each table is extracted
+      encoder (IdEncoder, optional): Replaces the hex ids by integer codes and adds the
+        id_dictionary table. Defaults to None, ids are kept as is
 
     Returns:
       Dict[str, DataFrame]: A dictionary with keys as the table names and values as the dataframes
     """
-    dataframes = {
-        table_name: read_csv("{}/{}".format(csv_folder, csv_file))
-        for csv_file, table_name in csv_table_mapping.items()
-    }
-
-    public_holidays = get_public_holidays(url=public_holidays_url, year="2017")
-    dataframes["public_holidays"] = public_holidays
-
-    return dataframes
+    return dict(
+        iter_extract(
+            csv_folder=csv_folder,
+            csv_table_mapping=csv_table_mapping,
+            public_holidays_url=public_holidays_url,
+            on_progress=on_progress,
+            encoder=encoder,
+        )
+    )
@@ -0,0 +1,167 @@
+import numpy as np
+from pandas import DataFrame, Series, to_datetime
+
+from src import config
+
+
+class OrderVolume:
+    """
+    The orders per day, as the sorted datetime64 days with orders and the cumulative
+    number of orders before each. The orders of any range of days are the difference of two
+    cumulative counts, located with searchsorted, so the windows around every
+    holiday are compared at once, without a loop over the days. The comparisons
+    are cached per holiday set and window size
+    """
+
+    def __init__(self, days: np.ndarray, counts: np.ndarray) -> None:
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.cumulative = np.concatenate([[0], np.cumsum(counts, dtype="int64")])
+        self._impacts: dict[tuple, DataFrame] = {}
+
+    @classmethod
+    def from_timestamps(cls, purchase_timestamps: Series) -> "OrderVolume":
+        """
+        Count the orders per day of purchase timestamps
+
+        Args:
+            purchase_timestamps (Series): The order_purchase_timestamp of the orders
+
+        Returns:
+            OrderVolume: The orders per day
+        """
+        days = (
+            to_datetime(purchase_timestamps, format="ISO8601")
+            .to_numpy()
+            .astype("datetime64[D]")
+        )
+        return cls(*np.unique(days[~np.isnat(days)], return_counts=True))
+
+    @classmethod
+    def from_daily_counts(cls, daily_counts: DataFrame) -> "OrderVolume":
+        """
+        Wrap the orders per day counted by the database
+
+        Args:
+            daily_counts (DataFrame): The day and orders columns of holiday_impact.sql
+
+        Returns:
+            OrderVolume: The orders per day
+        """
+        days = to_datetime(daily_counts["day"]).to_numpy().astype("datetime64[D]")
+        counts = daily_counts["orders"].to_numpy()
+        order = np.argsort(days, kind="stable")
+        order = order[~np.isnat(days[order])]
+        return cls(days[order], counts[order])
+
+    def count(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Count the orders of ranges of days
+
+        Args:
+            starts (np.ndarray): The first day of each range, as datetime64[D]
+            ends (np.ndarray): The day after the last day of each range
+
+        Returns:
+            np.ndarray: The number of orders placed in each range
+        """
+        return (
+            self.cumulative[np.searchsorted(self.days, ends)]
+            - self.cumulative[np.searchsorted(self.days, starts)]
+        )
+
+    def count_days(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Count the days of ranges of days within the data, from the first day with
+        orders to the last, days without orders included
+
+        Args:
+            starts (np.ndarray): The first day of each range, as datetime64[D]
+            ends (np.ndarray): The day after the last day of each range
+
+        Returns:
+            np.ndarray: The number of days of each range within the data
+        """
+        if self.days.size == 0:
+            return np.zeros(len(starts), dtype="int64")
+        first, end = self.days[0], self.days[-1] + 1
+        days = np.clip(ends, first, end) - np.clip(starts, first, end)
+        return days.astype("int64")
+
+    def holiday_impact(
+        self,
+        holidays: DataFrame,
+        window: int = config.HOLIDAY_WINDOW_DAYS,
+        baseline: int = config.HOLIDAY_BASELINE_DAYS,
+    ) -> DataFrame:
+        """
+        Compare the orders per day in a window of days around each holiday with the
+        orders per day of the days just before and after the window
+
+        Args:
+            holidays (DataFrame): The public_holidays table, with the date and name
+                columns. The holidays outside the days with orders are left out, and
+                the names of the holidays of one day are joined
+            window (int, optional): The days before and after each holiday in its
+                window. Defaults to config.HOLIDAY_WINDOW_DAYS
+            baseline (int, optional): The days on each side of the window it is
+                compared to. Defaults to config.HOLIDAY_BASELINE_DAYS
+
+        Raises:
+            ValueError: If the window or the baseline is negative or empty
+
+        Returns:
+            DataFrame: The Date ("YYYY-MM-DD"), Year and name of each Holiday, the
+                Orders of its window, the orders per day of the window (Daily orders)
+                and of the baseline days (Baseline), and the Lift of the window over
+                the baseline, NaN without baseline orders, sorted by Date
+        """
+        if window < 0 or baseline < 1:
+            raise ValueError(
+                f"Expected a window of 0 days or more and a baseline of 1 day or more, "
+                f"got {window} and {baseline}"
+            )
+
+        names = (
+            DataFrame(
+                {
+                    "date": to_datetime(holidays["date"]).dt.strftime("%Y-%m-%d"),
+                    "name": holidays["name"].astype(str),
+                }
+            )
+            .drop_duplicates()
+            .groupby("date", sort=True)["name"]
+            .agg(" / ".join)
+        )
+        key = (tuple(names.items()), window, baseline)
+        if key not in self._impacts:
+            self._impacts[key] = self._compare(names, window, baseline)
+        return self._impacts[key].copy()
+
+    def _compare(self, names: Series, window: int, baseline: int) -> DataFrame:
+        dates = names.index.to_numpy().astype("datetime64[D]")
+        inside = np.searchsorted(self.days, dates, side="right") > 0
+        inside &= np.searchsorted(self.days, dates, side="left") < self.days.size
+        dates, names = dates[inside], names[inside]
+
+        # The window, then the baseline days before and after it
+        starts, ends = dates - window, dates + window + 1
+        before, after = starts - baseline, ends + baseline
+        orders = self.count(starts, ends)
+        daily = orders / self.count_days(starts, ends)
+        baseline_days = self.count_days(before, starts) + self.count_days(ends, after)
+        baseline_daily = (self.count(before, starts) + self.count(ends, after)) / (
+            np.where(baseline_days > 0, baseline_days, np.nan)
+        )
+
+        return DataFrame(
+            {
+                "Date": names.index.to_numpy(),
+                "Year": dates.astype("datetime64[Y]").astype("int64") + 1970,
+                "Holiday": names.to_numpy(),
+                "Orders": orders.astype("int64"),
+                "Daily orders": daily,
+                "Baseline": baseline_daily,
+                "Lift": daily / np.where(baseline_daily > 0, baseline_daily, np.nan)
+                - 1,
+            }
+        )
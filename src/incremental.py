@@ -0,0 +1,645 @@
+from collections.abc import Iterable
+
+from pandas import (
+    CategoricalDtype,
+    DataFrame,
+    Index,
+    Series,
+    concat,
+    read_sql,
+    to_datetime,
+)
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.base import Engine
+
+from src.encoding import ID_DICTIONARY_TABLE, read_id_encoder
+from src.inmemory import MONTH_NAMES, REVENUE_YEARS, get_category_shares
+from src.leaderboard import has_seller_leaderboard, update_seller_leaderboard
+from src.lineage import record_table_loads
+from src.sketches import (
+    get_delivery_times,
+    has_delivery_sketches,
+    update_delivery_sketches,
+)
+from src.transform import QueryEnum
+from src.utils.money import from_cents
+
+# The tables a micro-batch can hold, with the columns identifying their rows
+BATCH_TABLE_KEYS = {
+    "olist_customers": ["customer_id"],
+    "olist_orders": ["order_id"],
+    "olist_order_items": ["order_id", "order_item_id"],
+    "olist_order_payments": ["order_id", "payment_sequential"],
+}
+
+# The aggregate tables, with their key columns and the count that drops a key at 0
+AGGREGATE_KEYS = {
+    "aggregate_order_status": ["order_status"],
+    "aggregate_revenue_per_state": ["customer_state"],
+    "aggregate_revenue_by_month_year": ["year", "month"],
+    "aggregate_revenue_per_category": ["Category"],
+    "aggregate_filtered_revenue": ["year", "month_no", "customer_state"],
+    "aggregate_filtered_category_revenue": [
+        "year",
+        "month_no",
+        "customer_state",
+        "Category",
+    ],
+}
+AGGREGATE_COUNTS = {
+    "aggregate_order_status": "Amount",
+    "aggregate_revenue_per_state": "payments",
+    "aggregate_revenue_by_month_year": "orders",
+    "aggregate_revenue_per_category": "Num_order",
+    "aggregate_filtered_revenue": "orders",
+    "aggregate_filtered_category_revenue": "Num_order",
+}
+
+# The number of keys _read_keys looks up per SQLite statement
+KEY_LOOKUP_CHUNK_SIZE = 200
+
+# Reloading any of these tables makes the aggregates stale
+AGGREGATE_SOURCE_TABLES = [
+    *BATCH_TABLE_KEYS,
+    "olist_products",
+    "product_category_name_translation",
+]
+
+
+def _delivered(orders: DataFrame) -> DataFrame:
+    return orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ]
+
+
+def _text_keys(dataframe: DataFrame) -> DataFrame:
+    return dataframe.astype(
+        {
+            column: object
+            for column, dtype in dataframe.dtypes.items()
+            if isinstance(dtype, CategoricalDtype)
+        }
+    )
+
+
+def get_order_aggregates(dataframes: dict[str, DataFrame]) -> dict[str, DataFrame]:
+    """
+    Get the contribution of some orders to every aggregate table. Each order only
+    adds to the aggregates, so the contributions of disjoint sets of orders add up
+    to the contribution of their union
+
+    Args:
+        dataframes (dict[str, DataFrame]): The olist_orders, olist_customers,
+            olist_order_items, olist_products, product_category_name_translation and
+            olist_order_payments rows of the orders
+
+    Returns:
+        dict[str, DataFrame]: The rows of each aggregate table, its keys and values as
+            columns. The revenues stay in cents, so they add up exactly
+    """
+    orders = _text_keys(dataframes["olist_orders"])
+    payments = dataframes["olist_order_payments"]
+    delivered = _delivered(orders)
+
+    order_status = orders.groupby("order_status").size().reset_index(name="Amount")
+
+    state_orders = delivered[
+        ["order_id", "customer_id", "order_delivered_customer_date"]
+    ].merge(
+        _text_keys(dataframes["olist_customers"])[["customer_id", "customer_state"]],
+        on="customer_id",
+    )
+    state_payments = state_orders.merge(
+        payments[["order_id", "payment_value"]], on="order_id"
+    )
+    revenue_per_state = (
+        state_payments.groupby("customer_state")
+        .agg(Revenue=("payment_value", "sum"), payments=("payment_value", "size"))
+        .reset_index()
+    )
+
+    min_payments = (
+        payments.groupby("order_id")["payment_value"].min().rename("min_payment")
+    )
+    paid = delivered.join(min_payments, on="order_id", how="inner")
+    delivered_at = to_datetime(paid["order_delivered_customer_date"], format="ISO8601")
+    revenue_by_month_year = (
+        paid.assign(year=delivered_at.dt.year, month=delivered_at.dt.month)
+        .groupby(["year", "month"])
+        .agg(Revenue=("min_payment", "sum"), orders=("min_payment", "size"))
+        .reset_index()
+    )
+
+    category_shares = _text_keys(
+        get_category_shares(
+            {
+                **dataframes,
+                "olist_orders": orders,
+                "olist_products": _text_keys(dataframes["olist_products"]),
+            }
+        )
+    )
+    revenue_per_category = (
+        category_shares.groupby("Category")
+        .agg(Num_order=("order_id", "size"), Revenue=("Revenue", "sum"))
+        .reset_index()
+    )
+
+    # The revenue the dashboard filters select from, by delivery month and customer
+    # state, in whole and shared between the categories of the orders
+    delivered_at = to_datetime(
+        state_orders["order_delivered_customer_date"], format="ISO8601"
+    )
+    order_months = DataFrame(
+        {
+            "order_id": state_orders["order_id"].to_numpy(),
+            "year": delivered_at.dt.year.to_numpy(),
+            "month_no": delivered_at.dt.strftime("%m").to_numpy(),
+            "customer_state": state_orders["customer_state"].to_numpy(),
+        }
+    )
+    filtered_keys = AGGREGATE_KEYS["aggregate_filtered_revenue"]
+    filtered_revenue = (
+        order_months.join(
+            payments.groupby("order_id")["payment_value"].sum(),
+            on="order_id",
+            how="inner",
+        )
+        .groupby(filtered_keys)
+        .agg(Revenue=("payment_value", "sum"), orders=("payment_value", "size"))
+        .reset_index()
+    )
+    filtered_category_revenue = (
+        order_months.merge(category_shares, on="order_id")
+        .groupby([*filtered_keys, "Category"])
+        .agg(Num_order=("order_id", "size"), Revenue=("Revenue", "sum"))
+        .reset_index()
+    )
+
+    return {
+        "aggregate_order_status": order_status,
+        "aggregate_revenue_per_state": revenue_per_state,
+        "aggregate_revenue_by_month_year": revenue_by_month_year,
+        "aggregate_revenue_per_category": revenue_per_category,
+        "aggregate_filtered_revenue": filtered_revenue,
+        "aggregate_filtered_category_revenue": filtered_category_revenue,
+    }
+
+
+def _sum_aggregates(
+    table_name: str, parts: list[DataFrame], signs: list[int]
+) -> DataFrame:
+    keys = AGGREGATE_KEYS[table_name]
+    signed = [
+        part.assign(
+            **{column: part[column] * sign for column in part.columns.difference(keys)}
+        )
+        for part, sign in zip(parts, signs)
+        if not part.empty
+    ]
+    if not signed:
+        return parts[0].iloc[0:0]
+
+    total = concat(signed, ignore_index=True).groupby(keys).sum().reset_index()
+    # A key no order contributes to any more is dropped, like the queries do not return it
+    total = total[total[AGGREGATE_COUNTS[table_name]] != 0]
+    return total.sort_values(keys, ignore_index=True)
+
+
+def _read_rows(
+    connection: Connection, table_name: str, column: str, values: Iterable
+) -> DataFrame:
+    # tolist gives Python scalars, SQLite would bind numpy integers as blobs
+    values = Index(values).tolist()
+    if not values:
+        # An empty IN list has no type, DuckDB cannot compare it to the column
+        rows = read_sql(text(f"SELECT * FROM {table_name} LIMIT 0"), connection)
+        return rows.drop(columns="index", errors="ignore")
+
+    query = text(f'SELECT * FROM {table_name} WHERE "{column}" IN :values').bindparams(
+        bindparam("values", expanding=True)
+    )
+    rows = read_sql(query, connection, params={"values": values})
+    return rows.drop(columns="index", errors="ignore")
+
+
+def _read_order_tables(connection: Connection, order_ids: list) -> dict[str, DataFrame]:
+    orders = _read_rows(connection, "olist_orders", "order_id", order_ids)
+    items = _read_rows(connection, "olist_order_items", "order_id", order_ids)
+    return {
+        "olist_orders": orders,
+        "olist_customers": _read_rows(
+            connection, "olist_customers", "customer_id", orders["customer_id"].unique()
+        ),
+        "olist_order_items": items,
+        "olist_products": _read_rows(
+            connection, "olist_products", "product_id", items["product_id"].unique()
+        ),
+        "product_category_name_translation": read_sql(
+            text("SELECT * FROM product_category_name_translation"), connection
+        ),
+        "olist_order_payments": _read_rows(
+            connection, "olist_order_payments", "order_id", order_ids
+        ),
+    }
+
+
+def _write_table(
+    connection: Connection,
+    table_name: str,
+    dataframe: DataFrame,
+    replace: bool,
+    index: bool = True,
+) -> None:
+    # The loaded tables have the index column of to_sql, the aggregates do not
+    if connection.dialect.name != "duckdb":
+        dataframe.to_sql(
+            table_name,
+            connection,
+            if_exists="replace" if replace else "append",
+            index=index and not replace,
+        )
+        return
+
+    duckdb_connection = connection.connection.driver_connection
+    duckdb_connection.register("batch", dataframe)
+    if replace:
+        duckdb_connection.execute(
+            f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM batch"
+        )
+    else:
+        duckdb_connection.execute(
+            f"INSERT INTO {table_name} BY NAME SELECT * FROM batch"
+        )
+    duckdb_connection.unregister("batch")
+
+
+def _write_aggregate(connection: Connection, table_name: str, rows: DataFrame) -> None:
+    _write_table(connection, table_name, rows, replace=True)
+    # Replacing the table drops its index, DuckDB scans columns and does not need one.
+    # The batches look the keys up, and the filtered queries of src/transform.py the
+    # range of years the keys of their tables start with
+    if connection.dialect.name != "sqlite":
+        return
+    columns = ", ".join(f'"{column}"' for column in AGGREGATE_KEYS[table_name])
+    connection.execute(
+        text(f"CREATE INDEX IF NOT EXISTS ix_{table_name} ON {table_name} ({columns})")
+    )
+
+
+def _widen_duckdb_enums(database: Engine, table_name: str, rows: DataFrame) -> None:
+    # A value missing from an enum cannot be inserted, so the enums the loader
+    # created, named after their table and column, get the new values first. This
+    # runs in its own transaction, DuckDB cannot alter a table it modifies in the same one
+    columns = read_sql(f"DESCRIBE {table_name}", database)
+    enum_columns = columns.loc[
+        columns["column_type"].str.startswith("ENUM("), "column_name"
+    ]
+
+    with database.begin() as connection:
+        for column in enum_columns:
+            if column not in rows.columns:
+                continue
+            enum_name = f"{table_name}_{column}"
+            values = read_sql(
+                f"SELECT unnest(enum_range(NULL::{enum_name})) AS value", connection
+            )["value"]
+            new_values = rows[column].dropna()
+            if new_values.isin(values).all():
+                continue
+
+            literals = ", ".join(
+                "'{}'".format(value.replace("'", "''"))
+                for value in sorted(set(values) | set(new_values))
+            )
+            connection.exec_driver_sql(
+                f'ALTER TABLE {table_name} ALTER COLUMN "{column}" SET DATA TYPE VARCHAR'
+            )
+            connection.exec_driver_sql(f"DROP TYPE {enum_name}")
+            connection.exec_driver_sql(f"CREATE TYPE {enum_name} AS ENUM ({literals})")
+            connection.exec_driver_sql(
+                f'ALTER TABLE {table_name} ALTER COLUMN "{column}" SET DATA TYPE {enum_name}'
+            )
+
+
+def _delete_keys(connection: Connection, table_name: str, keys: DataFrame) -> None:
+    key_columns = list(keys.columns)
+    if connection.dialect.name == "duckdb":
+        # DuckDB has no index to look the keys up, one semi join deletes them all
+        condition = " AND ".join(
+            f'batch_keys."{column}" = {table_name}."{column}"' for column in key_columns
+        )
+        duckdb_connection = connection.connection.driver_connection
+        duckdb_connection.register("batch_keys", keys)
+        duckdb_connection.execute(
+            f"DELETE FROM {table_name} WHERE EXISTS "
+            f"(SELECT 1 FROM batch_keys WHERE {condition})"
+        )
+        duckdb_connection.unregister("batch_keys")
+    else:
+        condition = " AND ".join(f'"{column}" = :{column}' for column in key_columns)
+        connection.execute(
+            text(f"DELETE FROM {table_name} WHERE {condition}"),
+            keys.astype(object).to_dict("records"),
+        )
+
+
+def _read_keys(connection: Connection, table_name: str, keys: DataFrame) -> DataFrame:
+    key_columns = list(keys.columns)
+    if connection.dialect.name == "duckdb":
+        # Like _delete_keys, one semi join reads the rows of every key
+        condition = " AND ".join(
+            f'batch_keys."{column}" = {table_name}."{column}"' for column in key_columns
+        )
+        duckdb_connection = connection.connection.driver_connection
+        duckdb_connection.register("batch_keys", keys)
+        rows = duckdb_connection.execute(
+            f"SELECT * FROM {table_name} WHERE EXISTS "
+            f"(SELECT 1 FROM batch_keys WHERE {condition})"
+        ).df()
+        duckdb_connection.unregister("batch_keys")
+        return rows
+
+    # Each key is looked up in the index of the key columns, a few hundred at a time
+    # to stay below the number of parameters SQLite binds in one statement
+    records = keys.astype(object).to_dict("records")
+    parts = []
+    for start in range(0, len(records), KEY_LOOKUP_CHUNK_SIZE):
+        chunk = records[start : start + KEY_LOOKUP_CHUNK_SIZE]
+        condition = " OR ".join(
+            "("
+            + " AND ".join(
+                f'"{column}" = :k{row}_{i}' for i, column in enumerate(key_columns)
+            )
+            + ")"
+            for row in range(len(chunk))
+        )
+        params = {
+            f"k{row}_{i}": record[column]
+            for row, record in enumerate(chunk)
+            for i, column in enumerate(key_columns)
+        }
+        parts.append(
+            read_sql(
+                text(f"SELECT * FROM {table_name} WHERE {condition}"),
+                connection,
+                params=params,
+            )
+        )
+    # New keys have no rows yet, the empty parts are left out
+    found = [part for part in parts if not part.empty]
+    return concat(found, ignore_index=True) if found else parts[0]
+
+
+def _upsert(connection: Connection, table_name: str, rows: DataFrame) -> None:
+    if rows.empty:
+        return
+
+    _delete_keys(connection, table_name, rows[BATCH_TABLE_KEYS[table_name]])
+    _write_table(connection, table_name, rows, replace=False)
+
+
+def _update_aggregate(
+    connection: Connection, table_name: str, before: DataFrame, after: DataFrame
+) -> None:
+    # Only the rows of the keys the orders contribute to change, the others are kept
+    keys = AGGREGATE_KEYS[table_name]
+    touched = concat([before[keys], after[keys]], ignore_index=True).drop_duplicates()
+    if touched.empty:
+        return
+
+    current = _read_keys(connection, table_name, touched)
+    total = _sum_aggregates(table_name, [current, after, before], [1, 1, -1])
+    _delete_keys(connection, table_name, touched)
+    if not total.empty:
+        _write_table(connection, table_name, total, replace=False, index=False)
+
+
+def _get_batch_order_ids(connection: Connection, batch: dict[str, DataFrame]) -> list:
+    order_ids = [
+        rows["order_id"] for rows in batch.values() if "order_id" in rows.columns
+    ]
+    # The orders of an updated customer may now count for another state
+    if "olist_customers" in batch:
+        order_ids.append(
+            _read_rows(
+                connection,
+                "olist_orders",
+                "customer_id",
+                batch["olist_customers"]["customer_id"].unique(),
+            )["order_id"]
+        )
+    if not order_ids:
+        return []
+    return concat(order_ids, ignore_index=True).drop_duplicates().tolist()
+
+
+def has_aggregates(database: Engine | Connection) -> bool:
+    """
+    Check whether the aggregate tables are in the database
+
+    Args:
+        database (Engine | Connection): The database
+
+    Returns:
+        bool: Whether every aggregate table exists
+    """
+    tables = set(inspect(database).get_table_names())
+    return all(table_name in tables for table_name in AGGREGATE_KEYS)
+
+
+def build_aggregates(database: Engine) -> None:
+    """
+    Compute the aggregate tables from every order, replacing the existing ones
+
+    Args:
+        database (Engine): The database holding the order tables
+
+    Returns:
+        None
+    """
+    with database.begin() as connection:
+        dataframes = {
+            table_name: read_sql(text(f"SELECT * FROM {table_name}"), connection).drop(
+                columns="index", errors="ignore"
+            )
+            for table_name in AGGREGATE_SOURCE_TABLES
+        }
+        for table_name, rows in get_order_aggregates(dataframes).items():
+            _write_aggregate(
+                connection, table_name, _sum_aggregates(table_name, [rows], [1])
+            )
+
+
+def drop_aggregates(database: Engine, table_names: Iterable[str] | None = None) -> None:
+    """
+    Drop the aggregate tables, when they are stale. ingest_batch builds them again
+
+    Args:
+        database (Engine): The database
+        table_names (Iterable[str], optional): The tables that were reloaded. The
+            aggregates are only dropped if one of them is a source of the aggregates.
+            Defaults to None, the aggregates are always dropped
+
+    Returns:
+        None
+    """
+    if table_names is not None and not set(table_names) & set(AGGREGATE_SOURCE_TABLES):
+        return
+
+    with database.begin() as connection:
+        for table_name in AGGREGATE_KEYS:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+
+
+def ingest_batch(batch: dict[str, DataFrame], database: Engine) -> None:
+    """
+    Upsert a micro-batch of orders, items, payments and customers, and update the
+    aggregate tables with the difference it makes instead of recomputing them.
+    Rows whose keys are already in the database replace them, the others are
+    appended. The orders the batch touches are read before and after the upsert,
+    and only their contributions are subtracted from and added to the aggregates.
+    The delivery time sketches of src/sketches.py and the seller leaderboard of
+    src/leaderboard.py are updated too, if the database has them. The upsert and
+    the updates happen in one transaction. Then the tables of the batch get a new
+    load id, like the loader gives them
+
+    Args:
+        batch (dict[str, DataFrame]): The new or updated rows of the tables of
+            BATCH_TABLE_KEYS, with the columns of the csv files and the money in cents,
+            as extract returns them. The ids are encoded with the dictionary of the
+            database, if it has one
+        database (Engine): The database to ingest the batch into. Its aggregate tables
+            are built first if they are missing
+
+    Raises:
+        ValueError: If the batch has a table that is not in BATCH_TABLE_KEYS
+
+    Returns:
+        None
+    """
+    unknown = set(batch) - set(BATCH_TABLE_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Cannot ingest {sorted(unknown)}, expected tables of {list(BATCH_TABLE_KEYS)}"
+        )
+
+    if not has_aggregates(database):
+        build_aggregates(database)
+
+    batch = {
+        table_name: _text_keys(rows).drop_duplicates(
+            BATCH_TABLE_KEYS[table_name], keep="last"
+        )
+        for table_name, rows in batch.items()
+    }
+    if database.dialect.name == "duckdb":
+        for table_name, rows in batch.items():
+            _widen_duckdb_enums(database, table_name, rows)
+
+    loaded_tables = list(batch)
+    with database.begin() as connection:
+        if ID_DICTIONARY_TABLE in inspect(connection).get_table_names():
+            loaded_tables.append(ID_DICTIONARY_TABLE)
+            encoder = read_id_encoder(connection)
+            known_ids = encoder.to_dataframe()
+            batch = {
+                table_name: encoder.encode(rows) for table_name, rows in batch.items()
+            }
+            ids = encoder.to_dataframe()
+            known_counts = ids["id_column"].map(known_ids["id_column"].value_counts())
+            _write_table(
+                connection,
+                ID_DICTIONARY_TABLE,
+                ids[ids["code"] >= known_counts.fillna(0)],
+                replace=False,
+            )
+
+        order_ids = _get_batch_order_ids(connection, batch)
+        before_tables = _read_order_tables(connection, order_ids)
+        before = get_order_aggregates(before_tables)
+        for table_name, rows in batch.items():
+            _upsert(connection, table_name, rows)
+        after_tables = _read_order_tables(connection, order_ids)
+        after = get_order_aggregates(after_tables)
+
+        if has_delivery_sketches(connection):
+            update_delivery_sketches(
+                connection,
+                get_delivery_times(before_tables),
+                get_delivery_times(after_tables),
+            )
+        if has_seller_leaderboard(connection):
+            update_seller_leaderboard(connection, before_tables, after_tables)
+
+        for table_name in AGGREGATE_KEYS:
+            _update_aggregate(
+                connection, table_name, before[table_name], after[table_name]
+            )
+
+    record_table_loads(database, loaded_tables)
+
+
+def read_aggregate_results(database: Engine) -> dict[str, DataFrame]:
+    """
+    Get the results of the queries the aggregate tables answer, the same as
+    run_queries returns for them
+
+    Args:
+        database (Engine): The database holding the aggregate tables
+
+    Returns:
+        dict[str, DataFrame]: The results of global_amount_order_status,
+            revenue_per_state, revenue_by_month_year, top_10_revenue_categories and
+            top_10_least_revenue_categories
+    """
+    aggregates = {
+        table_name: read_sql(text(f"SELECT * FROM {table_name}"), database)
+        for table_name in AGGREGATE_KEYS
+    }
+
+    order_status = aggregates["aggregate_order_status"].sort_values(
+        "order_status", ignore_index=True
+    )[["order_status", "Amount"]]
+
+    revenue_per_state = (
+        aggregates["aggregate_revenue_per_state"]
+        .assign(Revenue=lambda rows: from_cents(rows["Revenue"]))
+        .sort_values("Revenue", ascending=False, kind="stable", ignore_index=True)
+        .head(10)[["customer_state", "Revenue"]]
+    )
+
+    revenue = (
+        aggregates["aggregate_revenue_by_month_year"]
+        .pivot(index="month", columns="year", values="Revenue")
+        .reindex(index=range(1, 13), columns=REVENUE_YEARS)
+        .fillna(0.0)
+    )
+    revenue_by_month_year = DataFrame(
+        {
+            "month_no": Series(range(1, 13)).map("{:02d}".format),
+            "month": MONTH_NAMES,
+        }
+    )
+    for year in REVENUE_YEARS:
+        revenue_by_month_year[f"Year{year}"] = from_cents(revenue[year]).to_numpy(
+            dtype=float
+        )
+
+    categories = aggregates["aggregate_revenue_per_category"][
+        ["Category", "Num_order", "Revenue"]
+    ].assign(Revenue=lambda rows: from_cents(rows["Revenue"]))
+
+    return {
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value: order_status,
+        QueryEnum.REVENUE_PER_STATE.value: revenue_per_state,
+        QueryEnum.REVENUE_BY_MONTH_YEAR.value: revenue_by_month_year,
+        QueryEnum.TOP_10_REVENUE_CATEGORIES.value: categories.sort_values(
+            "Revenue", ascending=False, kind="stable", ignore_index=True
+        ).head(10),
+        QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value: categories.sort_values(
+            "Revenue", ascending=True, kind="stable", ignore_index=True
+        ).head(10),
+    }
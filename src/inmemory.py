@@ -0,0 +1,557 @@
+from typing import Callable
+
+import numpy as np
+from pandas import CategoricalDtype, DataFrame, Series, Timedelta, to_datetime
+
+from src.compaction import COMPACTED_GEOLOCATION_TABLE, GEOLOCATION_TABLE
+from src.customers import (
+    get_cohort_activity,
+    get_customer_orders,
+    get_rfm_scores,
+    summarize_cohorts,
+    summarize_rfm_scores,
+)
+from src.encoding import ID_DICTIONARY_TABLE
+from src.holidays import OrderVolume
+from src.spatial import get_freight_value_distance_relationship
+from src.transform import (
+    QueryEnum,
+    QueryResult,
+    decode_order_ids,
+    get_freight_value_weight_relationship,
+    get_orders_per_day_and_holidays_2017,
+)
+from src.utils.money import from_cents
+
+MONTH_NAMES = [
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+]
+REVENUE_YEARS = [2016, 2017, 2018]
+
+
+def _to_datetime(dates: Series) -> Series:
+    # The csv files store ISO 8601 text, like the SQLite date functions expect
+    return to_datetime(dates, format="ISO8601")
+
+
+def _as_text(result: DataFrame) -> DataFrame:
+    # Categorical group keys come back as text, like the database returns them
+    return result.astype(
+        {
+            column: object
+            for column, dtype in result.dtypes.items()
+            if isinstance(dtype, CategoricalDtype)
+        }
+    )
+
+
+def _month_numbers(months: Series) -> Series:
+    return months.map("{:02d}".format)
+
+
+def _delivered_orders(dataframes: dict[str, DataFrame]) -> DataFrame:
+    orders = dataframes["olist_orders"]
+    return orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ]
+
+
+def _customer_orders(dataframes: dict[str, DataFrame]) -> DataFrame:
+    return get_customer_orders(
+        dataframes["olist_orders"],
+        dataframes["olist_customers"],
+        dataframes["olist_order_payments"],
+    )
+
+
+def query_delivery_date_difference(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute delivery_date_difference.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    orders = _delivered_orders(dataframes).merge(
+        dataframes["olist_customers"], on="customer_id"
+    )
+
+    # julianday of the dates without their time, so whole days
+    difference = (
+        _to_datetime(orders["order_estimated_delivery_date"]).dt.normalize()
+        - _to_datetime(orders["order_delivered_customer_date"]).dt.normalize()
+    ).dt.days
+
+    result = (
+        difference.groupby(orders["customer_state"], observed=True)
+        .mean()
+        .rename_axis("State")
+        .reset_index(name="Delivery_Difference")
+    )
+    # CAST AS INTEGER truncates toward zero
+    result["Delivery_Difference"] = np.trunc(result["Delivery_Difference"]).astype(
+        "int64"
+    )
+
+    return QueryResult(
+        query=QueryEnum.DELIVERY_DATE_DIFFERENCE.value,
+        result=_as_text(result).sort_values(
+            ["Delivery_Difference", "State"], ignore_index=True
+        ),
+    )
+
+
+def query_global_amount_order_status(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute global_amount_order_status.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = (
+        dataframes["olist_orders"]
+        .groupby("order_status", observed=True)
+        .size()
+        .reset_index(name="Amount")
+        .pipe(_as_text)
+    )
+
+    return QueryResult(query=QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value, result=result)
+
+
+def query_revenue_by_month_year(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute revenue_by_month_year.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    min_payments = (
+        dataframes["olist_order_payments"]
+        .groupby("order_id")["payment_value"]
+        .min()
+        .rename("min_payment")
+    )
+    orders = _delivered_orders(dataframes).join(
+        min_payments, on="order_id", how="inner"
+    )
+    delivered_at = _to_datetime(orders["order_delivered_customer_date"])
+
+    in_years = delivered_at.dt.year.isin(REVENUE_YEARS)
+    revenue = (
+        orders.loc[in_years, "min_payment"]
+        .groupby([delivered_at.dt.month[in_years], delivered_at.dt.year[in_years]])
+        .sum()
+        .unstack()
+        .reindex(index=range(1, 13), columns=REVENUE_YEARS)
+        .fillna(0.0)
+    )
+
+    result = DataFrame(
+        {
+            "month_no": _month_numbers(Series(range(1, 13))),
+            "month": MONTH_NAMES,
+        }
+    )
+    for year in REVENUE_YEARS:
+        result[f"Year{year}"] = from_cents(revenue[year]).to_numpy(dtype=float)
+
+    return QueryResult(query=QueryEnum.REVENUE_BY_MONTH_YEAR.value, result=result)
+
+
+def query_revenue_per_state(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute revenue_per_state.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    payments = (
+        _delivered_orders(dataframes)
+        .merge(dataframes["olist_customers"], on="customer_id")
+        .merge(dataframes["olist_order_payments"], on="order_id")
+    )
+
+    result = (
+        payments.groupby("customer_state", observed=True)["payment_value"]
+        .sum()
+        .reset_index(name="Revenue")
+        .pipe(_as_text)
+        .sort_values("Revenue", ascending=False, kind="stable", ignore_index=True)
+        .head(10)
+    )
+    result["Revenue"] = from_cents(result["Revenue"])
+
+    return QueryResult(query=QueryEnum.REVENUE_PER_STATE.value, result=result)
+
+
+def get_category_shares(dataframes: dict[str, DataFrame]) -> DataFrame:
+    """
+    Share the payments of each delivered order between its categories in proportion
+    to the price of their items, like the SQL of the category queries
+
+    Args:
+        dataframes (dict[str, DataFrame]): The orders, items, products, translation
+            and payments tables, or the rows of some orders of them
+
+    Returns:
+        DataFrame: The order_id, the Category and its share of the payments of the
+            order (Revenue), in cents, one row per category of each order
+    """
+    items = dataframes["olist_order_items"]
+    products = dataframes["olist_products"]
+    order_payments = (
+        dataframes["olist_order_payments"].groupby("order_id")["payment_value"].sum()
+    )
+    order_prices = items.groupby("order_id")["price"].sum().rename("order_price")
+
+    category_prices = (
+        items[["order_id", "product_id", "price"]]
+        .merge(
+            products.loc[
+                products["product_category_name"].notna(),
+                ["product_id", "product_category_name"],
+            ],
+            on="product_id",
+        )
+        .merge(
+            dataframes["product_category_name_translation"], on="product_category_name"
+        )
+        .groupby(["order_id", "product_category_name_english"], observed=True)["price"]
+        .sum()
+        .reset_index()
+    )
+    shares = (
+        _delivered_orders(dataframes)[["order_id"]]
+        .merge(category_prices, on="order_id")
+        .merge(order_prices.reset_index(), on="order_id")
+        .merge(order_payments.reset_index(), on="order_id")
+    )
+    shares["Revenue"] = shares["payment_value"] * (
+        shares["price"] / shares["order_price"]
+    )
+    return shares.rename(columns={"product_category_name_english": "Category"})[
+        ["order_id", "Category", "Revenue"]
+    ]
+
+
+def get_revenue_per_category(dataframes: dict[str, DataFrame]) -> DataFrame:
+    """
+    Get the number of delivered orders and the revenue of every category, like the
+    SQL: the payments of each order are summed once and shared between its categories
+    in proportion to the price of their items
+
+    Args:
+        dataframes (dict[str, DataFrame]): The orders, items, products, translation
+            and payments tables, or the rows of some orders of them
+
+    Returns:
+        DataFrame: The Category, Num_order and Revenue of each category, the revenue in cents
+    """
+    return (
+        get_category_shares(dataframes)
+        .groupby("Category", observed=True)
+        .agg(Num_order=("order_id", "size"), Revenue=("Revenue", "sum"))
+        .reset_index()
+    )
+
+
+def query_top_10_least_revenue_categories(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute top_10_least_revenue_categories.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = (
+        get_revenue_per_category(dataframes)
+        .sort_values("Revenue", ascending=True, kind="stable", ignore_index=True)
+        .head(10)
+    )
+    result["Revenue"] = from_cents(result["Revenue"])
+
+    return QueryResult(
+        query=QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value, result=result
+    )
+
+
+def query_top_10_revenue_categories(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute top_10_revenue_categories.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = (
+        get_revenue_per_category(dataframes)
+        .sort_values("Revenue", ascending=False, kind="stable", ignore_index=True)
+        .head(10)
+    )
+    result["Revenue"] = from_cents(result["Revenue"])
+
+    return QueryResult(query=QueryEnum.TOP_10_REVENUE_CATEGORIES.value, result=result)
+
+
+def query_real_vs_estimated_delivered_time(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute real_vs_estimated_delivered_time.sql on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    orders = _delivered_orders(dataframes)
+    purchased_at = _to_datetime(orders["order_purchase_timestamp"])
+    times = DataFrame(
+        {
+            "month": purchased_at.dt.month,
+            "year": purchased_at.dt.year,
+            "real_time": (
+                _to_datetime(orders["order_delivered_customer_date"]) - purchased_at
+            )
+            / Timedelta(days=1),
+            "estimated_time": (
+                _to_datetime(orders["order_estimated_delivery_date"]) - purchased_at
+            )
+            / Timedelta(days=1),
+        }
+    )
+
+    # Every month with delivered orders gets a row, even without orders in these years
+    averages = (
+        times[times["year"].isin(REVENUE_YEARS)]
+        .groupby(["month", "year"])[["real_time", "estimated_time"]]
+        .mean()
+        .unstack()
+        .reindex(index=np.sort(times["month"].unique()))
+    )
+
+    result = DataFrame(
+        {
+            "month_no": _month_numbers(Series(averages.index)),
+            "month": [MONTH_NAMES[month - 1] for month in averages.index],
+        }
+    )
+    for kind in ["real_time", "estimated_time"]:
+        for year in REVENUE_YEARS:
+            column = (kind, year)
+            result[f"Year{year}_{kind}"] = (
+                averages[column].to_numpy() if column in averages else np.nan
+            )
+
+    return QueryResult(
+        query=QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value, result=result
+    )
+
+
+def query_orders_per_day_and_holidays_2017(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute the orders per day of 2017 and their holidays on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = get_orders_per_day_and_holidays_2017(
+        dataframes["olist_orders"], dataframes["public_holidays"]
+    )
+
+    return QueryResult(
+        query=QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value, result=result
+    )
+
+
+def query_freight_value_weight_relationship(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute the freight value and weight of each delivered order on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = get_freight_value_weight_relationship(
+        dataframes["olist_orders"],
+        dataframes["olist_order_items"],
+        dataframes["olist_products"],
+    )
+    if ID_DICTIONARY_TABLE in dataframes:
+        result = decode_order_ids(result, dataframes[ID_DICTIONARY_TABLE])
+
+    return QueryResult(
+        query=QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value, result=result
+    )
+
+
+def query_freight_value_distance_relationship(
+    dataframes: dict[str, DataFrame],
+) -> QueryResult:
+    """
+    Compute the customer to seller distance and the freight value of each delivered item on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    geolocation = dataframes.get(COMPACTED_GEOLOCATION_TABLE)
+    if geolocation is None:
+        geolocation = dataframes[GEOLOCATION_TABLE]
+
+    result = get_freight_value_distance_relationship(
+        dataframes["olist_orders"],
+        dataframes["olist_order_items"],
+        dataframes["olist_customers"],
+        dataframes["olist_sellers"],
+        geolocation,
+    )
+
+    return QueryResult(
+        query=QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value, result=result
+    )
+
+
+def query_customer_rfm_segments(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute customer_rfm_segments.sql and its segments on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = summarize_rfm_scores(get_rfm_scores(_customer_orders(dataframes)))
+
+    return QueryResult(query=QueryEnum.CUSTOMER_RFM_SEGMENTS.value, result=result)
+
+
+def query_customer_cohort_retention(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute customer_cohort_retention.sql and its retention rates on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    result = summarize_cohorts(get_cohort_activity(_customer_orders(dataframes)))
+
+    return QueryResult(query=QueryEnum.CUSTOMER_COHORT_RETENTION.value, result=result)
+
+
+def query_holiday_impact(dataframes: dict[str, DataFrame]) -> QueryResult:
+    """
+    Compute holiday_impact.sql and the windows around the holidays on the extracted tables
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    volume = OrderVolume.from_timestamps(
+        dataframes["olist_orders"]["order_purchase_timestamp"]
+    )
+    result = volume.holiday_impact(dataframes["public_holidays"])
+
+    return QueryResult(query=QueryEnum.HOLIDAY_IMPACT.value, result=result)
+
+
+def get_query_mapping() -> dict[str, Callable[[dict[str, DataFrame]], QueryResult]]:
+    """
+    Get the mapping between the query names and the in-memory query functions
+
+    Returns:
+        dict[str, Callable[[dict[str, DataFrame]], QueryResult]]: The dictionary with keys as the QueryEnum values and values as the queries
+    """
+    return {
+        QueryEnum.DELIVERY_DATE_DIFFERENCE.value: query_delivery_date_difference,
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value: query_global_amount_order_status,
+        QueryEnum.REVENUE_BY_MONTH_YEAR.value: query_revenue_by_month_year,
+        QueryEnum.REVENUE_PER_STATE.value: query_revenue_per_state,
+        QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value: query_top_10_least_revenue_categories,
+        QueryEnum.TOP_10_REVENUE_CATEGORIES.value: query_top_10_revenue_categories,
+        QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value: query_real_vs_estimated_delivered_time,
+        QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value: query_orders_per_day_and_holidays_2017,
+        QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value: query_freight_value_weight_relationship,
+        QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value: query_freight_value_distance_relationship,
+        QueryEnum.CUSTOMER_RFM_SEGMENTS.value: query_customer_rfm_segments,
+        QueryEnum.CUSTOMER_COHORT_RETENTION.value: query_customer_cohort_retention,
+        QueryEnum.HOLIDAY_IMPACT.value: query_holiday_impact,
+    }
+
+
+def run_queries(
+    dataframes: dict[str, DataFrame],
+    on_result: Callable[[QueryResult], None] | None = None,
+    queries: list[str] | None = None,
+) -> dict[str, DataFrame]:
+    """
+    Run the queries directly on the extracted tables, without a database. The
+    results are the same as the ones of src.transform.run_queries
+
+    Args:
+        dataframes (dict[str, DataFrame]): The tables returned by extract
+        on_result (Callable[[QueryResult], None], optional): Called with each query result as soon as it is ready
+        queries (list[str], optional): The names of the queries to run. Defaults to all the queries
+
+    Returns:
+        dict[str, DataFrame]: A dictionary with keys as the query filenames and values the result of the query as a dataframe
+    """
+    query_results = {}
+    query_mapping = get_query_mapping()
+
+    for query_name in queries if queries is not None else query_mapping:
+        query_result = query_mapping[query_name](dataframes)
+        query_results[query_result.query] = query_result.result
+        if on_result is not None:
+            on_result(query_result)
+
+    return query_results
@@ -0,0 +1,566 @@
+import json
+from collections.abc import Hashable, Iterable
+
+from pandas import DataFrame, Index, concat, read_sql, to_datetime
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.base import Engine
+
+from src.encoding import ID_DICTIONARY_TABLE, decode_ids, read_id_dictionary
+from src.utils.money import from_cents
+
+# One row per seller with delivered orders, with the sums its metrics are made of
+SELLER_METRICS_TABLE = "seller_metrics"
+SELLER_METRICS_COLUMNS = [
+    "orders",
+    "on_time_orders",
+    "revenue",
+    "freight",
+    "review_score_sum",
+    "reviews",
+]
+
+# One row per direction, with the board of the sellers ranked first by revenue
+SELLER_LEADERBOARD_TABLE = "seller_leaderboard"
+LEADERBOARD_DIRECTIONS = {"top": True, "bottom": False}
+
+# The columns of read_seller_leaderboard
+LEADERBOARD_COLUMNS = [
+    "Rank",
+    "Seller",
+    "City",
+    "State",
+    "Orders",
+    "Revenue",
+    "On-time rate",
+    "Review score",
+    "Freight ratio",
+]
+
+# The largest N served; the boards keep as many sellers again as slack, so the
+# sellers falling behind during updates rarely leave fewer than N
+MAX_LEADERBOARD_SIZE = 50
+LEADERBOARD_CAPACITY = 2 * MAX_LEADERBOARD_SIZE
+
+# Reloading any of these tables makes the metrics stale
+LEADERBOARD_SOURCE_TABLES = ["olist_orders", "olist_order_items", "olist_order_reviews"]
+
+
+class BoundedTopK:
+    """
+    The `capacity` first keys of a changing set, ranked by score, then by key.
+    Every key left out ranks after the threshold, the last key ranked that did not
+    fit, so the board holds the exact top of the set without sorting it again.
+    A key whose score changes is compared to the threshold only: it enters the
+    board if it ranks before it, and leaves it if it falls behind, since a key
+    left out may now rank before it. The board shrinks as keys leave it, and is
+    refilled from the whole set once it holds fewer keys than are needed.
+    The board is sorted on the first top after a change, and kept sorted until
+    the next one
+    """
+
+    def __init__(self, capacity: int, descending: bool = True) -> None:
+        self.capacity = capacity
+        self.descending = descending
+        self._scores: dict[Hashable, float] = {}
+        # None while the board holds every key of the set
+        self._threshold: tuple | None = None
+        # The keys and scores of the board in rank order, None until top sorts them
+        self._ranked: list[tuple[Hashable, float]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _rank(self, key: Hashable, score: float) -> tuple:
+        return (-score if self.descending else score, key)
+
+    def update(self, key: Hashable, score: float | None) -> None:
+        """
+        Set the score of a key, in constant time unless it evicts a key
+
+        Args:
+            key (Hashable): The key
+            score (float | None): Its new score, None if it left the set
+        """
+        if score is None:
+            if self._scores.pop(key, None) is not None:
+                self._ranked = None
+            return
+
+        rank = self._rank(key, score)
+        if self._threshold is not None and rank > self._threshold:
+            if self._scores.pop(key, None) is not None:
+                self._ranked = None
+            return
+
+        if self._scores.get(key) == score:
+            return
+        self._scores[key] = score
+        self._ranked = None
+        if len(self._scores) > self.capacity:
+            evicted = max(
+                self._scores, key=lambda key: self._rank(key, self._scores[key])
+            )
+            self._threshold = self._rank(evicted, self._scores.pop(evicted))
+
+    def refill(self, ranked: Iterable[tuple[Hashable, float]]) -> None:
+        """
+        Replace the board with the first keys of the whole set
+
+        Args:
+            ranked (Iterable[tuple[Hashable, float]]): The keys and scores of the set,
+                in their rank order, at least the first capacity + 1 of them
+        """
+        ranked = list(ranked)
+        self._scores = dict(ranked[: self.capacity])
+        # Already in rank order
+        self._ranked = list(self._scores.items())
+        self._threshold = None
+        if len(ranked) > self.capacity:
+            self._threshold = self._rank(*ranked[self.capacity])
+
+    def is_complete(self, n: int) -> bool:
+        """
+        Check whether the board holds the first n keys of the set, or every key
+
+        Args:
+            n (int): The number of keys needed
+
+        Returns:
+            bool: Whether top can return the first n keys
+        """
+        return self._threshold is None or len(self._scores) >= n
+
+    def top(self, n: int) -> list[tuple[Hashable, float]]:
+        """
+        Get the first keys of the board
+
+        Args:
+            n (int): The number of keys
+
+        Returns:
+            list[tuple[Hashable, float]]: Up to n keys and their scores, in rank order
+        """
+        if self._ranked is None:
+            self._ranked = sorted(
+                self._scores.items(), key=lambda item: self._rank(*item)
+            )
+        return self._ranked[:n]
+
+    def to_json(self) -> str:
+        """
+        Serialize the board
+
+        Returns:
+            str: The capacity, the direction, the keys and scores and the threshold as JSON
+        """
+        threshold = None
+        if self._threshold is not None:
+            score, key = self._threshold
+            threshold = [key, -score if self.descending else score]
+        return json.dumps(
+            {
+                "capacity": self.capacity,
+                "descending": self.descending,
+                "scores": [[key, score] for key, score in self._scores.items()],
+                "threshold": threshold,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, serialized: str) -> "BoundedTopK":
+        """
+        Deserialize a board written by to_json
+
+        Args:
+            serialized (str): The JSON
+
+        Returns:
+            BoundedTopK: The board
+        """
+        state = json.loads(serialized)
+        board = cls(state["capacity"], state["descending"])
+        board._scores = {key: score for key, score in state["scores"]}
+        if state["threshold"] is not None:
+            board._threshold = board._rank(*state["threshold"])
+        return board
+
+
+def get_seller_metrics(dataframes: dict[str, DataFrame]) -> DataFrame:
+    """
+    Sum the metrics of each seller over the delivered orders holding its items.
+    The sums add up over any split of the orders, so the metrics of a batch of
+    orders can be added to or subtracted from the stored ones
+
+    Args:
+        dataframes (dict[str, DataFrame]): The olist_orders, olist_order_items and
+            olist_order_reviews rows, the money in cents
+
+    Returns:
+        DataFrame: The seller_id and, over its delivered orders, the number of orders,
+            of orders delivered by the estimated date (on_time_orders), the revenue
+            and freight of its items in cents, and the sum and number of the review
+            scores of the orders, sorted by seller_id
+    """
+    orders = dataframes["olist_orders"]
+    orders = orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ]
+    delivered = to_datetime(orders["order_delivered_customer_date"], format="ISO8601")
+    estimated = to_datetime(orders["order_estimated_delivery_date"], format="ISO8601")
+    on_time = (delivered.dt.normalize() <= estimated).to_numpy()
+    order_ids = Index(orders["order_id"])
+
+    items = dataframes["olist_order_items"]
+    items = items[order_ids.get_indexer(items["order_id"]) >= 0]
+    sales = (
+        DataFrame(
+            {
+                "order_id": items["order_id"].to_numpy(),
+                "seller_id": items["seller_id"].to_numpy(),
+                "revenue": items["price"].astype("int64").to_numpy(),
+                "freight": items["freight_value"].astype("int64").to_numpy(),
+            }
+        )
+        .groupby(["order_id", "seller_id"], sort=False)
+        .sum()
+        .reset_index()
+    )
+    sales["on_time_orders"] = on_time[order_ids.get_indexer(sales["order_id"])].astype(
+        "int64"
+    )
+
+    # Each review of an order counts for every seller of the order
+    reviews = dataframes["olist_order_reviews"]
+    scores = reviews.groupby("order_id", sort=False)["review_score"].agg(
+        ["sum", "size"]
+    )
+    review_rows = scores.index.get_indexer(sales["order_id"])
+    found = review_rows >= 0
+    sales["review_score_sum"] = 0
+    sales["reviews"] = 0
+    sales.loc[found, "review_score_sum"] = scores["sum"].to_numpy()[review_rows[found]]
+    sales.loc[found, "reviews"] = scores["size"].to_numpy()[review_rows[found]]
+
+    sales["orders"] = 1
+    return (
+        sales.groupby("seller_id", sort=True)[SELLER_METRICS_COLUMNS]
+        .sum()
+        .astype("int64")
+        .reset_index()
+    )
+
+
+def _read_rows(
+    connection: Engine | Connection, table_name: str, column: str, values: Iterable
+) -> DataFrame:
+    # tolist gives Python scalars, SQLite would bind numpy integers as blobs
+    values = Index(values).tolist()
+    if not values:
+        return read_sql(text(f"SELECT * FROM {table_name} LIMIT 0"), connection)
+
+    query = text(f"SELECT * FROM {table_name} WHERE {column} IN :values").bindparams(
+        bindparam("values", expanding=True)
+    )
+    return read_sql(query, connection, params={"values": values})
+
+
+def _insert_metrics(connection: Connection, metrics: DataFrame) -> None:
+    if metrics.empty:
+        return
+    columns = ["seller_id", *SELLER_METRICS_COLUMNS]
+    if connection.dialect.name == "duckdb":
+        # DuckDB scans the DataFrame, inserting row by row is slow there
+        duckdb_connection = connection.connection.driver_connection
+        duckdb_connection.register("metrics", metrics[columns])
+        duckdb_connection.execute(
+            f"INSERT INTO {SELLER_METRICS_TABLE} SELECT * FROM metrics"
+        )
+        duckdb_connection.unregister("metrics")
+        return
+
+    connection.execute(
+        text(
+            f"INSERT INTO {SELLER_METRICS_TABLE} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(f':{column}' for column in columns)})"
+        ),
+        metrics[columns].astype(object).to_dict("records"),
+    )
+
+
+def _rank_sellers(connection: Connection, descending: bool) -> list[tuple]:
+    # The index on revenue lets SQLite read the first rows without sorting the table
+    order = "DESC" if descending else "ASC"
+    rows = connection.execute(
+        text(
+            f"SELECT seller_id, revenue FROM {SELLER_METRICS_TABLE} "
+            f"ORDER BY revenue {order}, seller_id LIMIT :limit"
+        ),
+        {"limit": LEADERBOARD_CAPACITY + 1},
+    )
+    return [(seller_id, int(revenue)) for seller_id, revenue in rows]
+
+
+def _read_boards(connection: Engine | Connection) -> dict[str, BoundedTopK]:
+    rows = read_sql(
+        text(f"SELECT direction, board FROM {SELLER_LEADERBOARD_TABLE}"), connection
+    )
+    return {
+        direction: BoundedTopK.from_json(board)
+        for direction, board in rows.itertuples(index=False)
+    }
+
+
+def _write_boards(connection: Connection, boards: dict[str, BoundedTopK]) -> None:
+    connection.execute(text(f"DELETE FROM {SELLER_LEADERBOARD_TABLE}"))
+    connection.execute(
+        text(
+            f"INSERT INTO {SELLER_LEADERBOARD_TABLE} (direction, board) "
+            "VALUES (:direction, :board)"
+        ),
+        [
+            {"direction": direction, "board": board.to_json()}
+            for direction, board in boards.items()
+        ],
+    )
+
+
+def has_seller_leaderboard(database: Engine | Connection) -> bool:
+    """
+    Check whether the seller metrics and leaderboard are in the database
+
+    Args:
+        database (Engine | Connection): The database
+
+    Returns:
+        bool: Whether both tables exist
+    """
+    tables = set(inspect(database).get_table_names())
+    return {SELLER_METRICS_TABLE, SELLER_LEADERBOARD_TABLE} <= tables
+
+
+def build_seller_leaderboard(database: Engine) -> None:
+    """
+    Compute the metrics of every seller and rank the top and bottom sellers by
+    revenue, replacing the existing tables
+
+    Args:
+        database (Engine): The database holding the orders, items and reviews
+
+    Returns:
+        None
+    """
+    with database.begin() as connection:
+        dataframes = {
+            "olist_orders": read_sql(
+                text(
+                    "SELECT order_id, order_status, order_delivered_customer_date, "
+                    "order_estimated_delivery_date FROM olist_orders"
+                ),
+                connection,
+            ),
+            "olist_order_items": read_sql(
+                text(
+                    "SELECT order_id, seller_id, price, freight_value FROM olist_order_items"
+                ),
+                connection,
+            ),
+            "olist_order_reviews": read_sql(
+                text("SELECT order_id, review_score FROM olist_order_reviews"),
+                connection,
+            ),
+        }
+        metrics = get_seller_metrics(dataframes)
+        seller_type = "BIGINT" if metrics["seller_id"].dtype != object else "VARCHAR"
+
+        connection.execute(text(f"DROP TABLE IF EXISTS {SELLER_METRICS_TABLE}"))
+        connection.execute(
+            text(
+                f"CREATE TABLE {SELLER_METRICS_TABLE} (seller_id {seller_type}, "
+                + ", ".join(f"{column} BIGINT" for column in SELLER_METRICS_COLUMNS)
+                + ")"
+            )
+        )
+        if connection.dialect.name == "sqlite":
+            for column in ("seller_id", "revenue"):
+                connection.execute(
+                    text(
+                        f"CREATE INDEX ix_{SELLER_METRICS_TABLE}_{column} "
+                        f"ON {SELLER_METRICS_TABLE} ({column})"
+                    )
+                )
+        _insert_metrics(connection, metrics)
+
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {SELLER_LEADERBOARD_TABLE} "
+                "(direction VARCHAR, board VARCHAR)"
+            )
+        )
+        boards = {}
+        for direction, descending in LEADERBOARD_DIRECTIONS.items():
+            boards[direction] = BoundedTopK(LEADERBOARD_CAPACITY, descending)
+            boards[direction].refill(_rank_sellers(connection, descending))
+        _write_boards(connection, boards)
+
+
+def drop_seller_leaderboard(
+    database: Engine, table_names: Iterable[str] | None = None
+) -> None:
+    """
+    Drop the seller metrics and leaderboard, when they are stale
+
+    Args:
+        database (Engine): The database
+        table_names (Iterable[str], optional): The tables that were reloaded. The
+            leaderboard is only dropped if one of them is a source of the metrics.
+            Defaults to None, the leaderboard is always dropped
+
+    Returns:
+        None
+    """
+    if table_names is not None and not set(table_names) & set(
+        LEADERBOARD_SOURCE_TABLES
+    ):
+        return
+
+    with database.begin() as connection:
+        for table_name in (SELLER_METRICS_TABLE, SELLER_LEADERBOARD_TABLE):
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+
+
+def update_seller_leaderboard(
+    connection: Connection,
+    before_tables: dict[str, DataFrame],
+    after_tables: dict[str, DataFrame],
+) -> None:
+    """
+    Update the metrics of the sellers of some orders, read before and after they
+    changed, and move these sellers on the boards. The metrics of the orders before
+    are subtracted and the ones after are added, so only the rows of these sellers
+    are read and written. Each board compares them to its threshold, and is only
+    ranked again from the metrics table when too many sellers fell behind it
+
+    Args:
+        connection (Connection): The connection of the transaction that changed the orders
+        before_tables (dict[str, DataFrame]): The olist_orders and olist_order_items
+            rows of the orders before
+        after_tables (dict[str, DataFrame]): The same rows after
+
+    Returns:
+        None
+    """
+    # A batch does not hold reviews, the orders have the same before and after
+    order_ids = concat(
+        [
+            before_tables["olist_orders"]["order_id"],
+            after_tables["olist_orders"]["order_id"],
+        ]
+    ).unique()
+    reviews = _read_rows(connection, "olist_order_reviews", "order_id", order_ids)
+    before = get_seller_metrics({**before_tables, "olist_order_reviews": reviews})
+    after = get_seller_metrics({**after_tables, "olist_order_reviews": reviews})
+    seller_ids = Index(concat([before["seller_id"], after["seller_id"]])).unique()
+    if seller_ids.empty:
+        return
+
+    current = _read_rows(connection, SELLER_METRICS_TABLE, "seller_id", seller_ids)
+    before[SELLER_METRICS_COLUMNS] *= -1
+    metrics = (
+        concat([current, after, before], ignore_index=True)
+        .groupby("seller_id", sort=True)[SELLER_METRICS_COLUMNS]
+        .sum()
+        .astype("int64")
+    )
+    # A seller without delivered orders left is not ranked, like it was never stored
+    metrics = metrics[metrics["orders"] != 0].reset_index()
+
+    connection.execute(
+        text(
+            f"DELETE FROM {SELLER_METRICS_TABLE} WHERE seller_id IN :values"
+        ).bindparams(bindparam("values", expanding=True)),
+        {"values": seller_ids.tolist()},
+    )
+    _insert_metrics(connection, metrics)
+
+    revenues = dict(zip(metrics["seller_id"].tolist(), metrics["revenue"].tolist()))
+    boards = _read_boards(connection)
+    for direction, board in boards.items():
+        for seller_id in seller_ids.tolist():
+            board.update(seller_id, revenues.get(seller_id))
+        if not board.is_complete(MAX_LEADERBOARD_SIZE):
+            board.refill(_rank_sellers(connection, board.descending))
+    _write_boards(connection, boards)
+
+
+def read_seller_leaderboard(
+    database: Engine, n: int = 10, direction: str = "top"
+) -> DataFrame:
+    """
+    Get the top or bottom sellers by revenue with their metrics. Only the n sellers
+    of the board are read, whatever the number of sellers. The database is never
+    written to, the pipeline and the snapshot build the leaderboard with the tables
+
+    Args:
+        database (Engine): The database holding the leaderboard
+        n (int, optional): The number of sellers, up to MAX_LEADERBOARD_SIZE. Defaults to 10
+        direction (str, optional): "top" for the highest revenues first, "bottom" for
+            the lowest first. Defaults to "top"
+
+    Raises:
+        ValueError: If n or the direction is out of range
+
+    Returns:
+        DataFrame: The Rank, Seller id, City and State, delivered Orders, Revenue
+            (reais), On-time rate, average Review score (NaN without reviews) and
+            Freight ratio (freight over revenue) of each seller, in rank order.
+            Empty if the database has no leaderboard
+    """
+    if direction not in LEADERBOARD_DIRECTIONS:
+        raise ValueError(
+            f"Unknown direction {direction!r}, expected one of {list(LEADERBOARD_DIRECTIONS)}"
+        )
+    if not 0 < n <= MAX_LEADERBOARD_SIZE:
+        raise ValueError(f"Expected 1 to {MAX_LEADERBOARD_SIZE} sellers, got {n}")
+    if not has_seller_leaderboard(database):
+        return DataFrame(columns=LEADERBOARD_COLUMNS)
+
+    ranked = _read_boards(database)[direction].top(n)
+    seller_ids = [seller_id for seller_id, _ in ranked]
+    metrics = (
+        _read_rows(database, SELLER_METRICS_TABLE, "seller_id", seller_ids)
+        .set_index("seller_id")
+        .reindex(seller_ids)
+    )
+    sellers = (
+        _read_rows(database, "olist_sellers", "seller_id", seller_ids)
+        .drop_duplicates("seller_id")
+        .set_index("seller_id")
+        .reindex(seller_ids)
+    )
+
+    seller_column = metrics.index.to_series()
+    if ID_DICTIONARY_TABLE in inspect(database).get_table_names():
+        seller_column = decode_ids(
+            seller_column, "seller_id", read_id_dictionary(database, "seller_id")
+        )
+    revenue = from_cents(metrics["revenue"])
+    return DataFrame(
+        {
+            "Rank": range(1, len(ranked) + 1),
+            "Seller": seller_column.to_numpy(),
+            "City": sellers["seller_city"].astype(object).to_numpy(),
+            "State": sellers["seller_state"].astype(object).to_numpy(),
+            "Orders": metrics["orders"].to_numpy(),
+            "Revenue": revenue.to_numpy(),
+            "On-time rate": (metrics["on_time_orders"] / metrics["orders"]).to_numpy(),
+            "Review score": (
+                metrics["review_score_sum"]
+                / metrics["reviews"].where(metrics["reviews"] > 0)
+            ).to_numpy(),
+            "Freight ratio": (
+                from_cents(metrics["freight"]) / revenue.where(revenue > 0)
+            ).to_numpy(),
+        }
+    )
@@ -0,0 +1,190 @@
+import re
+import uuid
+from typing import Iterable
+
+from pandas import read_sql
+from sqlalchemy import inspect, text
+from sqlalchemy.engine.base import Engine
+
+from src.compaction import COMPACTED_GEOLOCATION_TABLE, GEOLOCATION_TABLE
+from src.encoding import ID_DICTIONARY_TABLE
+from src.transform import QueryEnum
+
+# One row per table, with a new random id each time the table is loaded
+TABLE_LOADS_TABLE = "table_loads"
+
+_CTE_PATTERN = re.compile(r"\b(\w+)\s+AS\s*\(", re.IGNORECASE)
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.IGNORECASE)
+_COMMENT_PATTERN = re.compile(r"--[^\n]*")
+
+
+def get_query_tables() -> dict[str, list[str]]:
+    """
+    Get the tables each query reads, whatever its implementation
+
+    Returns:
+        dict[str, list[str]]: The dictionary with keys as the query names and values as the tables they read
+    """
+    return {
+        QueryEnum.DELIVERY_DATE_DIFFERENCE.value: ["olist_orders", "olist_customers"],
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value: ["olist_orders"],
+        QueryEnum.REVENUE_BY_MONTH_YEAR.value: [
+            "olist_orders",
+            "olist_order_payments",
+        ],
+        QueryEnum.REVENUE_PER_STATE.value: [
+            "olist_orders",
+            "olist_customers",
+            "olist_order_payments",
+        ],
+        QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value: [
+            "olist_orders",
+            "olist_order_items",
+            "olist_products",
+            "product_category_name_translation",
+            "olist_order_payments",
+        ],
+        QueryEnum.TOP_10_REVENUE_CATEGORIES.value: [
+            "olist_orders",
+            "olist_order_items",
+            "olist_products",
+            "product_category_name_translation",
+            "olist_order_payments",
+        ],
+        QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value: ["olist_orders"],
+        QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value: [
+            "olist_orders",
+            "public_holidays",
+        ],
+        # The order ids are decoded with the dictionary when they are encoded
+        QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value: [
+            "olist_orders",
+            "olist_order_items",
+            "olist_products",
+            ID_DICTIONARY_TABLE,
+        ],
+        # The centroids come from whichever geolocation table is stored
+        QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value: [
+            "olist_orders",
+            "olist_order_items",
+            "olist_customers",
+            "olist_sellers",
+            COMPACTED_GEOLOCATION_TABLE,
+            GEOLOCATION_TABLE,
+        ],
+        QueryEnum.CUSTOMER_RFM_SEGMENTS.value: [
+            "olist_orders",
+            "olist_customers",
+            "olist_order_payments",
+        ],
+        QueryEnum.CUSTOMER_COHORT_RETENTION.value: [
+            "olist_orders",
+            "olist_customers",
+            "olist_order_payments",
+        ],
+        QueryEnum.HOLIDAY_IMPACT.value: ["olist_orders", "public_holidays"],
+    }
+
+
+def read_sql_tables(sql: str) -> set[str]:
+    """
+    Get the tables a SQL query reads, the names after FROM and JOIN that are not
+    common table expressions
+
+    Args:
+        sql (str): The query
+
+    Returns:
+        set[str]: The table names
+    """
+    sql = _COMMENT_PATTERN.sub("", sql)
+    common_tables = set(_CTE_PATTERN.findall(sql))
+    return set(_TABLE_PATTERN.findall(sql)) - common_tables
+
+
+def get_affected_queries(table_names: Iterable[str]) -> list[str]:
+    """
+    Get the queries whose result may change when the given tables change
+
+    Args:
+        table_names (Iterable[str]): The tables that changed
+
+    Returns:
+        list[str]: The names of the queries that read any of them, in the order of QueryEnum
+    """
+    table_names = set(table_names)
+    return [
+        query_name
+        for query_name, tables in get_query_tables().items()
+        if table_names.intersection(tables)
+    ]
+
+
+def record_table_loads(database: Engine, table_names: Iterable[str]) -> None:
+    """
+    Give the tables a new load id, so whatever was computed from their previous
+    content can tell it is stale
+
+    Args:
+        database (Engine): The database the tables were loaded into
+        table_names (Iterable[str]): The tables that were loaded
+
+    Returns:
+        None
+    """
+    with database.begin() as connection:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_LOADS_TABLE} "
+                "(table_name VARCHAR PRIMARY KEY, load_id VARCHAR)"
+            )
+        )
+        for table_name in table_names:
+            connection.execute(
+                text(f"DELETE FROM {TABLE_LOADS_TABLE} WHERE table_name = :table_name"),
+                {"table_name": table_name},
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {TABLE_LOADS_TABLE} (table_name, load_id) "
+                    "VALUES (:table_name, :load_id)"
+                ),
+                {"table_name": table_name, "load_id": uuid.uuid4().hex},
+            )
+
+
+def read_table_loads(database: Engine) -> dict[str, str]:
+    """
+    Read the load id of every table
+
+    Args:
+        database (Engine): The database
+
+    Returns:
+        dict[str, str]: The load id of each table, empty if the database has none
+    """
+    if TABLE_LOADS_TABLE not in inspect(database).get_table_names():
+        return {}
+
+    loads = read_sql(
+        text(f"SELECT table_name, load_id FROM {TABLE_LOADS_TABLE}"), database
+    )
+    return dict(zip(loads["table_name"], loads["load_id"]))
+
+
+def get_changed_tables(previous: dict[str, str], current: dict[str, str]) -> set[str]:
+    """
+    Get the tables loaded since the previous load ids were read
+
+    Args:
+        previous (dict[str, str]): The load ids read before
+        current (dict[str, str]): The load ids read now
+
+    Returns:
+        set[str]: The tables whose load id changed, appeared or disappeared
+    """
+    return {
+        table_name
+        for table_name in previous.keys() | current.keys()
+        if previous.get(table_name) != current.get(table_name)
+    }
@@ -1,17 +1,230 @@
-from pandas import DataFrame
+from typing import Callable, Iterable
+
+from pandas import CategoricalDtype, DataFrame
+from sqlalchemy import Integer, inspect, text
 from sqlalchemy.engine.base import Engine
 
+from src.config import get_money_columns
+
+from src.lineage import record_table_loads
+from src.materializations import build_materializations, drop_materializations
+
+
+def get_table_indexes() -> dict[str, list[str]]:
+    """
+    Get the columns to index on each table, the keys the queries join and filter on
+
+    Returns:
+        dict[str, list[str]]: The dictionary with keys as the table names and values as the indexed columns
+    """
+    return {
+        "olist_customers": ["customer_id", "customer_state"],
+        "olist_orders": ["order_id", "customer_id", "order_status"],
+        "olist_order_items": ["order_id", "product_id"],
+        "olist_order_payments": ["order_id"],
+        "olist_order_reviews": ["order_id"],
+        "olist_products": ["product_id", "product_category_name"],
+        "product_category_name_translation": ["product_category_name"],
+        "id_dictionary": ["id_column"],
+    }
+
+
+def create_indexes(database: Engine) -> None:
+    """
+    Create the indexes of the loaded tables. Tables that are not in the database are skipped.
+    Only SQLite databases are indexed, DuckDB scans columns and does not need them
+
+    Args:
+        database (Engine): The database to create the indexes in
+
+    Returns:
+        None
+    """
+    if database.dialect.name != "sqlite":
+        return
+
+    tables = set(inspect(database).get_table_names())
+
+    with database.begin() as connection:
+        for table_name, columns in get_table_indexes().items():
+            if table_name not in tables:
+                continue
+            for column in columns:
+                connection.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{column} "
+                        f"ON {table_name} ({column})"
+                    )
+                )
+
+
+def has_stale_money_columns(database: Engine) -> bool:
+    """
+    Check whether the database stores the money as reais, like the loader did before it
+    stored integer cents. The queries divide the money by 100, so such a database must
+    be loaded again. Tables that are not in the database are skipped
+
+    Args:
+        database (Engine): The database to check
+
+    Returns:
+        bool: Whether a monetary column of get_money_columns is not an integer column
+    """
+    inspector = inspect(database)
+    tables = set(inspector.get_table_names())
+
+    for table_name, money_columns in get_money_columns().items():
+        if table_name not in tables:
+            continue
+        column_types = {
+            column["name"]: column["type"]
+            for column in inspector.get_columns(table_name)
+        }
+        for column in money_columns:
+            if column in column_types and not isinstance(column_types[column], Integer):
+                return True
+    return False
+
+
+def _get_categorical_columns(dataframe: DataFrame) -> list[str]:
+    return [
+        column
+        for column, dtype in dataframe.dtypes.items()
+        if isinstance(dtype, CategoricalDtype)
+    ]
+
+
+def _write_duckdb_chunk(
+    chunk: DataFrame, table_name: str, database: Engine, replace: bool
+) -> None:
+    # Each chunk has its own categories, so categoricals are written as text and
+    # turned into enums once the table is complete
+    casts = ", ".join(
+        f'CAST("{column}" AS VARCHAR) AS "{column}"'
+        for column in _get_categorical_columns(chunk)
+    )
+    select = (
+        f"SELECT * REPLACE ({casts}) FROM chunk" if casts else "SELECT * FROM chunk"
+    )
+
+    # DuckDB scans the registered DataFrame in place instead of inserting row by row
+    with database.begin() as connection:
+        duckdb_connection = connection.connection.driver_connection
+        duckdb_connection.register("chunk", chunk)
+        if replace:
+            duckdb_connection.execute(
+                f"CREATE OR REPLACE TABLE {table_name} AS {select}"
+            )
+        else:
+            duckdb_connection.execute(f"INSERT INTO {table_name} {select}")
+        duckdb_connection.unregister("chunk")
+
+
+def _create_duckdb_enums(table_name: str, columns: list[str], database: Engine) -> None:
+    # An enum stores a small integer per row and the sorted distinct values once
+    with database.begin() as connection:
+        duckdb_connection = connection.connection.driver_connection
+        for column in columns:
+            enum_name = f"{table_name}_{column}"
+            duckdb_connection.execute(f"DROP TYPE IF EXISTS {enum_name}")
+            duckdb_connection.execute(
+                f'CREATE TYPE {enum_name} AS ENUM (SELECT DISTINCT "{column}" '
+                f'FROM {table_name} WHERE "{column}" IS NOT NULL ORDER BY 1)'
+            )
+            duckdb_connection.execute(
+                f'ALTER TABLE {table_name} ALTER COLUMN "{column}" SET DATA TYPE {enum_name}'
+            )
+
+
+def load_chunks(
+    chunks: Iterable[tuple[str, DataFrame]],
+    database: Engine,
+    on_progress: Callable[[str, int], None] | None = None,
+    rebuild_materializations: bool = True,
+) -> None:
+    """
+    Load the chunks into the database as they arrive. The first chunk of a table
+    replaces it, the next ones are appended. Each chunk is released once written.
+    In DuckDB, the categorical columns become enums after the last chunk of their table.
+    The materializations of src/materializations.py are dropped if a table they
+    summarize is reloaded, and the ones the database had are built again from the new
+    tables. Every loaded table gets a new load id in the table_loads table
+
+    Args:
+        chunks (Iterable[tuple[str, DataFrame]]): The table names and chunks, as yielded by
+            iter_extract. The chunks of a table must follow each other
+        database (Engine): The database to load the chunks into
+        on_progress (Callable[[str, int], None], optional): Called with the table name and
+            the number of rows after the last chunk of each table is loaded
+        rebuild_materializations (bool, optional): Whether to build the dropped
+            materializations again. The pipeline builds them in its own steps, once
+            every table is loaded. Defaults to True
+
+    Returns:
+        None
+    """
+    current_table, rows, categorical_columns = None, 0, []
+    loaded_tables = []
+
+    def finish_table() -> None:
+        if database.dialect.name == "duckdb" and categorical_columns:
+            _create_duckdb_enums(current_table, categorical_columns, database)
+        if on_progress is not None:
+            on_progress(current_table, rows)
+
+    for table_name, chunk in chunks:
+        is_first_chunk = table_name != current_table
+        if is_first_chunk:
+            if current_table is not None:
+                finish_table()
+            current_table, rows = table_name, 0
+            loaded_tables.append(table_name)
+            categorical_columns = _get_categorical_columns(chunk)
+
+        if database.dialect.name == "duckdb":
+            _write_duckdb_chunk(chunk, table_name, database, replace=is_first_chunk)
+        else:
+            chunk.to_sql(
+                table_name,
+                database,
+                if_exists="replace" if is_first_chunk else "append",
+            )
+        rows += len(chunk)
+        del chunk
+
+    if current_table is not None:
+        finish_table()
+
+    create_indexes(database)
+    dropped = drop_materializations(database, loaded_tables)
+    record_table_loads(database, loaded_tables)
+    if rebuild_materializations and dropped:
+        build_materializations(database, dropped)
+
 
-def load(dataframes: dict[str, DataFrame], database: Engine) -> None:
+def load(
+    dataframes: dict[str, DataFrame],
+    database: Engine,
+    on_progress: Callable[[str, int], None] | None = None,
+    rebuild_materializations: bool = True,
+) -> None:
     """
     Load the dataframes into the database
 
     Args:
         dataframes (dict[str, DataFrame]): The dataframes to load
         database (Engine): The database to load the dataframes into
+        on_progress (Callable[[str, int], None], optional): Called with the table name and
+            the number of rows after each table is loaded
+        rebuild_materializations (bool, optional): Whether to build the materializations
+            dropped by the load again, see load_chunks. Defaults to True
 
     Returns:
         None
     """
-    for table_name, dataframe in dataframes.items():
-        dataframe.to_sql(table_name, database, if_exists="replace")
+    load_chunks(
+        dataframes.items(),
+        database,
+        on_progress=on_progress,
+        rebuild_materializations=rebuild_materializations,
+    )
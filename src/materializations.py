@@ -0,0 +1,95 @@
+from collections import namedtuple
+from typing import Iterable
+
+from sqlalchemy.engine.base import Engine
+
+from src.incremental import (
+    AGGREGATE_SOURCE_TABLES,
+    build_aggregates,
+    drop_aggregates,
+    has_aggregates,
+)
+from src.leaderboard import (
+    LEADERBOARD_SOURCE_TABLES,
+    build_seller_leaderboard,
+    drop_seller_leaderboard,
+    has_seller_leaderboard,
+)
+from src.sketches import (
+    DELIVERY_SOURCE_TABLES,
+    build_delivery_sketches,
+    drop_delivery_sketches,
+    has_delivery_sketches,
+)
+
+Materialization = namedtuple(
+    "Materialization", ["source_tables", "build", "exists", "drop"]
+)
+
+# The tables derived from the loaded ones, built with them so reading the database
+# never writes to it: the aggregates of src/incremental.py, the delivery time
+# sketches of src/sketches.py and the seller leaderboard of src/leaderboard.py
+MATERIALIZATIONS = {
+    "aggregates": Materialization(
+        AGGREGATE_SOURCE_TABLES, build_aggregates, has_aggregates, drop_aggregates
+    ),
+    "delivery_sketches": Materialization(
+        DELIVERY_SOURCE_TABLES,
+        build_delivery_sketches,
+        has_delivery_sketches,
+        drop_delivery_sketches,
+    ),
+    "seller_leaderboard": Materialization(
+        LEADERBOARD_SOURCE_TABLES,
+        build_seller_leaderboard,
+        has_seller_leaderboard,
+        drop_seller_leaderboard,
+    ),
+}
+
+
+def build_materializations(
+    database: Engine, names: Iterable[str] | None = None
+) -> list[str]:
+    """
+    Build the materializations missing from a loaded database, like the pipeline does
+    after the loads. The snapshot builds them before fingerprinting the database
+
+    Args:
+        database (Engine): The database holding the loaded tables
+        names (Iterable[str], optional): The materializations to build if they are
+            missing. Defaults to None, every materialization
+
+    Returns:
+        list[str]: The names of the materializations built
+    """
+    names = MATERIALIZATIONS if names is None else set(names)
+    built = []
+    for name, materialization in MATERIALIZATIONS.items():
+        if name in names and not materialization.exists(database):
+            materialization.build(database)
+            built.append(name)
+    return built
+
+
+def drop_materializations(database: Engine, table_names: Iterable[str]) -> list[str]:
+    """
+    Drop the materializations summarizing any of the reloaded tables, as they are stale
+
+    Args:
+        database (Engine): The database
+        table_names (Iterable[str]): The tables that were reloaded
+
+    Returns:
+        list[str]: The names of the materializations that were in the database and
+            were dropped
+    """
+    table_names = set(table_names)
+    dropped = []
+    for name, materialization in MATERIALIZATIONS.items():
+        if not table_names & set(materialization.source_tables):
+            continue
+        if materialization.exists(database):
+            dropped.append(name)
+        materialization.drop(database)
+    return dropped
@@ -0,0 +1,485 @@
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from typing import Any, Callable, Hashable, Iterable, Iterator
+
+from pandas import DataFrame, read_sql
+from sqlalchemy import inspect, text
+from sqlalchemy.engine.base import Engine
+
+from src import config
+from src.cache import ResultCache, shared_cache
+from src.compaction import (
+    COMPACTED_GEOLOCATION_TABLE,
+    GEOLOCATION_TABLE,
+    compact_geolocation,
+)
+from src.dag import Node, run_dag
+from src.encoding import ID_DICTIONARY_TABLE, read_id_encoder
+from src.extract import iter_extract
+from src.lineage import get_query_tables, read_table_loads
+from src.load import load_chunks
+from src.materializations import MATERIALIZATIONS, Materialization
+from src.planner import get_query_plan
+from src.transform import (
+    QueryResult,
+    get_all_queries,
+    get_query_implementations,
+    get_query_mapping,
+)
+from src.utils.fingerprint import get_file_fingerprint
+
+PipelineProgress = namedtuple("PipelineProgress", ["stage", "name", "rows"])
+
+# The keys of the loads and materializations that ran, next to the tables
+PIPELINE_STATE_TABLE = "pipeline_state"
+PUBLIC_HOLIDAYS_TABLE = "public_holidays"
+DATABASE_LOCK = "database"
+# Bump whenever the tables are stored differently, like the money as cents, to load them again
+LOAD_FORMAT_VERSION = 2
+
+
+def count_pipeline_steps(
+    run_etl: bool,
+    csv_table_mapping: dict[str, str],
+    encode_ids: bool = False,
+    geolocation_mode: str = config.GEOLOCATION_MODE,
+) -> int:
+    """
+    Count the progress reports emitted by run_pipeline
+
+    Args:
+        run_etl (bool): Whether the extract and load stages run
+        csv_table_mapping (dict[str, str]): The mapping between the csv files and the table names
+        encode_ids (bool, optional): Whether the ids are encoded. Defaults to False
+        geolocation_mode (str, optional): How the geolocation table is stored. Defaults to config.GEOLOCATION_MODE
+
+    Returns:
+        int: The number of steps, one per extracted table, loaded table and query. A
+            rerun reports fewer, each step that is up to date is reported once
+    """
+    # The public holidays are extracted and loaded on top of the csv tables
+    etl_steps = 2 * (len(csv_table_mapping) + 1) if run_etl else 0
+    # The id dictionary is loaded once every table is encoded
+    if run_etl and encode_ids:
+        etl_steps += 1
+    # Storing both geolocation tables loads one more table than extracted
+    if run_etl and geolocation_mode == "both":
+        etl_steps += 1
+    return etl_steps + len(get_all_queries())
+
+
+def _hash_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+class PipelineStore:
+    """
+    Remembers the pipeline steps that ran. The keys of the loads and materializations
+    are stored in the database they wrote to, so they are skipped by the next runs,
+    in any process. The query results are kept in the cache of the process
+    """
+
+    def __init__(self, database: Engine, cache: ResultCache = shared_cache) -> None:
+        self._database = database
+        self._cache = cache
+
+    def _read_keys(self) -> dict[str, str]:
+        if PIPELINE_STATE_TABLE not in inspect(self._database).get_table_names():
+            return {}
+        keys = read_sql(
+            text(f"SELECT node, key FROM {PIPELINE_STATE_TABLE}"), self._database
+        )
+        return dict(zip(keys["node"], keys["key"]))
+
+    def lookup(self, node: Node, key: Hashable) -> tuple[bool, Any]:
+        """
+        Check whether the step already ran with this key
+
+        Args:
+            node (Node): The step
+            key (Hashable): The key of the step
+
+        Returns:
+            tuple[bool, Any]: Whether the step is up to date, and the query result for a query
+        """
+        if key is None:
+            return False, None
+        if node.stage == "query":
+            result = self._cache.get((str(self._database.url), key))
+            return result is not None, result
+        return self._read_keys().get(node.name) == key, None
+
+    def save(self, node: Node, key: Hashable, output: Any) -> None:
+        """
+        Remember that the step ran with this key
+
+        Args:
+            node (Node): The step
+            key (Hashable): The key of the step
+            output (Any): The output of the step
+        """
+        if key is None:
+            return
+        if node.stage == "query":
+            self._cache.put((str(self._database.url), key), output)
+            return
+
+        with self._database.begin() as connection:
+            connection.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {PIPELINE_STATE_TABLE} "
+                    "(node VARCHAR PRIMARY KEY, key VARCHAR)"
+                )
+            )
+            connection.execute(
+                text(f"DELETE FROM {PIPELINE_STATE_TABLE} WHERE node = :node"),
+                {"node": node.name},
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {PIPELINE_STATE_TABLE} (node, key) VALUES (:node, :key)"
+                ),
+                {"node": node.name, "key": key},
+            )
+
+
+def get_pipeline_nodes(
+    database: Engine,
+    run_etl: bool,
+    csv_folder: str,
+    csv_table_mapping: dict[str, str],
+    public_holidays_url: str,
+    on_progress: Callable[[PipelineProgress], None] | None = None,
+    chunk_size: int | None = None,
+    encode_ids: bool = False,
+    geolocation_mode: str = config.GEOLOCATION_MODE,
+) -> list[Node]:
+    """
+    Get the steps of the pipeline and their dependencies: the extraction and the load
+    of each table, the post-load materializations and each query. A query only waits
+    for the loads of the tables it reads, see src.lineage.get_query_tables
+
+    Args:
+        database (Engine): The database to load the data into and query
+        run_etl (bool): Whether to extract and load the data before running the queries
+        csv_folder (str): The folder where the csv files are
+        csv_table_mapping (dict[str, str]): The mapping between the csv files and the table names
+        public_holidays_url (str): The url to get the public holidays
+        on_progress (Callable[[PipelineProgress], None], optional): Called after each
+            table is extracted or loaded, from the thread of the step
+        chunk_size (int, optional): Stream each csv file into the database this many rows
+            at a time. The extraction is then part of the load step. Defaults to None
+        encode_ids (bool, optional): Store the hex ids as integer codes. Defaults to False
+        geolocation_mode (str, optional): Store the raw geolocation table, the one
+            compacted by zip code prefix, or both. Defaults to config.GEOLOCATION_MODE
+
+    Returns:
+        list[Node]: The steps, for src.dag.run_dag. The loads write one at a time, the
+            extractions only run for the tables that are loaded again
+    """
+
+    def report(stage: str) -> Callable[[str, int], None]:
+        def callback(name: str, rows: int) -> None:
+            if on_progress is not None:
+                on_progress(PipelineProgress(stage=stage, name=name, rows=rows))
+
+        return callback
+
+    def get_load_ids(table_names: list[str]) -> list[str | None]:
+        table_loads = read_table_loads(database)
+        return [table_loads.get(table_name) for table_name in table_names]
+
+    nodes = []
+    load_nodes: dict[str, str] = {}
+
+    if run_etl:
+        # Only the encoder of the load steps, which write one at a time, gives codes
+        encoder = read_id_encoder(database) if encode_ids else None
+        geolocation_tables = {
+            "raw": [GEOLOCATION_TABLE],
+            "compacted": [COMPACTED_GEOLOCATION_TABLE],
+            "both": [GEOLOCATION_TABLE, COMPACTED_GEOLOCATION_TABLE],
+        }[geolocation_mode]
+
+        def encode(
+            chunks: Iterable[tuple[str, DataFrame]],
+        ) -> Iterator[tuple[str, DataFrame]]:
+            for table_name, chunk in chunks:
+                yield table_name, chunk if encoder is None else encoder.encode(chunk)
+
+        def add_table(
+            table_name: str,
+            read_chunks: Callable[[int | None], Iterator[tuple[str, DataFrame]]],
+            source: str,
+        ) -> None:
+            tables = (
+                geolocation_tables if table_name == GEOLOCATION_TABLE else [table_name]
+            )
+            load_name = f"load:{table_name}"
+            load_nodes.update({table: load_name for table in tables})
+
+            def key() -> str:
+                # Loading the table in any other way changes its load id
+                return _hash_key(
+                    LOAD_FORMAT_VERSION,
+                    source,
+                    encode_ids,
+                    geolocation_mode,
+                    get_load_ids(tables),
+                )
+
+            def load_table(chunks: Iterable[tuple[str, DataFrame]]) -> None:
+                # The materialize steps below build the dropped tables once
+                load_chunks(
+                    encode(chunks),
+                    database,
+                    on_progress=report("load"),
+                    rebuild_materializations=False,
+                )
+
+            if chunk_size is None:
+                extract_name = f"extract:{table_name}"
+                nodes.append(
+                    Node(
+                        name=extract_name,
+                        stage="extract",
+                        run=lambda inputs: list(
+                            compact_geolocation(read_chunks(None), geolocation_mode)
+                        ),
+                        lazy=True,
+                    )
+                )
+                nodes.append(
+                    Node(
+                        name=load_name,
+                        stage="load",
+                        run=lambda inputs: load_table(inputs[extract_name]),
+                        inputs=(extract_name,),
+                        key=key,
+                        lock=DATABASE_LOCK,
+                    )
+                )
+            else:
+                nodes.append(
+                    Node(
+                        name=load_name,
+                        stage="load",
+                        run=lambda inputs: load_table(
+                            compact_geolocation(
+                                read_chunks(chunk_size), geolocation_mode
+                            )
+                        ),
+                        key=key,
+                        lock=DATABASE_LOCK,
+                    )
+                )
+
+        for csv_file, table_name in csv_table_mapping.items():
+            add_table(
+                table_name,
+                lambda size, csv_file=csv_file, table_name=table_name: iter_extract(
+                    csv_folder,
+                    {csv_file: table_name},
+                    None,
+                    chunk_size=size,
+                    on_progress=report("extract"),
+                ),
+                get_file_fingerprint(f"{csv_folder}/{csv_file}"),
+            )
+        add_table(
+            PUBLIC_HOLIDAYS_TABLE,
+            lambda size: iter_extract(
+                csv_folder, {}, public_holidays_url, on_progress=report("extract")
+            ),
+            # Fetching other years loads the holidays again
+            f"{public_holidays_url} {' '.join(config.PUBLIC_HOLIDAY_YEARS)}",
+        )
+
+        table_loads = list(dict.fromkeys(load_nodes.values()))
+
+        if encode_ids:
+            nodes.append(
+                Node(
+                    name=f"load:{ID_DICTIONARY_TABLE}",
+                    stage="load",
+                    run=lambda inputs: load_chunks(
+                        [(ID_DICTIONARY_TABLE, encoder.to_dataframe())],
+                        database,
+                        on_progress=report("load"),
+                        rebuild_materializations=False,
+                    ),
+                    inputs=tuple(table_loads),
+                    key=lambda: _hash_key(get_load_ids([ID_DICTIONARY_TABLE])),
+                    lock=DATABASE_LOCK,
+                )
+            )
+            load_nodes[ID_DICTIONARY_TABLE] = f"load:{ID_DICTIONARY_TABLE}"
+
+    # Without the ETL, only the missing materializations are built, so a database that
+    # has them is not written to
+    for name, materialization in MATERIALIZATIONS.items():
+        if not run_etl and materialization.exists(database):
+            continue
+
+        def key(materialization: Materialization = materialization) -> str | None:
+            # A dropped table is built again, whatever the load ids say
+            if not materialization.exists(database):
+                return None
+            return _hash_key(get_load_ids(materialization.source_tables))
+
+        nodes.append(
+            Node(
+                name=f"materialize:{name}",
+                stage="materialize",
+                run=lambda inputs, materialization=materialization: (
+                    materialization.build(database)
+                ),
+                inputs=tuple(
+                    sorted(
+                        {
+                            load_nodes[table_name]
+                            for table_name in materialization.source_tables
+                            if table_name in load_nodes
+                        }
+                    )
+                ),
+                key=key,
+                lock=DATABASE_LOCK,
+            )
+        )
+
+    # The planner times the queries on the final database, after every write
+    nodes.append(
+        Node(
+            name="plan",
+            stage="plan",
+            run=lambda inputs: get_query_plan(database),
+            inputs=tuple(node.name for node in nodes if not node.lazy),
+            lazy=True,
+        )
+    )
+
+    query_mapping = get_query_mapping()
+    implementations = get_query_implementations()
+
+    for query_name, tables in get_query_tables().items():
+        has_alternatives = len(implementations[query_name]) > 1
+
+        def run_query(
+            inputs: dict[str, Any], query_name: str = query_name
+        ) -> QueryResult:
+            plan = inputs.get("plan") or {}
+            query = implementations[query_name].get(
+                plan.get(query_name), query_mapping[query_name]
+            )
+            return query(database)
+
+        def key(query_name: str = query_name, tables: list[str] = tables) -> str | None:
+            # Without load ids, nothing tells whether the tables changed
+            load_ids = get_load_ids(tables)
+            if not any(load_ids):
+                return None
+            return _hash_key(query_name, load_ids)
+
+        inputs = sorted({load_nodes[table] for table in tables if table in load_nodes})
+        nodes.append(
+            Node(
+                name=f"query:{query_name}",
+                stage="query",
+                run=run_query,
+                inputs=tuple(inputs + ["plan"] if has_alternatives else inputs),
+                key=key,
+            )
+        )
+
+    return nodes
+
+
+def run_pipeline(
+    database: Engine,
+    run_etl: bool,
+    csv_folder: str,
+    csv_table_mapping: dict[str, str],
+    public_holidays_url: str,
+    on_progress: Callable[[PipelineProgress], None] | None = None,
+    on_result: Callable[[QueryResult], None] | None = None,
+    chunk_size: int | None = None,
+    encode_ids: bool = False,
+    geolocation_mode: str = config.GEOLOCATION_MODE,
+    max_workers: int = config.PIPELINE_WORKERS,
+) -> dict[str, DataFrame]:
+    """
+    Run the whole pipeline, reporting each step. It is meant to run in a background
+    worker, so callers can show progress and use each query result as soon as it is ready
+
+    The steps run in parallel as soon as the tables they need are loaded, see
+    get_pipeline_nodes. The loads whose csv file did not change since they last ran
+    are skipped, and so are the queries whose result is cached for the current tables
+
+    Args:
+        database (Engine): The database to load the data into and query
+        run_etl (bool): Whether to extract and load the data before running the queries
+        csv_folder (str): The folder where the csv files are
+        csv_table_mapping (dict[str, str]): The mapping between the csv files and the table names
+        public_holidays_url (str): The url to get the public holidays
+        on_progress (Callable[[PipelineProgress], None], optional): Called after each
+            table is extracted or loaded, after each query completes and, with the
+            "skip" stage, for each of these steps that is up to date. Never called
+            from two threads at once
+        on_result (Callable[[QueryResult], None], optional): Called with each query result
+        chunk_size (int, optional): Stream the csv files into the database this many rows
+            at a time, so peak memory is bounded by the chunk instead of the dataset.
+            Defaults to None, every table is extracted before loading
+        encode_ids (bool, optional): Store the hex ids as integer codes, with the
+            id_dictionary table to decode them. Defaults to False
+        geolocation_mode (str, optional): Store the raw geolocation table, the one
+            compacted by zip code prefix, or both. Defaults to config.GEOLOCATION_MODE
+        max_workers (int, optional): The number of steps running at once. Defaults to
+            config.PIPELINE_WORKERS
+
+    Returns:
+        dict[str, DataFrame]: The query results, as returned by run_queries with the
+            implementations chosen by get_query_plan
+    """
+    progress_lock = threading.Lock()
+
+    def report(progress: PipelineProgress) -> None:
+        if on_progress is not None:
+            with progress_lock:
+                on_progress(progress)
+
+    def on_done(node: Node, output: Any, skipped: bool) -> None:
+        if node.stage == "query" and output is not None:
+            report(
+                PipelineProgress(
+                    stage="query", name=output.query, rows=len(output.result)
+                )
+            )
+            if on_result is not None:
+                on_result(output)
+        elif skipped and node.stage in ("extract", "load", "query"):
+            report(PipelineProgress(stage="skip", name=node.name, rows=0))
+
+    nodes = get_pipeline_nodes(
+        database=database,
+        run_etl=run_etl,
+        csv_folder=csv_folder,
+        csv_table_mapping=csv_table_mapping,
+        public_holidays_url=public_holidays_url,
+        on_progress=report,
+        chunk_size=chunk_size,
+        encode_ids=encode_ids,
+        geolocation_mode=geolocation_mode,
+    )
+    outputs = run_dag(
+        nodes, max_workers=max_workers, store=PipelineStore(database), on_done=on_done
+    )
+
+    return {
+        output.query: output.result
+        for node in nodes
+        if node.stage == "query"
+        for output in [outputs[node.name]]
+    }
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from sqlalchemy.engine.base import Engine
+
+from src import config
+from src.transform import get_query_implementations
+from src.utils.fingerprint import get_database_fingerprint
+
+# Bump this number whenever the layout of the plan file changes
+PLAN_VERSION = 1
+
+# Plans kept in the file, one per database fingerprint, the oldest are dropped first
+MAX_PLANS = 8
+
+
+def time_implementations(database: Engine) -> dict[str, dict[str, float]]:
+    """
+    Run every implementation of the queries that have more than one, once each
+
+    Args:
+        database (Engine): The database to run the queries against
+
+    Returns:
+        dict[str, dict[str, float]]: The wall time in seconds of each implementation, keyed by query name
+    """
+    seconds = {}
+
+    for query_name, implementations in get_query_implementations().items():
+        if len(implementations) < 2:
+            continue
+
+        seconds[query_name] = {}
+        for implementation_name, query in implementations.items():
+            start = time.perf_counter()
+            query(database)
+            seconds[query_name][implementation_name] = time.perf_counter() - start
+
+    return seconds
+
+
+def choose_implementations(seconds: dict[str, dict[str, float]]) -> dict[str, str]:
+    """
+    Choose the fastest implementation of each query
+
+    Args:
+        seconds (dict[str, dict[str, float]]): The timings returned by time_implementations
+
+    Returns:
+        dict[str, str]: The name of the fastest implementation, keyed by query name
+    """
+    return {
+        query_name: min(timings, key=timings.get)
+        for query_name, timings in seconds.items()
+    }
+
+
+def read_plans(plan_path: str) -> dict[str, dict]:
+    """
+    Read the plans persisted for each database fingerprint
+
+    Args:
+        plan_path (str): The json file where the plans are written
+
+    Returns:
+        dict[str, dict]: The plans keyed by fingerprint, empty if the file is missing or outdated
+    """
+    if not Path(plan_path).exists():
+        return {}
+
+    with open(plan_path, "r") as file:
+        content = json.load(file)
+
+    if content.get("version") != PLAN_VERSION:
+        return {}
+
+    return content["plans"]
+
+
+def write_plans(plans: dict[str, dict], plan_path: str) -> None:
+    """
+    Persist the plans, keeping the most recent MAX_PLANS
+
+    Args:
+        plans (dict[str, dict]): The plans keyed by fingerprint, oldest first
+        plan_path (str): The json file where the plans are written
+    """
+    recent = dict(list(plans.items())[-MAX_PLANS:])
+
+    # Write next to the target and rename, so a crash never leaves a half file
+    staging = f"{plan_path}.tmp"
+    with open(staging, "w") as file:
+        json.dump({"version": PLAN_VERSION, "plans": recent}, file, indent=2)
+    os.replace(staging, plan_path)
+
+
+def get_query_plan(
+    database: Engine, plan_path: str = config.QUERY_PLAN_PATH
+) -> dict[str, str]:
+    """
+    Get the fastest implementation of each query on the data of the database.
+    The implementations are timed once per database fingerprint and the choice is
+    persisted, so they are timed again only when the data changes
+
+    Args:
+        database (Engine): The database the queries run against
+        plan_path (str, optional): The json file where the plans are written. Defaults to config.QUERY_PLAN_PATH
+
+    Returns:
+        dict[str, str]: The implementation to run, keyed by query name, for run_queries
+    """
+    database_path = database.url.database
+
+    # In-memory databases have no fingerprint, their plan is not persisted
+    if not database_path or not Path(database_path).exists():
+        return choose_implementations(time_implementations(database))
+
+    fingerprint = get_database_fingerprint(database_path)
+    plans = read_plans(plan_path)
+    plan = plans.get(fingerprint)
+
+    # Plans timed before an implementation was added or removed are stale too
+    if plan is None or _get_timed_names(plan) != _get_implementation_names():
+        seconds = time_implementations(database)
+        plan = {"implementations": choose_implementations(seconds), "seconds": seconds}
+        plans.pop(fingerprint, None)
+        plans[fingerprint] = plan
+        write_plans(plans, plan_path)
+
+    return plan["implementations"]
+
+
+def _get_timed_names(plan: dict) -> dict[str, list[str]]:
+    return {
+        query_name: sorted(timings) for query_name, timings in plan["seconds"].items()
+    }
+
+
+def _get_implementation_names() -> dict[str, list[str]]:
+    return {
+        query_name: sorted(implementations)
+        for query_name, implementations in get_query_implementations().items()
+        if len(implementations) > 1
+    }
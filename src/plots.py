@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import plotly.express as px
@@ -7,8 +9,11 @@ from matplotlib import rc_file_defaults
 from matplotlib.figure import Figure
 from pandas import DataFrame, to_datetime
 
+from src.transform import QueryEnum
 from src.utils.theme import apply_custom_palette, custom_palette
 
+PlotSpec = namedtuple("PlotSpec", ["name", "query", "plot", "kwargs"])
+
 
 def plot_revenue_by_month_year(df: DataFrame, year: int) -> Figure:
     """
@@ -334,6 +339,190 @@ def plot_freight_value_weight_relationship(df: DataFrame) -> Figure:
     return fig
 
 
+def plot_freight_value_distance_relationship(df: DataFrame) -> Figure:
+    """
+    Plot the relationship between the customer to seller distance and the freight value,
+    with the median freight value of each 100 km band.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'distance_km': Distance between the customer and the seller in kilometers
+            - 'freight_value': Freight value in dollars
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    sns.scatterplot(
+        data=df,
+        x="distance_km",
+        y="freight_value",
+        color=custom_palette[2],
+        edgecolor="white",
+        alpha=0.3,
+        s=15,
+        ax=ax,
+    )
+
+    bands = (df["distance_km"] // 100) * 100 + 50
+    medians = df["freight_value"].groupby(bands).median()
+    ax.plot(
+        medians.index,
+        medians.values,
+        color=custom_palette[1],
+        linewidth=2,
+        label="Median per 100 km",
+    )
+
+    ax.set_xlabel("Customer to Seller Distance (km)")
+    ax.set_ylabel("Freight Value ($)")
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.5)
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_customer_rfm_segments(df: DataFrame) -> Figure:
+    """
+    Create horizontal bar charts of the customers and the revenue of each RFM segment.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'Segment': RFM segment name
+            - 'Customers': Number of customers in the segment
+            - 'Revenue': Revenue of the segment
+
+    Returns:
+        Figure: A matplotlib figure with the two bar charts side by side.
+    """
+    rc_file_defaults()
+    fig, (customers_ax, revenue_ax) = plt.subplots(1, 2, figsize=(12, 5), sharey=True)
+
+    # Keep the segment order of the query, best customers on top
+    ordered = df.iloc[::-1]
+    colors = custom_palette[: len(ordered)][::-1]
+
+    for ax, column, label in (
+        (customers_ax, "Customers", "{:,.0f}"),
+        (revenue_ax, "Revenue", "${:,.0f}"),
+    ):
+        bars = ax.barh(
+            ordered["Segment"], ordered[column], color=colors, edgecolor="black"
+        )
+        for bar in bars:
+            width = bar.get_width()
+            ax.text(
+                width,
+                bar.get_y() + bar.get_height() / 2,
+                " " + label.format(width),
+                va="center",
+                fontsize=9,
+                color="black",
+            )
+        ax.set_xlabel(column)
+        ax.margins(x=0.2)
+        ax.grid(axis="x", linestyle="--", alpha=0.4)
+
+    customers_ax.set_ylabel("Segment")
+    fig.tight_layout()
+    return fig
+
+
+def plot_customer_cohort_retention(df: DataFrame, months: int = 12) -> Figure:
+    """
+    Plot a heatmap of the share of each monthly cohort ordering again in the
+    months after its first order.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'Cohort': Month of the first order ("YYYY-MM")
+            - 'Months': Months since the first order
+            - 'Retention': Share of the cohort ordering that month
+        months (int): The number of months after the first order to show
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    retention = (
+        df[(df["Months"] > 0) & (df["Months"] <= months)]
+        .pivot(index="Cohort", columns="Months", values="Retention")
+        .reindex(index=sorted(df["Cohort"].unique()), columns=range(1, months + 1))
+        * 100
+    )
+
+    sns.heatmap(
+        retention,
+        cmap="Blues",
+        annot=True,
+        fmt=".1f",
+        annot_kws={"fontsize": 7},
+        linewidths=0.5,
+        cbar_kws={"label": "Customers ordering again (%)"},
+        ax=ax,
+    )
+
+    ax.set_xlabel("Months Since First Order")
+    ax.set_ylabel("Cohort (Month of First Order)")
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_seller_leaderboard(df: DataFrame) -> Figure:
+    """
+    Create a horizontal bar chart of the revenue of the sellers of a leaderboard,
+    colored by their on-time delivery rate.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'Rank': Rank of the seller
+            - 'Seller': Seller id
+            - 'State': State of the seller
+            - 'Revenue': Revenue of the seller
+            - 'On-time rate': Share of its orders delivered by the estimated date
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+    fig, ax = plt.subplots(figsize=(12, max(3, 0.4 * len(df) + 1)))
+
+    # First rank on top, the ids shortened like the Olist website shows them
+    ordered = df.iloc[::-1]
+    labels = [
+        f"#{rank} {seller[:8]} ({state})"
+        for rank, seller, state in zip(
+            ordered["Rank"], ordered["Seller"].astype(str), ordered["State"]
+        )
+    ]
+    colors = plt.cm.RdYlGn(ordered["On-time rate"].to_numpy())
+
+    bars = ax.barh(labels, ordered["Revenue"], color=colors, edgecolor="black")
+    for bar, rate in zip(bars, ordered["On-time rate"]):
+        ax.text(
+            bar.get_width(),
+            bar.get_y() + bar.get_height() / 2,
+            f" ${bar.get_width():,.0f} ({rate:.0%} on time)",
+            va="center",
+            fontsize=9,
+            color="black",
+        )
+
+    ax.set_xlabel("Revenue")
+    ax.set_ylabel("Seller")
+    ax.margins(x=0.25)
+    ax.grid(axis="x", linestyle="--", alpha=0.4)
+
+    fig.tight_layout()
+    return fig
+
+
 def plot_delivery_date_difference(df: DataFrame) -> Figure:
     """
     Plot the difference between estimated and actual delivery dates, grouped by state.
@@ -410,3 +599,245 @@ def plot_order_amount_per_day_with_holidays(df: DataFrame) -> Figure:
 
     fig.tight_layout()
     return fig
+
+
+def plot_holiday_impact(df: DataFrame) -> Figure:
+    """
+    Create a horizontal bar chart of the lift of the orders around each holiday
+    over the days around them, one bar per year.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'Date': Date of the holiday ("YYYY-MM-DD")
+            - 'Year': Year of the holiday
+            - 'Holiday': Name of the holiday
+            - 'Lift': Orders per day around the holiday over the baseline, minus 1
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+
+    # The holidays in calendar order, the first on top
+    calendar = df.assign(month_day=df["Date"].str[5:]).sort_values("month_day")
+    lift = (
+        calendar.pivot_table(
+            index="Holiday", columns="Year", values="Lift", aggfunc="mean", sort=False
+        ).sort_index(axis=1)
+        * 100
+    ).iloc[::-1]
+
+    fig, ax = plt.subplots(figsize=(12, max(4, 0.5 * len(lift) + 1)))
+    lift.plot.barh(
+        ax=ax,
+        color=custom_palette[: len(lift.columns)],
+        edgecolor="black",
+        width=0.8,
+    )
+
+    ax.axvline(0, color="black", linewidth=1)
+    ax.set_xlabel("Orders per day vs. the surrounding weeks (%)")
+    ax.set_ylabel("Holiday")
+    ax.grid(axis="x", linestyle="--", alpha=0.4)
+    ax.legend(title="Year")
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_revenue_by_month(df: DataFrame) -> Figure:
+    """
+    Create a line plot with the monthly revenue of each year in the filtered data.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'year': Year of the delivery date
+            - 'month_no': Month number, from '01' to '12'
+            - 'Revenue': Revenue of the month
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+    sns.set_style("whitegrid")
+
+    fig, ax = plt.subplots(figsize=(12, 4))
+
+    for i, (year, year_df) in enumerate(df.groupby("year")):
+        ax.plot(
+            year_df["month_no"].astype(int),
+            year_df["Revenue"],
+            marker="o",
+            linewidth=2,
+            color=custom_palette[i % len(custom_palette)],
+            label=f"Revenue {year}",
+        )
+
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Revenue")
+    ax.set_xticks(range(1, 13))
+    ax.set_xticklabels(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
+        + ["Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    )
+    ax.grid(True, linestyle="--", alpha=0.5)
+    if not df.empty:
+        ax.legend(title="", loc="upper left")
+
+    fig.tight_layout()
+    return fig
+
+
+def plot_revenue_per_category(df: DataFrame) -> Figure:
+    """
+    Create a horizontal bar chart with the revenue of every category in the filtered data.
+    The height of the figure grows with the number of categories.
+
+    Args:
+        df (DataFrame): DataFrame with columns:
+            - 'Category': Category name
+            - 'Revenue': Revenue amount
+
+    Returns:
+        Figure: A matplotlib figure object.
+    """
+    rc_file_defaults()
+    fig, ax = plt.subplots(figsize=(10, max(3, 0.3 * len(df))))
+
+    sorted_df = df.sort_values("Revenue", ascending=True)
+    colors = [custom_palette[i % len(custom_palette)] for i in range(len(sorted_df))]
+
+    ax.barh(
+        sorted_df["Category"], sorted_df["Revenue"], color=colors, edgecolor="black"
+    )
+
+    ax.set_xlabel("Revenue")
+    ax.set_ylabel("Category")
+    ax.grid(axis="x", linestyle="--", alpha=0.4)
+    fig.tight_layout()
+    return fig
+
+
+def get_all_plots() -> list[PlotSpec]:
+    """
+    Get all the plots shown in the dashboard
+
+    Returns:
+        list[PlotSpec]: The plots with the name of the figure, the query that feeds it,
+        the plot function and the extra keyword arguments of the plot function
+    """
+    return [
+        PlotSpec(
+            name="global_amount_order_status",
+            query=QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS,
+            plot=plot_global_amount_order_status,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="revenue_by_month_year",
+            query=QueryEnum.REVENUE_BY_MONTH_YEAR,
+            plot=plot_revenue_by_month_year,
+            kwargs={"year": 2017},
+        ),
+        PlotSpec(
+            name="revenue_per_state",
+            query=QueryEnum.REVENUE_PER_STATE,
+            plot=plot_revenue_per_state,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="top_10_revenue_categories",
+            query=QueryEnum.TOP_10_REVENUE_CATEGORIES,
+            plot=plot_top_10_revenue_categories,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="top_10_revenue_categories_amount",
+            query=QueryEnum.TOP_10_REVENUE_CATEGORIES,
+            plot=plot_top_10_revenue_categories_amount,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="top_10_least_revenue_categories",
+            query=QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES,
+            plot=plot_top_10_least_revenue_categories,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="real_vs_predicted_delivered_time",
+            query=QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME,
+            plot=plot_real_vs_predicted_delivered_time,
+            kwargs={"year": 2017},
+        ),
+        PlotSpec(
+            name="freight_value_weight_relationship",
+            query=QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP,
+            plot=plot_freight_value_weight_relationship,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="freight_value_distance_relationship",
+            query=QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP,
+            plot=plot_freight_value_distance_relationship,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="customer_rfm_segments",
+            query=QueryEnum.CUSTOMER_RFM_SEGMENTS,
+            plot=plot_customer_rfm_segments,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="customer_cohort_retention",
+            query=QueryEnum.CUSTOMER_COHORT_RETENTION,
+            plot=plot_customer_cohort_retention,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="order_amount_per_day_with_holidays",
+            query=QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017,
+            plot=plot_order_amount_per_day_with_holidays,
+            kwargs={},
+        ),
+        PlotSpec(
+            name="holiday_impact",
+            query=QueryEnum.HOLIDAY_IMPACT,
+            plot=plot_holiday_impact,
+            kwargs={},
+        ),
+    ]
+
+
+def get_plots_for_query(query: QueryEnum) -> list[PlotSpec]:
+    """
+    Get the plots fed by the given query
+
+    Args:
+        query (QueryEnum): The query
+
+    Returns:
+        list[PlotSpec]: The plots that only need the result of this query
+    """
+    return [spec for spec in get_all_plots() if spec.query == query]
+
+
+def render_figures(
+    query_results: dict[str, DataFrame],
+    plots: list[PlotSpec] | None = None,
+) -> dict[str, Figure | go.Figure]:
+    """
+    Render the figures of the dashboard from the query results
+
+    Args:
+        query_results (dict[str, DataFrame]): The query results returned by run_queries
+        plots (list[PlotSpec], optional): The plots to render. Defaults to all the plots
+
+    Returns:
+        dict[str, Figure | go.Figure]: A dictionary with keys as the figure names and values as the figures
+    """
+    figures = {}
+
+    for spec in plots if plots is not None else get_all_plots():
+        figures[spec.name] = spec.plot(query_results[spec.query.value], **spec.kwargs)
+
+    return figures
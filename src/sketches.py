@@ -0,0 +1,402 @@
+import json
+from collections.abc import Iterable
+
+import numpy as np
+from pandas import DataFrame, read_sql, to_datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.base import Engine
+
+from src import config
+
+# One row per state and per purchase month, with the sketch of their delivery times
+DELIVERY_SKETCHES_TABLE = "delivery_time_sketches"
+DELIVERY_DIMENSIONS = {"state": "State", "month": "Month"}
+DELIVERY_PERCENTILES = [0.5, 0.9, 0.99]
+
+# Reloading any of these tables makes the sketches stale
+DELIVERY_SOURCE_TABLES = ["olist_orders", "olist_customers"]
+
+DEFAULT_COMPRESSION = 100
+
+
+class QuantileSketch:
+    """
+    A merging t-digest: the values are summarized by at most about `compression`
+    centroids, a mean and a weight each. The centroids are small near the tails
+    and large around the median, so the extreme percentiles stay accurate.
+    Sketches built on separate chunks of the data merge into the sketch of the whole.
+    """
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION) -> None:
+        self.compression = compression
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer: list[np.ndarray] = []
+        self._buffered = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def count(self) -> int:
+        """int: The number of values added"""
+        return int(round(self._weights.sum())) + self._buffered
+
+    def add(self, values: Iterable[float]) -> None:
+        """
+        Add values to the sketch. They are buffered and compressed in batches
+
+        Args:
+            values (Iterable[float]): The values, NaNs are ignored
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+
+        self._buffer.append(values)
+        self._buffered += values.size
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        if self._buffered > 10 * self.compression:
+            self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Add the values summarized by another sketch
+
+        Args:
+            other (QuantileSketch): The sketch to merge into this one
+        """
+        other._compress()
+        if other._weights.size == 0:
+            return
+
+        self._compress()
+        self._means = np.concatenate([self._means, other._means])
+        self._weights = np.concatenate([self._weights, other._weights])
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self._compress(force=True)
+
+    def quantiles(self, quantiles: Iterable[float]) -> np.ndarray:
+        """
+        Estimate quantiles of the values added
+
+        Args:
+            quantiles (Iterable[float]): The quantiles, between 0 and 1
+
+        Returns:
+            np.ndarray: The estimates, NaN if the sketch is empty
+        """
+        quantiles = np.asarray(quantiles, dtype=float)
+        self._compress()
+        if self._weights.size == 0:
+            return np.full(quantiles.shape, np.nan)
+
+        # Each centroid stands at the middle of its weight, the extremes at the ends
+        total = self._weights.sum()
+        centers = np.cumsum(self._weights) - self._weights / 2
+        positions = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.minimum], self._means, [self.maximum]])
+        return np.interp(quantiles * total, positions, values)
+
+    def to_json(self) -> str:
+        """
+        Serialize the sketch
+
+        Returns:
+            str: The compression, the centroids and the extremes as JSON
+        """
+        self._compress()
+        return json.dumps(
+            {
+                "compression": self.compression,
+                "means": self._means.tolist(),
+                "weights": self._weights.tolist(),
+                "minimum": self.minimum if self._weights.size else None,
+                "maximum": self.maximum if self._weights.size else None,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, serialized: str) -> "QuantileSketch":
+        """
+        Deserialize a sketch written by to_json
+
+        Args:
+            serialized (str): The JSON
+
+        Returns:
+            QuantileSketch: The sketch
+        """
+        state = json.loads(serialized)
+        sketch = cls(state["compression"])
+        sketch._means = np.asarray(state["means"], dtype=float)
+        sketch._weights = np.asarray(state["weights"], dtype=float)
+        if sketch._weights.size:
+            sketch.minimum, sketch.maximum = state["minimum"], state["maximum"]
+        return sketch
+
+    def _compress(self, force: bool = False) -> None:
+        if not self._buffer and not force:
+            return
+
+        means = np.concatenate([self._means, *self._buffer])
+        weights = np.concatenate(
+            [self._weights, *(np.ones(values.size) for values in self._buffer)]
+        )
+        self._buffer, self._buffered = [], 0
+        if means.size == 0:
+            return
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # The k1 scale function of the t-digest paper: a centroid covers at most one
+        # unit of k, so the centroids near the quantiles 0 and 1 hold few values
+        total = weights.sum()
+        quantiles = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression * (np.arcsin(2 * quantiles - 1) / np.pi + 0.5)
+        cluster = np.floor(k)
+
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        self._weights = np.add.reduceat(weights, starts)
+        self._means = np.add.reduceat(means * weights, starts) / self._weights
+
+
+def get_delivery_times(dataframes: dict[str, DataFrame]) -> DataFrame:
+    """
+    Get the delivery time of the delivered orders, with their state and purchase month
+
+    Args:
+        dataframes (dict[str, DataFrame]): The olist_orders and olist_customers rows
+
+    Returns:
+        DataFrame: The order_id, state, month ("YYYY-MM") and days from purchase to
+            delivery of each delivered order
+    """
+    orders = dataframes["olist_orders"]
+    orders = orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ].merge(
+        dataframes["olist_customers"][["customer_id", "customer_state"]],
+        on="customer_id",
+    )
+
+    purchased = to_datetime(orders["order_purchase_timestamp"], format="ISO8601")
+    delivered = to_datetime(orders["order_delivered_customer_date"], format="ISO8601")
+    return DataFrame(
+        {
+            "order_id": orders["order_id"].to_numpy(),
+            "state": orders["customer_state"].astype(str).to_numpy(),
+            "month": purchased.dt.strftime("%Y-%m").to_numpy(),
+            "days": ((delivered - purchased).dt.total_seconds() / 86400).to_numpy(),
+        }
+    )
+
+
+def _add_delivery_times(
+    sketches: dict[tuple[str, str], QuantileSketch], delivery_times: DataFrame
+) -> None:
+    for dimension in DELIVERY_DIMENSIONS:
+        for key, days in delivery_times.groupby(dimension)["days"]:
+            sketch = sketches.setdefault((dimension, key), QuantileSketch())
+            sketch.add(days.to_numpy())
+
+
+def _read_sketches(
+    connection: Engine | Connection,
+) -> dict[tuple[str, str], QuantileSketch]:
+    rows = read_sql(
+        text(f"SELECT dimension, key, sketch FROM {DELIVERY_SKETCHES_TABLE}"),
+        connection,
+    )
+    return {
+        (dimension, key): QuantileSketch.from_json(sketch)
+        for dimension, key, sketch in rows.itertuples(index=False)
+    }
+
+
+def _write_sketches(
+    connection: Connection, sketches: dict[tuple[str, str], QuantileSketch]
+) -> None:
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {DELIVERY_SKETCHES_TABLE} "
+            "(dimension VARCHAR, key VARCHAR, sketch VARCHAR)"
+        )
+    )
+    connection.execute(text(f"DELETE FROM {DELIVERY_SKETCHES_TABLE}"))
+    if sketches:
+        connection.execute(
+            text(
+                f"INSERT INTO {DELIVERY_SKETCHES_TABLE} (dimension, key, sketch) "
+                "VALUES (:dimension, :key, :sketch)"
+            ),
+            [
+                {"dimension": dimension, "key": key, "sketch": sketch.to_json()}
+                for (dimension, key), sketch in sorted(sketches.items())
+            ],
+        )
+
+
+def _build_sketches(
+    connection: Connection, chunk_size: int
+) -> dict[tuple[str, str], QuantileSketch]:
+    query = text(
+        "SELECT o.order_id, o.customer_id, o.order_status, o.order_purchase_timestamp, "
+        "o.order_delivered_customer_date, c.customer_state "
+        "FROM olist_orders o JOIN olist_customers c ON o.customer_id = c.customer_id "
+        "WHERE o.order_status = 'delivered' AND o.order_delivered_customer_date IS NOT NULL"
+    )
+    sketches: dict[tuple[str, str], QuantileSketch] = {}
+    for chunk in read_sql(query, connection, chunksize=chunk_size):
+        delivery_times = get_delivery_times(
+            {
+                "olist_orders": chunk.drop(columns="customer_state"),
+                "olist_customers": chunk[
+                    ["customer_id", "customer_state"]
+                ].drop_duplicates("customer_id"),
+            }
+        )
+        _add_delivery_times(sketches, delivery_times)
+    return sketches
+
+
+def has_delivery_sketches(database: Engine | Connection) -> bool:
+    """
+    Check whether the delivery time sketches are in the database
+
+    Args:
+        database (Engine | Connection): The database
+
+    Returns:
+        bool: Whether the sketch table exists
+    """
+    return DELIVERY_SKETCHES_TABLE in inspect(database).get_table_names()
+
+
+def build_delivery_sketches(
+    database: Engine, chunk_size: int = config.ETL_CHUNK_SIZE
+) -> None:
+    """
+    Build the delivery time sketches of every state and purchase month in one pass
+    over the delivered orders, replacing the existing ones
+
+    Args:
+        database (Engine): The database holding the orders and customers
+        chunk_size (int, optional): The orders read at a time. Defaults to config.ETL_CHUNK_SIZE
+
+    Returns:
+        None
+    """
+    with database.begin() as connection:
+        _write_sketches(connection, _build_sketches(connection, chunk_size))
+
+
+def drop_delivery_sketches(
+    database: Engine, table_names: Iterable[str] | None = None
+) -> None:
+    """
+    Drop the delivery time sketches, when they are stale
+
+    Args:
+        database (Engine): The database
+        table_names (Iterable[str], optional): The tables that were reloaded. The
+            sketches are only dropped if one of them is a source of the sketches.
+            Defaults to None, the sketches are always dropped
+
+    Returns:
+        None
+    """
+    if table_names is not None and not set(table_names) & set(DELIVERY_SOURCE_TABLES):
+        return
+
+    with database.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {DELIVERY_SKETCHES_TABLE}"))
+
+
+def update_delivery_sketches(
+    connection: Connection, before: DataFrame, after: DataFrame
+) -> None:
+    """
+    Update the sketches with the delivery times of some orders, read before and
+    after they changed. The sketches of the new delivery times are merged into the
+    stored ones. A sketch cannot forget a value, so if a delivery time changed or
+    disappeared, the sketches are built again from the tables
+
+    Args:
+        connection (Connection): The connection of the transaction that changed the orders
+        before (DataFrame): The delivery times of the orders before, see get_delivery_times
+        after (DataFrame): The delivery times of the same orders after
+
+    Returns:
+        None
+    """
+    columns = ["order_id", "state", "month", "days"]
+    changes = before[columns].merge(
+        after[columns], how="outer", on=columns, indicator=True
+    )
+    if (changes["_merge"] == "left_only").any():
+        _write_sketches(connection, _build_sketches(connection, config.ETL_CHUNK_SIZE))
+        return
+
+    added: dict[tuple[str, str], QuantileSketch] = {}
+    _add_delivery_times(added, changes[changes["_merge"] == "right_only"])
+    sketches = _read_sketches(connection)
+    for key, sketch in added.items():
+        sketches.setdefault(key, QuantileSketch()).merge(sketch)
+    _write_sketches(connection, sketches)
+
+
+def read_delivery_time_percentiles(
+    database: Engine, dimension: str = "state"
+) -> DataFrame:
+    """
+    Get the p50, p90 and p99 of the delivery time, in days from purchase to delivery,
+    from the sketches. The database is never written to, the pipeline and the
+    snapshot build the sketches with the tables
+
+    Args:
+        database (Engine): The database holding the sketches
+        dimension (str, optional): "state" for one row per customer state, "month"
+            for one row per purchase month. Defaults to "state"
+
+    Raises:
+        ValueError: If the dimension is unknown
+
+    Returns:
+        DataFrame: The State or Month, the number of delivered Orders and the p50,
+            p90 and p99 columns, sorted by State or Month. Empty if the database has
+            no sketches
+    """
+    if dimension not in DELIVERY_DIMENSIONS:
+        raise ValueError(
+            f"Unknown dimension {dimension!r}, expected one of {list(DELIVERY_DIMENSIONS)}"
+        )
+    if not has_delivery_sketches(database):
+        return DataFrame(
+            columns=[
+                DELIVERY_DIMENSIONS[dimension],
+                "Orders",
+                *(f"p{round(quantile * 100)}" for quantile in DELIVERY_PERCENTILES),
+            ]
+        )
+
+    sketches = _read_sketches(database)
+    keys = sorted(key for key_dimension, key in sketches if key_dimension == dimension)
+    percentiles = np.array(
+        [sketches[(dimension, key)].quantiles(DELIVERY_PERCENTILES) for key in keys]
+    ).reshape(len(keys), len(DELIVERY_PERCENTILES))
+
+    result = DataFrame(
+        {
+            DELIVERY_DIMENSIONS[dimension]: keys,
+            "Orders": [sketches[(dimension, key)].count for key in keys],
+        }
+    )
+    for index, quantile in enumerate(DELIVERY_PERCENTILES):
+        result[f"p{round(quantile * 100)}"] = percentiles[:, index]
+    return result
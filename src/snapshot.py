@@ -0,0 +1,227 @@
+import json
+import pickle
+import shutil
+from collections import namedtuple
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+from pandas import DataFrame, read_feather
+from sqlalchemy.engine.base import Engine
+
+from src import config
+from src.database import create_database_engine, get_database_path
+from src.compaction import compact_geolocation
+from src.encoding import IdEncoder
+from src.extract import iter_extract
+from src.lineage import get_affected_queries, get_changed_tables, read_table_loads
+from src.load import create_indexes, has_stale_money_columns, load_chunks
+from src.materializations import build_materializations
+from src.planner import get_query_plan
+from src.plots import get_all_plots, render_figures
+from src.transform import QueryEnum, run_queries
+from src.utils.fingerprint import get_database_fingerprint
+
+# Bump this number whenever the layout of the bundle or the figures change
+SNAPSHOT_VERSION = 4
+
+MANIFEST_FILE = "manifest.json"
+QUERIES_FOLDER = "queries"
+FIGURES_FOLDER = "figures"
+
+Snapshot = namedtuple("Snapshot", ["fingerprint", "query_results", "figures"])
+
+
+def _read_manifest(snapshot_folder: str) -> dict | None:
+    manifest_path = Path(snapshot_folder) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, "r") as file:
+        manifest = json.load(file)
+
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def _get_reusable_queries(
+    manifest: dict | None, table_loads: dict[str, str]
+) -> list[str]:
+    # Without load ids on both sides, nothing tells which tables changed
+    if manifest is None or not manifest.get("table_loads") or not table_loads:
+        return []
+
+    changed_tables = get_changed_tables(manifest["table_loads"], table_loads)
+    affected_queries = get_affected_queries(changed_tables)
+    return [
+        query_name
+        for query_name in manifest["queries"]
+        if query_name not in affected_queries
+    ]
+
+
+def export_snapshot(database: Engine, database_path: str, snapshot_folder: str) -> str:
+    """
+    Run the queries, render the figures and write both into a snapshot bundle
+
+    The bundle contains a manifest with the snapshot version, the database
+    fingerprint and the load id of every table, one Arrow (feather) file per query
+    result and one pickle per figure. The queries that read none of the tables
+    loaded since the previous bundle keep their result and figures from it, only
+    the affected ones are run and rendered again.
+
+    Args:
+        database (Engine): The database to run the queries against
+        database_path (str): The path to the database file, used for the fingerprint
+        snapshot_folder (str): The folder where the bundle is written
+
+    Returns:
+        str: The fingerprint of the database the snapshot was built from
+    """
+    fingerprint = get_database_fingerprint(database_path)
+    table_loads = read_table_loads(database)
+
+    previous = _read_manifest(snapshot_folder)
+    reused_queries = _get_reusable_queries(previous, table_loads)
+    queries = [query.value for query in QueryEnum if query.value not in reused_queries]
+
+    query_results = (
+        run_queries(database=database, queries=queries, plan=get_query_plan(database))
+        if queries
+        else {}
+    )
+    figures = render_figures(
+        query_results,
+        plots=[spec for spec in get_all_plots() if spec.query.value in query_results],
+    )
+    reused_figures = [
+        spec.name for spec in get_all_plots() if spec.query.value in reused_queries
+    ]
+
+    # Write into a temporary folder first so a failed export never leaves a half bundle
+    target = Path(snapshot_folder)
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    (staging / QUERIES_FOLDER).mkdir(parents=True)
+    (staging / FIGURES_FOLDER).mkdir(parents=True)
+
+    for query_name, result in query_results.items():
+        result.reset_index(drop=True).to_feather(
+            staging / QUERIES_FOLDER / f"{query_name}.arrow"
+        )
+    for query_name in reused_queries:
+        shutil.copy2(
+            target / QUERIES_FOLDER / f"{query_name}.arrow",
+            staging / QUERIES_FOLDER / f"{query_name}.arrow",
+        )
+
+    for figure_name, figure in figures.items():
+        with open(staging / FIGURES_FOLDER / f"{figure_name}.pickle", "wb") as file:
+            pickle.dump(figure, file)
+    for figure_name in reused_figures:
+        shutil.copy2(
+            target / FIGURES_FOLDER / f"{figure_name}.pickle",
+            staging / FIGURES_FOLDER / f"{figure_name}.pickle",
+        )
+
+    plt.close("all")
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "table_loads": table_loads,
+        "queries": sorted([*query_results, *reused_queries]),
+        "figures": sorted([*figures, *reused_figures]),
+    }
+    with open(staging / MANIFEST_FILE, "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+
+    return fingerprint
+
+
+def load_snapshot(database_path: str, snapshot_folder: str) -> Snapshot | None:
+    """
+    Load the snapshot bundle if it was built from the given database
+
+    Args:
+        database_path (str): The path to the database file
+        snapshot_folder (str): The folder where the bundle was written
+
+    Returns:
+        Snapshot | None: The snapshot, or None if it is missing, outdated or was
+        built from a different database
+    """
+    manifest = _read_manifest(snapshot_folder)
+    if manifest is None or not Path(database_path).exists():
+        return None
+
+    fingerprint = get_database_fingerprint(database_path)
+    if manifest.get("fingerprint") != fingerprint:
+        return None
+
+    query_results: dict[str, DataFrame] = {
+        query_name: read_feather(
+            Path(snapshot_folder) / QUERIES_FOLDER / f"{query_name}.arrow"
+        )
+        for query_name in manifest["queries"]
+    }
+
+    figures = {}
+    for figure_name in manifest["figures"]:
+        with open(
+            Path(snapshot_folder) / FIGURES_FOLDER / f"{figure_name}.pickle", "rb"
+        ) as file:
+            figures[figure_name] = pickle.load(file)
+
+    return Snapshot(
+        fingerprint=fingerprint, query_results=query_results, figures=figures
+    )
+
+
+def main() -> None:
+    """
+    Build the snapshot bundle for the configured database, running the ETL first if
+    the database is missing or stores the money in an older format
+    """
+    database_path = Path(get_database_path())
+    engine = create_database_engine(str(database_path))
+
+    if not database_path.exists() or database_path.stat().st_size == 0:
+        print("Database not found or empty. Starting ETL process...")
+        run_etl = True
+    elif has_stale_money_columns(engine):
+        print("Database stores the money as reais, not cents. Starting ETL process...")
+        run_etl = True
+    else:
+        run_etl = False
+
+    if run_etl:
+        chunks = iter_extract(
+            csv_folder=config.DATASET_ROOT_PATH,
+            csv_table_mapping=config.get_csv_to_table_mapping(),
+            public_holidays_url=config.PUBLIC_HOLIDAYS_URL,
+            chunk_size=config.ETL_CHUNK_SIZE,
+            encoder=IdEncoder() if config.ENCODE_IDS else None,
+        )
+        load_chunks(chunks=compact_geolocation(chunks), database=engine)
+
+    # Databases built before the indexes and the materializations existed get them
+    # before being fingerprinted, the dashboard then only reads the database
+    create_indexes(engine)
+    build_materializations(engine)
+    # Release the pooled connections so the file is not touched after hashing it
+    engine.dispose()
+    fingerprint = export_snapshot(
+        database=engine,
+        database_path=str(database_path),
+        snapshot_folder=config.SNAPSHOT_ROOT_PATH,
+    )
+    engine.dispose()
+    print(f"Snapshot written to {config.SNAPSHOT_ROOT_PATH} ({fingerprint[:12]}).")
+
+
+if __name__ == "__main__":
+    main()
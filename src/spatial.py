@@ -0,0 +1,153 @@
+import numpy as np
+from pandas import DataFrame
+
+from src.utils.money import from_cents
+
+EARTH_RADIUS_KM = 6371.0088
+
+ZIP_CODE_PREFIX = "geolocation_zip_code_prefix"
+
+
+class ZipPrefixIndex:
+    """
+    Spatial index of the zip code prefixes: their centroids in arrays sorted by
+    prefix, so a whole column of prefixes is looked up with one binary search
+    """
+
+    def __init__(self, prefixes: np.ndarray, lat: np.ndarray, lng: np.ndarray) -> None:
+        order = np.argsort(prefixes, kind="stable")
+        self.prefixes = np.asarray(prefixes)[order]
+        self.lat = np.asarray(lat, dtype=float)[order]
+        self.lng = np.asarray(lng, dtype=float)[order]
+
+    @classmethod
+    def from_geolocation(cls, geolocation: DataFrame) -> "ZipPrefixIndex":
+        """
+        Build the index from the geolocation table
+
+        Args:
+            geolocation (DataFrame): olist_geolocation_compacted, or the raw
+                olist_geolocation whose coordinates are averaged per prefix
+
+        Returns:
+            ZipPrefixIndex: The index
+        """
+        if not geolocation[ZIP_CODE_PREFIX].is_unique:
+            geolocation = (
+                geolocation.groupby(ZIP_CODE_PREFIX)[
+                    ["geolocation_lat", "geolocation_lng"]
+                ]
+                .mean()
+                .reset_index()
+            )
+
+        return cls(
+            geolocation[ZIP_CODE_PREFIX].to_numpy(),
+            geolocation["geolocation_lat"].to_numpy(),
+            geolocation["geolocation_lng"].to_numpy(),
+        )
+
+    def lookup(self, prefixes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the centroid of each prefix
+
+        Args:
+            prefixes (np.ndarray): The zip code prefixes to look up
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The latitudes and longitudes, NaN for the unknown prefixes
+        """
+        prefixes = np.asarray(prefixes)
+        if len(self.prefixes) == 0:
+            missing = np.full(len(prefixes), np.nan)
+            return missing, missing.copy()
+
+        positions = np.searchsorted(self.prefixes, prefixes)
+        positions = np.minimum(positions, len(self.prefixes) - 1)
+        found = self.prefixes[positions] == prefixes
+
+        lat = np.where(found, self.lat[positions], np.nan)
+        lng = np.where(found, self.lng[positions], np.nan)
+        return lat, lng
+
+
+def haversine_km(
+    lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray
+) -> np.ndarray:
+    """
+    Get the great circle distance between pairs of points
+
+    Args:
+        lat1 (np.ndarray): The latitudes of the first points, in degrees
+        lng1 (np.ndarray): The longitudes of the first points, in degrees
+        lat2 (np.ndarray): The latitudes of the second points, in degrees
+        lng2 (np.ndarray): The longitudes of the second points, in degrees
+
+    Returns:
+        np.ndarray: The distances in kilometers
+    """
+    lat1, lng1, lat2, lng2 = (
+        np.radians(np.asarray(values, dtype=float))
+        for values in (lat1, lng1, lat2, lng2)
+    )
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def get_freight_value_distance_relationship(
+    orders: DataFrame,
+    items: DataFrame,
+    customers: DataFrame,
+    sellers: DataFrame,
+    geolocation: DataFrame,
+) -> DataFrame:
+    """
+    Get the customer to seller distance and the freight value of each item of the
+    delivered orders. Items whose customer or seller zip code prefix has no
+    coordinates are left out
+
+    Args:
+        orders (DataFrame): The olist_orders table
+        items (DataFrame): The olist_order_items table
+        customers (DataFrame): The olist_customers table
+        sellers (DataFrame): The olist_sellers table
+        geolocation (DataFrame): The olist_geolocation_compacted or olist_geolocation table
+
+    Returns:
+        DataFrame: The distance_km and freight_value of each item, in the order of the
+            items table. The freight values are converted from cents to reais
+    """
+    delivered = orders.loc[
+        orders["order_status"] == "delivered", ["order_id", "customer_id"]
+    ]
+    data = (
+        items[["order_id", "seller_id", "freight_value"]]
+        .merge(delivered, on="order_id", sort=False)
+        .merge(
+            customers[["customer_id", "customer_zip_code_prefix"]],
+            on="customer_id",
+            sort=False,
+        )
+        .merge(
+            sellers[["seller_id", "seller_zip_code_prefix"]], on="seller_id", sort=False
+        )
+    )
+
+    index = ZipPrefixIndex.from_geolocation(geolocation)
+    customer_lat, customer_lng = index.lookup(
+        data["customer_zip_code_prefix"].to_numpy()
+    )
+    seller_lat, seller_lng = index.lookup(data["seller_zip_code_prefix"].to_numpy())
+    distance_km = haversine_km(customer_lat, customer_lng, seller_lat, seller_lng)
+
+    result = DataFrame(
+        {
+            "distance_km": distance_km,
+            "freight_value": from_cents(data["freight_value"]).to_numpy(),
+        }
+    )
+    return result[~np.isnan(distance_km)].reset_index(drop=True)
@@ -0,0 +1,932 @@
+import argparse
+import zlib
+from pathlib import Path
+
+import numpy as np
+from pandas import DataFrame, concat, to_datetime
+
+from src import config
+
+# Row counts of the real dataset, scaled by the scale factor
+BASE_CUSTOMERS = 99441
+BASE_PRODUCTS = 32951
+BASE_SELLERS = 3095
+BASE_GEOLOCATION = 1000163
+
+# The zip code space does not grow with the data, only the rows per prefix do
+ZIP_PREFIXES = 19015
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+FIRST_PURCHASE = np.datetime64("2016-09-04T21:15:19", "s")
+LAST_PURCHASE = np.datetime64("2018-10-17T17:30:18", "s")
+RAMP_START = np.datetime64("2016-10-01T00:00:00", "s")
+RAMP_END = np.datetime64("2018-08-31T23:59:59", "s")
+BLACK_FRIDAY = np.datetime64("2017-11-24T00:00:00", "s")
+
+SECONDS_PER_DAY = 86400
+
+# State, share of the customers, capital, latitude and longitude of the center,
+# and the zip code prefix ranges of the state
+STATES = [
+    ("SP", 0.4198, "sao paulo", -23.55, -46.63, [(1000, 19999)]),
+    ("RJ", 0.1292, "rio de janeiro", -22.90, -43.20, [(20000, 28999)]),
+    ("MG", 0.1170, "belo horizonte", -19.92, -43.94, [(30000, 39999)]),
+    ("RS", 0.0550, "porto alegre", -30.03, -51.23, [(90000, 99999)]),
+    ("PR", 0.0507, "curitiba", -25.43, -49.27, [(80000, 87999)]),
+    ("SC", 0.0366, "florianopolis", -27.60, -48.55, [(88000, 89999)]),
+    ("BA", 0.0340, "salvador", -12.97, -38.50, [(40000, 48999)]),
+    ("DF", 0.0215, "brasilia", -15.79, -47.88, [(70000, 72799)]),
+    ("ES", 0.0204, "vitoria", -20.32, -40.34, [(29000, 29999)]),
+    ("GO", 0.0203, "goiania", -16.68, -49.25, [(72800, 76799)]),
+    ("PE", 0.0166, "recife", -8.05, -34.88, [(50000, 56999)]),
+    ("CE", 0.0134, "fortaleza", -3.73, -38.52, [(60000, 63999)]),
+    ("PA", 0.0098, "belem", -1.46, -48.49, [(66000, 68899)]),
+    ("MT", 0.0091, "cuiaba", -15.60, -56.10, [(78000, 78899)]),
+    ("MA", 0.0075, "sao luis", -2.53, -44.30, [(65000, 65999)]),
+    ("MS", 0.0072, "campo grande", -20.44, -54.65, [(79000, 79999)]),
+    ("PB", 0.0054, "joao pessoa", -7.12, -34.86, [(58000, 58999)]),
+    ("PI", 0.0050, "teresina", -5.09, -42.80, [(64000, 64999)]),
+    ("RN", 0.0049, "natal", -5.79, -35.21, [(59000, 59999)]),
+    ("AL", 0.0042, "maceio", -9.67, -35.74, [(57000, 57999)]),
+    ("SE", 0.0035, "aracaju", -10.91, -37.07, [(49000, 49999)]),
+    ("TO", 0.0028, "palmas", -10.18, -48.33, [(77000, 77999)]),
+    ("RO", 0.0025, "porto velho", -8.76, -63.90, [(76800, 76999)]),
+    ("AM", 0.0015, "manaus", -3.12, -60.02, [(69000, 69299), (69400, 69899)]),
+    ("AC", 0.0008, "rio branco", -9.97, -67.81, [(69900, 69999)]),
+    ("AP", 0.0007, "macapa", 0.03, -51.05, [(68900, 68999)]),
+    ("RR", 0.0005, "boa vista", 2.82, -60.67, [(69300, 69399)]),
+]
+
+CITY_PREFIXES = ["santa", "sao", "nova", "boa", "porto", "campo", "rio", "vila"]
+CITY_SUFFIXES = [
+    "esperanca",
+    "vista",
+    "alegre",
+    "grande",
+    "verde",
+    "bonito",
+    "feliz",
+    "branco",
+    "claro",
+    "dourado",
+]
+
+# Portuguese and english category names, most sold first
+CATEGORIES = [
+    ("cama_mesa_banho", "bed_bath_table"),
+    ("beleza_saude", "health_beauty"),
+    ("esporte_lazer", "sports_leisure"),
+    ("moveis_decoracao", "furniture_decor"),
+    ("informatica_acessorios", "computers_accessories"),
+    ("utilidades_domesticas", "housewares"),
+    ("relogios_presentes", "watches_gifts"),
+    ("telefonia", "telephony"),
+    ("ferramentas_jardim", "garden_tools"),
+    ("automotivo", "auto"),
+    ("brinquedos", "toys"),
+    ("cool_stuff", "cool_stuff"),
+    ("perfumaria", "perfumery"),
+    ("bebes", "baby"),
+    ("eletronicos", "electronics"),
+    ("papelaria", "stationery"),
+    ("fashion_bolsas_e_acessorios", "fashion_bags_accessories"),
+    ("pet_shop", "pet_shop"),
+    ("moveis_escritorio", "office_furniture"),
+    ("consoles_games", "consoles_games"),
+    ("malas_acessorios", "luggage_accessories"),
+    ("construcao_ferramentas_construcao", "construction_tools_construction"),
+    ("eletrodomesticos", "home_appliances"),
+    ("instrumentos_musicais", "musical_instruments"),
+    ("eletroportateis", "small_appliances"),
+    ("casa_construcao", "home_construction"),
+    ("livros_interesse_geral", "books_general_interest"),
+    ("alimentos", "food"),
+    ("moveis_sala", "furniture_living_room"),
+    ("casa_conforto", "home_confort"),
+    ("bebidas", "drinks"),
+    ("audio", "audio"),
+    ("market_place", "market_place"),
+    ("construcao_ferramentas_iluminacao", "construction_tools_lights"),
+    ("climatizacao", "air_conditioning"),
+    (
+        "moveis_cozinha_area_de_servico_jantar_e_jardim",
+        "kitchen_dining_laundry_garden_furniture",
+    ),
+    ("alimentos_bebidas", "food_drink"),
+    ("industria_comercio_e_negocios", "industry_commerce_and_business"),
+    ("livros_tecnicos", "books_technical"),
+    ("telefonia_fixa", "fixed_telephony"),
+    ("fashion_calcados", "fashion_shoes"),
+    ("eletrodomesticos_2", "home_appliances_2"),
+    ("construcao_ferramentas_jardim", "costruction_tools_garden"),
+    ("agro_industria_e_comercio", "agro_industry_and_commerce"),
+    ("artes", "art"),
+    ("pcs", "computers"),
+    ("sinalizacao_e_seguranca", "signaling_and_security"),
+    ("construcao_ferramentas_seguranca", "construction_tools_safety"),
+    ("artigos_de_natal", "christmas_supplies"),
+    ("fashion_roupa_masculina", "fashion_male_clothing"),
+    ("moveis_quarto", "furniture_bedroom"),
+    ("fashion_underwear_e_moda_praia", "fashion_underwear_beach"),
+    ("construcao_ferramentas_ferramentas", "costruction_tools_tools"),
+    ("tablets_impressao_imagem", "tablets_printing_image"),
+    ("livros_importados", "books_imported"),
+    ("portateis_casa_forno_e_cafe", "small_appliances_home_oven_and_coffee"),
+    ("fashion_esporte", "fashion_sport"),
+    ("artigos_de_festas", "party_supplies"),
+    ("moveis_colchao_e_estofado", "furniture_mattress_and_upholstery"),
+    ("cine_foto", "cine_photo"),
+    ("fashion_roupa_feminina", "fashio_female_clothing"),
+    ("musica", "music"),
+    ("la_cuisine", "la_cuisine"),
+    ("dvds_blu_ray", "dvds_blu_ray"),
+    ("artes_e_artesanato", "arts_and_craftmanship"),
+    ("flores", "flowers"),
+    ("fraldas_higiene", "diapers_and_hygiene"),
+    ("casa_conforto_2", "home_comfort_2"),
+    ("fashion_roupa_infanto_juvenil", "fashion_childrens_clothes"),
+    ("cds_dvds_musicais", "cds_dvds_musicals"),
+    ("seguros_e_servicos", "security_and_services"),
+]
+
+ORDER_STATUSES = [
+    ("delivered", 0.9702),
+    ("shipped", 0.0111),
+    ("canceled", 0.0063),
+    ("unavailable", 0.0061),
+    ("invoiced", 0.0032),
+    ("processing", 0.0030),
+    ("created", 0.00005),
+    ("approved", 0.00002),
+]
+
+PAYMENT_TYPES = [
+    ("credit_card", 0.7554),
+    ("boleto", 0.1979),
+    ("debit_card", 0.0154),
+    ("voucher", 0.0313),
+]
+
+REVIEW_SCORES = [(5, 0.5778), (4, 0.1929), (1, 0.1151), (3, 0.0824), (2, 0.0318)]
+REVIEW_TITLES = ["recomendo", "otimo", "bom", "super recomendo", "nao recebi"]
+REVIEW_MESSAGES = [
+    "Produto chegou antes do prazo, muito bom.",
+    "Recomendo o vendedor.",
+    "Ainda nao recebi o produto.",
+    "Produto de otima qualidade.",
+    "Veio diferente do anunciado.",
+]
+
+# Number of items per order and its probability
+ITEMS_PER_ORDER = [
+    (1, 0.9010),
+    (2, 0.0755),
+    (3, 0.0131),
+    (4, 0.0050),
+    (5, 0.0020),
+    (6, 0.0034),
+]
+
+
+def _stream_key(seed: int, stream: str) -> np.uint64:
+    return _mix(
+        np.array([(seed << 32) | zlib.crc32(stream.encode())], dtype=np.uint64)
+    )[0]
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, a bijection on 64 bit integers
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _hash(seed: int, stream: str, index: np.ndarray) -> np.ndarray:
+    return _mix(index.astype(np.uint64) ^ _stream_key(seed, stream))
+
+
+def _uniform(seed: int, stream: str, index: np.ndarray) -> np.ndarray:
+    # Every value only depends on the seed, the stream and the entity index, so the
+    # output does not depend on the chunk size
+    return (_hash(seed, stream, index) >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+
+def _normal(seed: int, stream: str, index: np.ndarray) -> np.ndarray:
+    u1 = np.maximum(_uniform(seed, stream + ":u1", index), 2.0**-53)
+    u2 = _uniform(seed, stream + ":u2", index)
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+
+def _choice(u: np.ndarray, weights: list[float]) -> np.ndarray:
+    cumulative = np.cumsum(weights) / np.sum(weights)
+    return np.minimum(np.searchsorted(cumulative, u, side="right"), len(weights) - 1)
+
+
+def _skewed_index(u: np.ndarray, size: int, skew: float) -> np.ndarray:
+    # Power law popularity: low indices are picked far more often than high ones
+    return np.minimum((size * u**skew).astype(np.int64), size - 1)
+
+
+def make_ids(seed: int, stream: str, index: np.ndarray) -> np.ndarray:
+    """
+    Make 32 character hex ids, unique for each index of a stream
+
+    Args:
+        seed (int): The seed of the dataset
+        stream (str): The kind of id, e.g. 'order'
+        index (np.ndarray): The entity indexes
+
+    Returns:
+        np.ndarray: The ids
+    """
+    halves = np.empty((len(index), 2), dtype=">u8")
+    halves[:, 0] = _hash(seed, stream + ":hi", index)
+    halves[:, 1] = _hash(seed, stream + ":lo", index)
+    hexed = halves.tobytes().hex().encode()
+    return np.frombuffer(hexed, dtype="S32").astype(str)
+
+
+def get_scaled_counts(scale_factor: float) -> dict[str, int]:
+    """
+    Get the number of entities of each kind at the given scale factor
+
+    Args:
+        scale_factor (float): The scale factor, 1 matches the real dataset
+
+    Returns:
+        dict[str, int]: The number of customers (and orders), products, sellers and geolocation rows
+    """
+    return {
+        "customers": max(1, round(BASE_CUSTOMERS * scale_factor)),
+        "products": max(1, round(BASE_PRODUCTS * scale_factor)),
+        "sellers": max(1, round(BASE_SELLERS * scale_factor)),
+        "geolocation": max(1, round(BASE_GEOLOCATION * scale_factor)),
+    }
+
+
+def build_zip_prefixes(seed: int) -> DataFrame:
+    """
+    Build the zip code prefixes shared by customers, sellers and geolocation
+
+    Args:
+        seed (int): The seed of the dataset
+
+    Returns:
+        DataFrame: One row per prefix with its state index, city and centroid
+    """
+    shares = np.array([state[1] for state in STATES]) ** 0.7
+    counts = np.maximum(5, np.round(shares / shares.sum() * ZIP_PREFIXES)).astype(int)
+
+    frames = []
+    for state_index, (state, _, capital, lat, lng, ranges) in enumerate(STATES):
+        candidates = np.concatenate([np.arange(low, high + 1) for low, high in ranges])
+        count = min(counts[state_index], len(candidates))
+        positions = np.linspace(0, len(candidates) - 1, count).astype(int)
+        prefixes = candidates[positions]
+
+        city_u = _uniform(seed, "prefix_city", prefixes)
+        generic = [
+            f"{CITY_PREFIXES[i % len(CITY_PREFIXES)]} {CITY_SUFFIXES[i // len(CITY_PREFIXES) % len(CITY_SUFFIXES)]}"
+            for i in (_hash(seed, "prefix_city_name", prefixes) % np.uint64(80)).astype(
+                int
+            )
+        ]
+        frames.append(
+            DataFrame(
+                {
+                    "zip_code_prefix": prefixes,
+                    "state_index": state_index,
+                    "city": np.where(city_u < 0.3, capital, generic),
+                    "lat": lat + 1.5 * _normal(seed, "prefix_lat", prefixes),
+                    "lng": lng + 1.5 * _normal(seed, "prefix_lng", prefixes),
+                }
+            )
+        )
+
+    zip_prefixes = concat(frames, ignore_index=True)
+    return zip_prefixes.sort_values(
+        ["state_index", "zip_code_prefix"], ignore_index=True
+    )
+
+
+def _pick_zip_prefixes(
+    seed: int,
+    stream: str,
+    index: np.ndarray,
+    zip_prefixes: DataFrame,
+    state_weights: list[float],
+) -> np.ndarray:
+    # Pick a state by its share, then a prefix of that state, favouring the first ones
+    state_index = _choice(_uniform(seed, stream + ":state", index), state_weights)
+    bounds = np.searchsorted(
+        zip_prefixes["state_index"].to_numpy(), np.arange(len(STATES) + 1)
+    )
+    starts, sizes = bounds[state_index], np.diff(bounds)[state_index]
+    offsets = (sizes * _uniform(seed, stream + ":prefix", index) ** 1.5).astype(
+        np.int64
+    )
+    return starts + np.minimum(offsets, sizes - 1)
+
+
+def _product_price(seed: int, product_index: np.ndarray) -> np.ndarray:
+    return np.round(
+        np.clip(
+            np.exp(4.35 + 0.95 * _normal(seed, "product_price", product_index)),
+            0.85,
+            6735.0,
+        ),
+        2,
+    )
+
+
+def _product_weight(seed: int, product_index: np.ndarray) -> np.ndarray:
+    return np.round(
+        np.clip(
+            np.exp(6.6 + 1.3 * _normal(seed, "product_weight", product_index)),
+            50,
+            40425,
+        )
+    )
+
+
+def _format_dates(seconds: np.ndarray) -> np.ndarray:
+    return to_datetime(seconds, unit="s").strftime(DATE_FORMAT).to_numpy(dtype=object)
+
+
+def _purchase_seconds(seed: int, index: np.ndarray) -> np.ndarray:
+    ramp_start = RAMP_START.astype(np.int64)
+    ramp_length = (RAMP_END - RAMP_START).astype(np.int64)
+    full_start = FIRST_PURCHASE.astype(np.int64)
+    full_length = (LAST_PURCHASE - FIRST_PURCHASE).astype(np.int64)
+
+    mode = _uniform(seed, "purchase_mode", index)
+    u = _uniform(seed, "purchase_time", index)
+
+    # Linear growth of the daily orders, a Black Friday spike and a thin uniform tail
+    ramp = ramp_start + (np.sqrt(u) * ramp_length).astype(np.int64)
+    black_friday = BLACK_FRIDAY.astype(np.int64) + (u * SECONDS_PER_DAY).astype(
+        np.int64
+    )
+    tail = full_start + (u * full_length).astype(np.int64)
+
+    return np.where(mode < 0.985, ramp, np.where(mode < 0.99, black_friday, tail))
+
+
+def _write_csv(dataframe: DataFrame, path: Path, header: bool) -> None:
+    dataframe.to_csv(path, mode="w" if header else "a", header=header, index=False)
+
+
+def generate_orders_chunk(
+    seed: int, start: int, end: int, counts: dict[str, int], zip_prefixes: DataFrame
+) -> dict[str, DataFrame]:
+    """
+    Generate the customers, orders, items, payments and reviews of a range of orders.
+    Every order has its own customer, like in the real dataset
+
+    Args:
+        seed (int): The seed of the dataset
+        start (int): The index of the first order
+        end (int): The index after the last order
+        counts (dict[str, int]): The scaled counts returned by get_scaled_counts
+        zip_prefixes (DataFrame): The prefixes returned by build_zip_prefixes
+
+    Returns:
+        dict[str, DataFrame]: The rows of each table, keyed by table name
+    """
+    index = np.arange(start, end, dtype=np.int64)
+    n_orders = len(index)
+
+    # Customers. About 3% of them are returning customers sharing a customer_unique_id
+    n_unique = max(1, round(counts["customers"] * 0.9664))
+    returning = _uniform(seed, "customer_returning", index) < 0.0336
+    unique_index = np.where(
+        returning,
+        _skewed_index(_uniform(seed, "customer_unique", index), n_unique, 1.5),
+        index % n_unique,
+    )
+    customer_prefix = zip_prefixes.iloc[
+        _pick_zip_prefixes(
+            seed, "customer", index, zip_prefixes, [state[1] for state in STATES]
+        )
+    ]
+    customer_ids = make_ids(seed, "customer", index)
+    customers = DataFrame(
+        {
+            "customer_id": customer_ids,
+            "customer_unique_id": make_ids(seed, "customer_unique", unique_index),
+            "customer_zip_code_prefix": customer_prefix["zip_code_prefix"].to_numpy(),
+            "customer_city": customer_prefix["city"].to_numpy(),
+            "customer_state": [STATES[i][0] for i in customer_prefix["state_index"]],
+        }
+    )
+
+    # Orders
+    order_ids = make_ids(seed, "order", index)
+    status_index = _choice(
+        _uniform(seed, "order_status", index), [status[1] for status in ORDER_STATUSES]
+    )
+    status = np.array([status[0] for status in ORDER_STATUSES])[status_index]
+
+    purchase = _purchase_seconds(seed, index)
+    approved = purchase + (
+        3600 * np.exp(2.3 + 0.8 * _normal(seed, "approved_delay", index))
+    ).astype(np.int64)
+    carrier = approved + (
+        SECONDS_PER_DAY * np.exp(0.9 + 0.6 * _normal(seed, "carrier_delay", index))
+    ).astype(np.int64)
+    delivered = carrier + (
+        SECONDS_PER_DAY * np.exp(2.0 + 0.55 * _normal(seed, "delivery_delay", index))
+    ).astype(np.int64)
+    estimated_days = np.clip(
+        np.round(23.5 + 8.8 * _normal(seed, "estimated_days", index)), 3, 155
+    ).astype(np.int64)
+    estimated = (purchase // SECONDS_PER_DAY + estimated_days) * SECONDS_PER_DAY
+
+    has_approval = ~np.isin(status, ["created"])
+    has_carrier = np.isin(status, ["delivered", "shipped"])
+    is_delivered = status == "delivered"
+
+    orders = DataFrame(
+        {
+            "order_id": order_ids,
+            "customer_id": customer_ids,
+            "order_status": status,
+            "order_purchase_timestamp": _format_dates(purchase),
+            "order_approved_at": np.where(has_approval, _format_dates(approved), None),
+            "order_delivered_carrier_date": np.where(
+                has_carrier, _format_dates(carrier), None
+            ),
+            "order_delivered_customer_date": np.where(
+                is_delivered, _format_dates(delivered), None
+            ),
+            "order_estimated_delivery_date": _format_dates(estimated),
+        }
+    )
+
+    # Order items. Unavailable and created orders have no items
+    items_per_order = np.array([item[0] for item in ITEMS_PER_ORDER])[
+        _choice(
+            _uniform(seed, "items_per_order", index),
+            [item[1] for item in ITEMS_PER_ORDER],
+        )
+    ]
+    items_per_order[np.isin(status, ["unavailable", "created"])] = 0
+    item_order = np.repeat(index, items_per_order)
+    item_local = np.repeat(np.arange(n_orders), items_per_order)
+    first_item = np.repeat(
+        np.cumsum(items_per_order) - items_per_order, items_per_order
+    )
+    item_number = np.arange(len(item_order)) - first_item + 1
+    item_key = item_order * 8 + item_number
+
+    # Multi item orders often repeat the same product
+    main_product = _skewed_index(
+        _uniform(seed, "order_product", item_order), counts["products"], 2.5
+    )
+    other_product = _skewed_index(
+        _uniform(seed, "item_product", item_key), counts["products"], 2.5
+    )
+    same_product = (item_number == 1) | (
+        _uniform(seed, "item_same_product", item_key) < 0.7
+    )
+    product_index = np.where(same_product, main_product, other_product)
+    seller_index = _skewed_index(
+        _uniform(seed, "product_seller", product_index), counts["sellers"], 2.2
+    )
+
+    price = _product_price(seed, product_index)
+    weight = _product_weight(seed, product_index)
+    freight = np.round(
+        np.clip(
+            8.0 + 0.0016 * weight + 4.0 * _normal(seed, "item_freight", item_key),
+            0.0,
+            409.68,
+        ),
+        2,
+    )
+
+    order_items = DataFrame(
+        {
+            "order_id": order_ids[item_local],
+            "order_item_id": item_number,
+            "product_id": make_ids(seed, "product", product_index),
+            "seller_id": make_ids(seed, "seller", seller_index),
+            "shipping_limit_date": _format_dates(
+                approved[item_local] + 6 * SECONDS_PER_DAY
+            ),
+            "price": price,
+            "freight_value": freight,
+        }
+    )
+
+    # Payments. Most orders are paid at once, the others add vouchers
+    order_total = np.bincount(item_local, weights=price + freight, minlength=n_orders)
+    no_items = items_per_order == 0
+    order_total[no_items] = np.round(
+        np.exp(4.6 + 0.8 * _normal(seed, "payment_total", index[no_items])), 2
+    )
+
+    split_u = _uniform(seed, "payment_split", index)
+    payments_per_order = np.where(
+        split_u < 0.97, 1, np.where(split_u < 0.99, 2, np.where(split_u < 0.997, 3, 4))
+    )
+    payment_order = np.repeat(index, payments_per_order)
+    payment_local = np.repeat(np.arange(n_orders), payments_per_order)
+    first_payment = np.repeat(
+        np.cumsum(payments_per_order) - payments_per_order, payments_per_order
+    )
+    payment_sequential = np.arange(len(payment_order)) - first_payment + 1
+    payment_key = payment_order * 8 + payment_sequential
+
+    share = 0.2 + _uniform(seed, "payment_share", payment_key)
+    share = (
+        share
+        / np.bincount(payment_local, weights=share, minlength=n_orders)[payment_local]
+    )
+    payment_value = np.round(order_total[payment_local] * share, 2)
+    # The last payment absorbs the rounding, so payments add up to the order total
+    is_last = payment_sequential == payments_per_order[payment_local]
+    paid_before = np.bincount(
+        payment_local, weights=np.where(is_last, 0.0, payment_value), minlength=n_orders
+    )
+    payment_value = np.where(
+        is_last,
+        np.round(order_total[payment_local] - paid_before[payment_local], 2),
+        payment_value,
+    )
+
+    payment_type_index = _choice(
+        _uniform(seed, "payment_type", payment_order),
+        [kind[1] for kind in PAYMENT_TYPES],
+    )
+    payment_type = np.array([kind[0] for kind in PAYMENT_TYPES])[payment_type_index]
+    payment_type = np.where(
+        payments_per_order[payment_local] > 1,
+        np.where(is_last, payment_type, "voucher"),
+        payment_type,
+    )
+    installments = np.where(
+        payment_type == "credit_card",
+        np.where(
+            _uniform(seed, "payment_installments", payment_key) < 0.5,
+            1,
+            _skewed_index(_uniform(seed, "installments_count", payment_key), 9, 1.6)
+            + 2,
+        ),
+        1,
+    )
+
+    order_payments = DataFrame(
+        {
+            "order_id": order_ids[payment_local],
+            "payment_sequential": payment_sequential,
+            "payment_type": payment_type,
+            "payment_installments": installments,
+            "payment_value": payment_value,
+        }
+    )
+
+    # Reviews. Almost every order has one, written after the delivery
+    has_review = _uniform(seed, "has_review", index) < 0.9978
+    review_index = index[has_review]
+    review_base = np.where(is_delivered, delivered, estimated)[has_review]
+    review_created = (review_base // SECONDS_PER_DAY + 1) * SECONDS_PER_DAY
+    review_answered = review_created + (
+        SECONDS_PER_DAY
+        * np.exp(0.7 + 0.9 * _normal(seed, "review_answer", review_index))
+    ).astype(np.int64)
+    score_index = _choice(
+        _uniform(seed, "review_score", review_index),
+        [score[1] for score in REVIEW_SCORES],
+    )
+    title_u = _uniform(seed, "review_title", review_index)
+    message_u = _uniform(seed, "review_message", review_index)
+
+    order_reviews = DataFrame(
+        {
+            "review_id": make_ids(seed, "review", review_index),
+            "order_id": order_ids[has_review],
+            "review_score": np.array([score[0] for score in REVIEW_SCORES])[
+                score_index
+            ],
+            "review_comment_title": np.where(
+                title_u < 0.12,
+                np.array(REVIEW_TITLES, dtype=object)[
+                    (title_u * 1000).astype(int) % len(REVIEW_TITLES)
+                ],
+                None,
+            ),
+            "review_comment_message": np.where(
+                message_u < 0.41,
+                np.array(REVIEW_MESSAGES, dtype=object)[
+                    (message_u * 1000).astype(int) % len(REVIEW_MESSAGES)
+                ],
+                None,
+            ),
+            "review_creation_date": _format_dates(review_created),
+            "review_answer_timestamp": _format_dates(review_answered),
+        }
+    )
+
+    return {
+        "olist_customers": customers,
+        "olist_orders": orders,
+        "olist_order_items": order_items,
+        "olist_order_payments": order_payments,
+        "olist_order_reviews": order_reviews,
+    }
+
+
+def generate_products_chunk(seed: int, start: int, end: int) -> DataFrame:
+    """
+    Generate a range of products
+
+    Args:
+        seed (int): The seed of the dataset
+        start (int): The index of the first product
+        end (int): The index after the last product
+
+    Returns:
+        DataFrame: The products
+    """
+    index = np.arange(start, end, dtype=np.int64)
+
+    # Category popularity decays with the rank, a few products have no category
+    category_index = _skewed_index(
+        _uniform(seed, "product_category", index), len(CATEGORIES), 2.2
+    )
+    has_category = _uniform(seed, "product_has_category", index) >= 0.0185
+    category = np.where(
+        has_category,
+        np.array([name for name, _ in CATEGORIES], dtype=object)[category_index],
+        None,
+    )
+
+    weight = _product_weight(seed, index)
+    side = np.cbrt(weight) * 1.6
+
+    def dimension(stream: str, low: int, high: int) -> np.ndarray:
+        return np.clip(
+            np.round(side * np.exp(0.35 * _normal(seed, stream, index))), low, high
+        )
+
+    return DataFrame(
+        {
+            "product_id": make_ids(seed, "product", index),
+            "product_category_name": category,
+            "product_name_lenght": np.where(
+                has_category,
+                np.clip(
+                    np.round(48 + 10 * _normal(seed, "product_name", index)), 5, 76
+                ),
+                np.nan,
+            ),
+            "product_description_lenght": np.where(
+                has_category,
+                np.clip(
+                    np.round(
+                        np.exp(6.4 + 0.75 * _normal(seed, "product_description", index))
+                    ),
+                    4,
+                    3992,
+                ),
+                np.nan,
+            ),
+            "product_photos_qty": np.where(
+                has_category,
+                _skewed_index(_uniform(seed, "product_photos", index), 20, 3.0) + 1,
+                np.nan,
+            ),
+            "product_weight_g": weight,
+            "product_length_cm": dimension("product_length", 7, 105),
+            "product_height_cm": dimension("product_height", 2, 105),
+            "product_width_cm": dimension("product_width", 6, 118),
+        }
+    )
+
+
+def generate_sellers_chunk(
+    seed: int, start: int, end: int, zip_prefixes: DataFrame
+) -> DataFrame:
+    """
+    Generate a range of sellers. Sellers are even more concentrated in SP than customers
+
+    Args:
+        seed (int): The seed of the dataset
+        start (int): The index of the first seller
+        end (int): The index after the last seller
+        zip_prefixes (DataFrame): The prefixes returned by build_zip_prefixes
+
+    Returns:
+        DataFrame: The sellers
+    """
+    index = np.arange(start, end, dtype=np.int64)
+    weights = [state[1] ** 1.4 for state in STATES]
+    seller_prefix = zip_prefixes.iloc[
+        _pick_zip_prefixes(seed, "seller", index, zip_prefixes, weights)
+    ]
+
+    return DataFrame(
+        {
+            "seller_id": make_ids(seed, "seller", index),
+            "seller_zip_code_prefix": seller_prefix["zip_code_prefix"].to_numpy(),
+            "seller_city": seller_prefix["city"].to_numpy(),
+            "seller_state": [STATES[i][0] for i in seller_prefix["state_index"]],
+        }
+    )
+
+
+def get_geolocation_rows_per_prefix(
+    seed: int, total_rows: int, zip_prefixes: DataFrame
+) -> np.ndarray:
+    """
+    Split the geolocation rows between the prefixes, with a heavy tail like the real data
+
+    Args:
+        seed (int): The seed of the dataset
+        total_rows (int): The number of geolocation rows
+        zip_prefixes (DataFrame): The prefixes returned by build_zip_prefixes
+
+    Returns:
+        np.ndarray: The number of rows of each prefix, adding up to total_rows
+    """
+    weights = np.exp(
+        1.1
+        * _normal(
+            seed, "geolocation_weight", zip_prefixes["zip_code_prefix"].to_numpy()
+        )
+    )
+    expected = weights / weights.sum() * total_rows
+    rows = np.floor(expected).astype(np.int64)
+    # Hand the rows lost to the rounding to the largest remainders
+    missing = total_rows - rows.sum()
+    rows[np.argsort(expected - rows)[::-1][:missing]] += 1
+    return rows
+
+
+def generate_geolocation_chunk(
+    seed: int,
+    zip_prefixes: DataFrame,
+    rows_per_prefix: np.ndarray,
+    start: int,
+    end: int,
+) -> DataFrame:
+    """
+    Generate the geolocation rows of a range of prefixes
+
+    Args:
+        seed (int): The seed of the dataset
+        zip_prefixes (DataFrame): The prefixes returned by build_zip_prefixes
+        rows_per_prefix (np.ndarray): The rows of each prefix
+        start (int): The position of the first prefix
+        end (int): The position after the last prefix
+
+    Returns:
+        DataFrame: The geolocation rows
+    """
+    prefixes = zip_prefixes.iloc[start:end]
+    counts = rows_per_prefix[start:end]
+    row_index = np.arange(
+        rows_per_prefix[:start].sum(), rows_per_prefix[:end].sum(), dtype=np.int64
+    )
+
+    return DataFrame(
+        {
+            "geolocation_zip_code_prefix": np.repeat(
+                prefixes["zip_code_prefix"].to_numpy(), counts
+            ),
+            "geolocation_lat": np.repeat(prefixes["lat"].to_numpy(), counts)
+            + 0.02 * _normal(seed, "geolocation_lat", row_index),
+            "geolocation_lng": np.repeat(prefixes["lng"].to_numpy(), counts)
+            + 0.02 * _normal(seed, "geolocation_lng", row_index),
+            "geolocation_city": np.repeat(prefixes["city"].to_numpy(), counts),
+            "geolocation_state": np.repeat(
+                [STATES[i][0] for i in prefixes["state_index"]], counts
+            ),
+        }
+    )
+
+
+def generate_dataset(
+    output_folder: str,
+    scale_factor: float = 1.0,
+    seed: int = 42,
+    chunk_size: int = 50_000,
+) -> dict[str, int]:
+    """
+    Write a synthetic Olist dataset with the csv files of get_csv_to_table_mapping.
+    The output is deterministic for a seed and does not depend on the chunk size.
+    Only one chunk of rows is held in memory at a time
+
+    Args:
+        output_folder (str): The folder where the csv files are written
+        scale_factor (float, optional): The size relative to the real dataset. Defaults to 1.0
+        seed (int, optional): The seed. Defaults to 42
+        chunk_size (int, optional): The orders, products, sellers or prefixes generated at once. Defaults to 50_000
+
+    Returns:
+        dict[str, int]: The number of rows written, keyed by table name
+    """
+    folder = Path(output_folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = {
+        table_name: folder / csv_file
+        for csv_file, table_name in config.get_csv_to_table_mapping().items()
+    }
+    rows = {table_name: 0 for table_name in paths}
+
+    counts = get_scaled_counts(scale_factor)
+    zip_prefixes = build_zip_prefixes(seed)
+
+    def write(table_name: str, dataframe: DataFrame) -> None:
+        _write_csv(dataframe, paths[table_name], header=rows[table_name] == 0)
+        rows[table_name] += len(dataframe)
+
+    for start in range(0, counts["customers"], chunk_size):
+        chunk = generate_orders_chunk(
+            seed,
+            start,
+            min(start + chunk_size, counts["customers"]),
+            counts,
+            zip_prefixes,
+        )
+        for table_name, dataframe in chunk.items():
+            write(table_name, dataframe)
+
+    for start in range(0, counts["products"], chunk_size):
+        write(
+            "olist_products",
+            generate_products_chunk(
+                seed, start, min(start + chunk_size, counts["products"])
+            ),
+        )
+
+    for start in range(0, counts["sellers"], chunk_size):
+        write(
+            "olist_sellers",
+            generate_sellers_chunk(
+                seed, start, min(start + chunk_size, counts["sellers"]), zip_prefixes
+            ),
+        )
+
+    rows_per_prefix = get_geolocation_rows_per_prefix(
+        seed, counts["geolocation"], zip_prefixes
+    )
+    prefix_bounds = np.searchsorted(
+        np.cumsum(rows_per_prefix),
+        np.arange(0, counts["geolocation"], chunk_size),
+        side="right",
+    )
+    for start, end in zip(prefix_bounds, list(prefix_bounds[1:]) + [len(zip_prefixes)]):
+        if start < end:
+            write(
+                "olist_geolocation",
+                generate_geolocation_chunk(
+                    seed, zip_prefixes, rows_per_prefix, start, end
+                ),
+            )
+
+    write(
+        "product_category_name_translation",
+        DataFrame(
+            CATEGORIES,
+            columns=["product_category_name", "product_category_name_english"],
+        ),
+    )
+
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Generate a synthetic dataset from the command line
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.synthetic",
+        description="Generate a synthetic Olist dataset at a chosen scale factor",
+    )
+    parser.add_argument(
+        "output_folder", help="The folder where the csv files are written"
+    )
+    parser.add_argument(
+        "--scale-factor", type=float, default=1.0, help="1 matches the real dataset"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--chunk-size", type=int, default=50_000, help="The rows generated at once"
+    )
+    args = parser.parse_args(argv)
+
+    rows = generate_dataset(
+        args.output_folder, args.scale_factor, args.seed, args.chunk_size
+    )
+    for table_name, count in rows.items():
+        print(f"{table_name:<36}{count:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,28 @@ from enum import Enum
 from typing import Callable
 
 from pandas import DataFrame, merge, read_sql, to_datetime
-from sqlalchemy import Engine, TextClause, text
+from sqlalchemy import Engine, String, TextClause, bindparam, inspect, text
 
+from src.compaction import COMPACTED_GEOLOCATION_TABLE, GEOLOCATION_TABLE
 from src.config import QUERIES_ROOT_PATH
+from src.customers import summarize_cohorts, summarize_rfm_scores
+from src.encoding import decode_ids, read_id_dictionary
+from src.holidays import OrderVolume
+from src.spatial import get_freight_value_distance_relationship
+from src.utils.money import from_cents
+from src.utils.sql_dialect import translate_sql
 
 QueryResult = namedtuple("QueryResult", ["query", "result"])
+QueryFilters = namedtuple(
+    "QueryFilters", ["start_year", "end_year", "states", "categories"]
+)
+FilterOptions = namedtuple("FilterOptions", ["years", "states", "categories"])
+
+# The aggregates of src/incremental.py the filtered queries read when they are built
+FILTERED_AGGREGATE_TABLES = [
+    "aggregate_filtered_revenue",
+    "aggregate_filtered_category_revenue",
+]
 
 
 class QueryEnum(Enum):
@@ -22,21 +39,34 @@ class QueryEnum(Enum):
     REAL_VS_ESTIMATED_DELIVERED_TIME = "real_vs_estimated_delivered_time"
     ORDERS_PER_DAY_AND_HOLIDAYS_2017 = "orders_per_day_and_holidays_2017"
     GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP = "get_freight_value_weight_relationship"
+    FREIGHT_VALUE_DISTANCE_RELATIONSHIP = "freight_value_distance_relationship"
+    CUSTOMER_RFM_SEGMENTS = "customer_rfm_segments"
+    CUSTOMER_COHORT_RETENTION = "customer_cohort_retention"
+    HOLIDAY_IMPACT = "holiday_impact"
+
+
+class FilteredQueryEnum(Enum):
+    """Enumerates the queries that accept dashboard filters"""
 
+    FILTERED_REVENUE_BY_MONTH = "filtered_revenue_by_month"
+    FILTERED_REVENUE_PER_STATE = "filtered_revenue_per_state"
+    FILTERED_REVENUE_PER_CATEGORY = "filtered_revenue_per_category"
 
-def read_query(query_name: str) -> TextClause:
+
+def read_query(query_name: str, dialect: str = "sqlite") -> TextClause:
     """
     Reads the query from the file and returns it as a string
 
     Args:
         query_name (str): The name of the query
+        dialect (str, optional): The SQL dialect to translate the query to. Defaults to "sqlite"
 
     Returns:
         TextClause: The query
     """
     with open("{}/{}.sql".format(QUERIES_ROOT_PATH, query_name), "r") as file:
         sql_file = file.read()
-        sql = text(sql_file)
+        sql = text(translate_sql(sql_file, dialect))
     return sql
 
 
@@ -51,7 +81,7 @@ def query_delivery_date_difference(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.DELIVERY_DATE_DIFFERENCE.value
-    query = read_query(QueryEnum.DELIVERY_DATE_DIFFERENCE.value)
+    query = read_query(QueryEnum.DELIVERY_DATE_DIFFERENCE.value, database.dialect.name)
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -67,7 +97,9 @@ def query_global_amount_order_status(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value
-    query = read_query(QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value)
+    query = read_query(
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value, database.dialect.name
+    )
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -83,7 +115,7 @@ def query_revenue_by_month_year(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.REVENUE_BY_MONTH_YEAR.value
-    query = read_query(QueryEnum.REVENUE_BY_MONTH_YEAR.value)
+    query = read_query(QueryEnum.REVENUE_BY_MONTH_YEAR.value, database.dialect.name)
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -99,7 +131,7 @@ def query_revenue_per_state(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.REVENUE_PER_STATE.value
-    query = read_query(QueryEnum.REVENUE_PER_STATE.value)
+    query = read_query(QueryEnum.REVENUE_PER_STATE.value, database.dialect.name)
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -115,7 +147,9 @@ def query_top_10_least_revenue_categories(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value
-    query = read_query(QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value)
+    query = read_query(
+        QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value, database.dialect.name
+    )
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -131,7 +165,7 @@ def query_top_10_revenue_categories(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.TOP_10_REVENUE_CATEGORIES.value
-    query = read_query(QueryEnum.TOP_10_REVENUE_CATEGORIES.value)
+    query = read_query(QueryEnum.TOP_10_REVENUE_CATEGORIES.value, database.dialect.name)
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
@@ -147,11 +181,66 @@ def query_real_vs_estimated_delivered_time(database: Engine) -> QueryResult:
         QueryResult: The query and the result
     """
     query_name = QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value
-    query = read_query(QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value)
+    query = read_query(
+        QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value, database.dialect.name
+    )
 
     return QueryResult(query=query_name, result=read_sql(query, database))
 
 
+def get_freight_value_weight_relationship(
+    orders: DataFrame, items: DataFrame, products: DataFrame
+) -> DataFrame:
+    """
+    Get the total freight value and product weight of each delivered order
+
+    Args:
+        orders (DataFrame): The olist_orders table
+        items (DataFrame): The olist_order_items table
+        products (DataFrame): The olist_products table
+
+    Returns:
+        DataFrame: One row per order_id with the freight_value and product_weight_g sums,
+            the freight value in reais
+    """
+    # Merge data
+    items_products = merge(items, products, on="product_id")
+    data = merge(items_products, orders, on="order_id")
+
+    # Filter delivered orders
+    delivered = data[data["order_status"] == "delivered"]
+
+    # Get the sum of freight_value and product_weight_g for each order_id
+    result = delivered.groupby("order_id", as_index=False)[
+        ["freight_value", "product_weight_g"]
+    ].sum()
+    result["freight_value"] = from_cents(result["freight_value"])
+    return result
+
+
+def decode_order_ids(result: DataFrame, dictionary: DataFrame) -> DataFrame:
+    """
+    Replace the order_id codes of a result by the hex ids. The rows are sorted by
+    order_id again, like the result of tables loaded without encoding
+
+    Args:
+        result (DataFrame): A result with an order_id column
+        dictionary (DataFrame): The id_dictionary table, or its order_id rows
+
+    Returns:
+        DataFrame: The result with the hex order ids
+    """
+    order_ids = decode_ids(result["order_id"], "order_id", dictionary)
+    return result.assign(order_id=order_ids).sort_values("order_id", ignore_index=True)
+
+
+def _read_decoded_order_ids(result: DataFrame, database: Engine) -> DataFrame:
+    # Only databases loaded with encode_ids have integer order ids and a dictionary
+    if result["order_id"].dtype == object:
+        return result
+    return decode_order_ids(result, read_id_dictionary(database, "order_id"))
+
+
 def query_freight_value_weight_relationship(database: Engine) -> QueryResult:
     """
     Get the query for the freight value weight relationship
@@ -170,43 +259,198 @@ def query_freight_value_weight_relationship(database: Engine) -> QueryResult:
     items = read_sql("SELECT * FROM olist_order_items", database)
     products = read_sql("SELECT * FROM olist_products", database)
 
-    # Merge data
-    items_products = merge(items, products, on="product_id")
-    data = merge(items_products, orders, on="order_id")
+    aggregations = get_freight_value_weight_relationship(orders, items, products)
 
-    # Filter delivered orders
-    delivered = data[data["order_status"] == "delivered"]
+    return QueryResult(
+        query=query_name, result=_read_decoded_order_ids(aggregations, database)
+    )
 
-    # Get the sum of freight_value and product_weight_g for each order_id
-    aggregations = delivered.groupby("order_id", as_index=False)[
-        ["freight_value", "product_weight_g"]
-    ].sum()
 
-    return QueryResult(query=query_name, result=aggregations)
+def query_freight_value_weight_relationship_sql(database: Engine) -> QueryResult:
+    """
+    Get the query for the freight value weight relationship, aggregated by the database
 
+    Args:
+        database (Engine): The database to get the data from
 
-def query_orders_per_day_and_holidays_2017(database: Engine) -> QueryResult:
-    query_name = QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value
+    Returns:
+        QueryResult: The query and the result, the same as query_freight_value_weight_relationship
+    """
+    query_name = QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value
+    query = read_query(query_name, database.dialect.name)
+    result = read_sql(query, database)
+
+    return QueryResult(
+        query=query_name, result=_read_decoded_order_ids(result, database)
+    )
+
+
+def read_geolocation_centroids(database: Engine) -> DataFrame:
+    """
+    Read the centroid of each zip code prefix, from the compacted geolocation table
+    when it was stored, otherwise averaged from the raw one
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        DataFrame: The geolocation_zip_code_prefix, geolocation_lat and geolocation_lng of each prefix
+    """
+    if COMPACTED_GEOLOCATION_TABLE in inspect(database).get_table_names():
+        query = (
+            "SELECT geolocation_zip_code_prefix, geolocation_lat, geolocation_lng "
+            f"FROM {COMPACTED_GEOLOCATION_TABLE}"
+        )
+    else:
+        query = (
+            "SELECT geolocation_zip_code_prefix, AVG(geolocation_lat) AS geolocation_lat, "
+            f"AVG(geolocation_lng) AS geolocation_lng FROM {GEOLOCATION_TABLE} "
+            "GROUP BY geolocation_zip_code_prefix"
+        )
+
+    return read_sql(query, database)
+
+
+def query_freight_value_distance_relationship(database: Engine) -> QueryResult:
+    """
+    Get the query for the freight value distance relationship
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value
 
     # Get data from database
-    holidays = read_sql("SELECT * FROM public_holidays", database)
-    orders = read_sql("SELECT * FROM olist_orders", database)
+    orders = read_sql(
+        "SELECT order_id, customer_id, order_status FROM olist_orders", database
+    )
+    items = read_sql(
+        "SELECT order_id, seller_id, freight_value FROM olist_order_items", database
+    )
+    customers = read_sql(
+        "SELECT customer_id, customer_zip_code_prefix FROM olist_customers", database
+    )
+    sellers = read_sql(
+        "SELECT seller_id, seller_zip_code_prefix FROM olist_sellers", database
+    )
+    geolocation = read_geolocation_centroids(database)
+
+    result = get_freight_value_distance_relationship(
+        orders, items, customers, sellers, geolocation
+    )
+
+    return QueryResult(query=query_name, result=result)
+
+
+def query_customer_rfm_segments(database: Engine) -> QueryResult:
+    """
+    Get the query for the RFM segments of the customers
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = QueryEnum.CUSTOMER_RFM_SEGMENTS.value
+    query = read_query(QueryEnum.CUSTOMER_RFM_SEGMENTS.value, database.dialect.name)
+    # The database scores the customers, only the customers per score are read
+    result = summarize_rfm_scores(read_sql(query, database))
+
+    return QueryResult(query=query_name, result=result)
+
+
+def query_customer_cohort_retention(database: Engine) -> QueryResult:
+    """
+    Get the query for the monthly retention of the customer cohorts
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = QueryEnum.CUSTOMER_COHORT_RETENTION.value
+    query = read_query(QueryEnum.CUSTOMER_COHORT_RETENTION.value, database.dialect.name)
+    result = summarize_cohorts(read_sql(query, database))
+
+    return QueryResult(query=query_name, result=result)
+
+
+def read_order_volume(database: Engine) -> OrderVolume:
+    """
+    Read the orders per day, counted by the database
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        OrderVolume: The orders per day, to compare the windows around the holidays
+    """
+    query = read_query(QueryEnum.HOLIDAY_IMPACT.value, database.dialect.name)
+    # Only about a thousand days are read, whatever the number of orders
+    return OrderVolume.from_daily_counts(read_sql(query, database))
+
+
+def read_public_holidays(database: Engine) -> DataFrame:
+    """
+    Read the date and name of the public holidays
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        DataFrame: The date and name columns of the public_holidays table
+    """
+    return read_sql("SELECT date, name FROM public_holidays", database)
+
+
+def query_holiday_impact(database: Engine) -> QueryResult:
+    """
+    Get the query for the orders around each holiday compared with the days around them
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        QueryResult: The query and the result, see OrderVolume.holiday_impact
+    """
+    query_name = QueryEnum.HOLIDAY_IMPACT.value
+    result = read_order_volume(database).holiday_impact(read_public_holidays(database))
 
+    return QueryResult(query=query_name, result=result)
+
+
+def get_orders_per_day_and_holidays_2017(
+    orders: DataFrame, holidays: DataFrame
+) -> DataFrame:
+    """
+    Get the number of orders of each day of 2017 and whether the day is a holiday.
+    The tables passed in are not modified
+
+    Args:
+        orders (DataFrame): The olist_orders table
+        holidays (DataFrame): The public_holidays table
+
+    Returns:
+        DataFrame: The order_count, the date in milliseconds and the holiday flag of each day
+    """
     # Convert the date column to datetime
-    orders["order_purchase_timestamp"] = to_datetime(orders["order_purchase_timestamp"])
+    purchase_timestamp = to_datetime(orders["order_purchase_timestamp"])
 
     # Filter orders for 2017
-    filtered_dates = orders[orders["order_purchase_timestamp"].dt.year == 2017]
+    purchase_dates = purchase_timestamp[purchase_timestamp.dt.year == 2017].dt.date
 
     # Count orders per day
     order_purchase_amount_per_date = (
-        filtered_dates.groupby(filtered_dates["order_purchase_timestamp"].dt.date)
-        .size()
-        .reset_index(name="order_count")
+        purchase_dates.groupby(purchase_dates).size().reset_index(name="order_count")
     )
 
     # Convert date column to datetime for comparison
-    holidays["date"] = to_datetime(holidays["date"]).dt.date
+    holiday_dates = to_datetime(holidays["date"]).dt.date
 
     # Add milliseconds timestamp
     order_purchase_amount_per_date["date"] = to_datetime(
@@ -219,14 +463,97 @@ def query_orders_per_day_and_holidays_2017(database: Engine) -> QueryResult:
     # Check if each date is a holiday
     order_purchase_amount_per_date["holiday"] = order_purchase_amount_per_date[
         "order_purchase_timestamp"
-    ].isin(holidays["date"])
+    ].isin(holiday_dates)
 
     # Create a dataframe with the result
-    result_df = order_purchase_amount_per_date[["order_count", "date", "holiday"]]
+    return order_purchase_amount_per_date[["order_count", "date", "holiday"]]
+
+
+def query_orders_per_day_and_holidays_2017(database: Engine) -> QueryResult:
+    query_name = QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value
+
+    # Get data from database
+    holidays = read_sql("SELECT * FROM public_holidays", database)
+    orders = read_sql("SELECT * FROM olist_orders", database)
+
+    result_df = get_orders_per_day_and_holidays_2017(orders, holidays)
+
+    return QueryResult(query=query_name, result=result_df)
+
+
+def query_orders_per_day_and_holidays_2017_sql(database: Engine) -> QueryResult:
+    """
+    Get the query for the orders per day and holidays of 2017, aggregated by the database
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        QueryResult: The query and the result, the same as query_orders_per_day_and_holidays_2017
+    """
+    query_name = QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value
+    query = read_query(query_name, database.dialect.name)
+    result_df = read_sql(query, database)
+
+    # SQLite has no boolean type and returns the holiday flag as 0 or 1
+    result_df["holiday"] = result_df["holiday"].astype(bool)
 
     return QueryResult(query=query_name, result=result_df)
 
 
+def get_query_mapping() -> dict[str, Callable[[Engine], QueryResult]]:
+    """
+    Get the mapping between the query names and the query functions
+
+    Returns:
+        dict[str, Callable[[Engine], QueryResult]]: The dictionary with keys as the QueryEnum values and values as the queries
+    """
+    return {
+        QueryEnum.DELIVERY_DATE_DIFFERENCE.value: query_delivery_date_difference,
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value: query_global_amount_order_status,
+        QueryEnum.REVENUE_BY_MONTH_YEAR.value: query_revenue_by_month_year,
+        QueryEnum.REVENUE_PER_STATE.value: query_revenue_per_state,
+        QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value: query_top_10_least_revenue_categories,
+        QueryEnum.TOP_10_REVENUE_CATEGORIES.value: query_top_10_revenue_categories,
+        QueryEnum.REAL_VS_ESTIMATED_DELIVERED_TIME.value: query_real_vs_estimated_delivered_time,
+        QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value: query_orders_per_day_and_holidays_2017,
+        QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value: query_freight_value_weight_relationship,
+        QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value: query_freight_value_distance_relationship,
+        QueryEnum.CUSTOMER_RFM_SEGMENTS.value: query_customer_rfm_segments,
+        QueryEnum.CUSTOMER_COHORT_RETENTION.value: query_customer_cohort_retention,
+        QueryEnum.HOLIDAY_IMPACT.value: query_holiday_impact,
+    }
+
+
+def get_query_implementations() -> dict[
+    str, dict[str, Callable[[Engine], QueryResult]]
+]:
+    """
+    Get every implementation of each query. The implementations of a query return
+    the same result, only their speed differs, so the planner can pick any of them
+
+    Returns:
+        dict[str, dict[str, Callable[[Engine], QueryResult]]]: The implementations keyed by the QueryEnum value, then by
+            implementation name. The first implementation of each query is the one of get_query_mapping
+    """
+    implementations = {
+        query_name: {"sql": query} for query_name, query in get_query_mapping().items()
+    }
+    implementations[QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value] = {
+        "pandas": query_orders_per_day_and_holidays_2017,
+        "sql": query_orders_per_day_and_holidays_2017_sql,
+    }
+    implementations[QueryEnum.GET_FREIGHT_VALUE_WEIGHT_RELATIONSHIP.value] = {
+        "pandas": query_freight_value_weight_relationship,
+        "sql": query_freight_value_weight_relationship_sql,
+    }
+    implementations[QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value] = {
+        "pandas": query_freight_value_distance_relationship,
+    }
+
+    return implementations
+
+
 def get_all_queries() -> list[Callable[[Engine], QueryResult]]:
     """
     Get all the queries
@@ -234,34 +561,261 @@ def get_all_queries() -> list[Callable[[Engine], QueryResult]]:
     Returns:
         list[Callable[[Engine], QueryResult]]: The queries
     """
-    return [
-        query_delivery_date_difference,
-        query_global_amount_order_status,
-        query_revenue_by_month_year,
-        query_revenue_per_state,
-        query_top_10_least_revenue_categories,
-        query_top_10_revenue_categories,
-        query_real_vs_estimated_delivered_time,
-        query_orders_per_day_and_holidays_2017,
-        query_freight_value_weight_relationship,
-    ]
+    return list(get_query_mapping().values())
 
 
-def run_queries(database: Engine) -> dict[str, DataFrame]:
+def run_queries(
+    database: Engine,
+    on_result: Callable[[QueryResult], None] | None = None,
+    queries: list[str] | None = None,
+    plan: dict[str, str] | None = None,
+) -> dict[str, DataFrame]:
     """
     Transform data based on queries. For each query, the query is executed and the results is stored in the dataframe
 
     Args:
         database (Engine): The database to get the data from
+        on_result (Callable[[QueryResult], None], optional): Called with each query result as soon as it is ready
+        queries (list[str], optional): The names of the queries to run. Defaults to all the queries
+        plan (dict[str, str], optional): The implementation to run for each query, as chosen by
+            src.planner.get_query_plan. Defaults to the implementations of get_query_mapping
 
     Returns:
         dict[str, DataFrame]: A dictionary with keys as the query filenames and values the result of the query as a dataframe
     """
 
     query_results = {}
-
-    for query in get_all_queries():
+    query_mapping = get_query_mapping()
+    implementations = get_query_implementations()
+    plan = plan or {}
+
+    for query_name in queries if queries is not None else query_mapping:
+        query = implementations[query_name].get(
+            plan.get(query_name), query_mapping[query_name]
+        )
         query_result = query(database)
         query_results[query_result.query] = query_result.result
+        if on_result is not None:
+            on_result(query_result)
+
+    return query_results
+
+
+def read_filtered_query(query_name: str, dialect: str = "sqlite") -> TextClause:
+    """
+    Reads a filtered query from the file, with the list parameters expanded at execution
+
+    Args:
+        query_name (str): The name of the query
+        dialect (str, optional): The SQL dialect to translate the query to. Defaults to "sqlite"
+
+    Returns:
+        TextClause: The query
+    """
+    # Typed, so empty lists still compare with the text columns
+    return read_query(query_name, dialect).bindparams(
+        bindparam("states", expanding=True, type_=String),
+        bindparam("categories", expanding=True, type_=String),
+    )
+
+
+def get_filter_params(filters: QueryFilters) -> dict:
+    """
+    Get the bound parameters of the filtered queries. An empty list of states or
+    categories means no filter
+
+    Args:
+        filters (QueryFilters): The filters
+
+    Returns:
+        dict: The parameters
+    """
+    return {
+        "start_year": int(filters.start_year),
+        "end_year": int(filters.end_year),
+        "all_states": not filters.states,
+        "states": list(filters.states),
+        "all_categories": not filters.categories,
+        "categories": list(filters.categories),
+    }
+
+
+def _has_filtered_aggregates(database: Engine) -> bool:
+    tables = set(inspect(database).get_table_names())
+    return all(table_name in tables for table_name in FILTERED_AGGREGATE_TABLES)
+
+
+def _get_filtered_query_file(query_name: str, database: Engine) -> str:
+    # Without the aggregates, like in a database loaded before they existed, the same
+    # query reads the loaded tables, slower but with the same result
+    if _has_filtered_aggregates(database):
+        return query_name
+    return f"{query_name}_from_tables"
+
+
+def get_filter_options(database: Engine) -> FilterOptions:
+    """
+    Get the values the dashboard filters can take. They are read from the filtered
+    aggregates, which hold a few rows per month and state, or from the loaded tables
+    if the aggregates are not built
+
+    Args:
+        database (Engine): The database to get the data from
+
+    Returns:
+        FilterOptions: The delivery years, the customer states and the english category names
+    """
+    if _has_filtered_aggregates(database):
+        # Only the values of delivered orders, the ones a filter can select
+        years = read_sql(
+            "SELECT DISTINCT year FROM aggregate_filtered_revenue ORDER BY year",
+            database,
+        )
+        states = read_sql(
+            """
+            SELECT DISTINCT customer_state
+            FROM aggregate_filtered_revenue
+            ORDER BY customer_state
+            """,
+            database,
+        )
+        categories = read_sql(
+            """
+            SELECT DISTINCT Category AS product_category_name_english
+            FROM aggregate_filtered_category_revenue
+            ORDER BY product_category_name_english
+            """,
+            database,
+        )
+    else:
+        years = read_sql(
+            translate_sql(
+                """
+                SELECT DISTINCT CAST(STRFTIME('%Y', order_delivered_customer_date) AS INTEGER) AS year
+                FROM olist_orders
+                WHERE order_delivered_customer_date IS NOT NULL
+                ORDER BY year
+                """,
+                database.dialect.name,
+            ),
+            database,
+        )
+        states = read_sql(
+            "SELECT DISTINCT customer_state FROM olist_customers ORDER BY customer_state",
+            database,
+        )
+        categories = read_sql(
+            """
+            SELECT DISTINCT product_category_name_english
+            FROM product_category_name_translation
+            ORDER BY product_category_name_english
+            """,
+            database,
+        )
+
+    return FilterOptions(
+        years=years["year"].tolist(),
+        states=states["customer_state"].tolist(),
+        categories=categories["product_category_name_english"].tolist(),
+    )
+
+
+def query_filtered_revenue_by_month(
+    database: Engine, filters: QueryFilters
+) -> QueryResult:
+    """
+    Get the query for the revenue per month of the filtered orders
+
+    Args:
+        database (Engine): The database to get the data from
+        filters (QueryFilters): The filters pushed down into the query
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = FilteredQueryEnum.FILTERED_REVENUE_BY_MONTH.value
+    query = read_filtered_query(
+        _get_filtered_query_file(query_name, database), database.dialect.name
+    )
+
+    return QueryResult(
+        query=query_name,
+        result=read_sql(query, database, params=get_filter_params(filters)),
+    )
+
+
+def query_filtered_revenue_per_state(
+    database: Engine, filters: QueryFilters
+) -> QueryResult:
+    """
+    Get the query for the revenue per state of the filtered orders
+
+    Args:
+        database (Engine): The database to get the data from
+        filters (QueryFilters): The filters pushed down into the query
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = FilteredQueryEnum.FILTERED_REVENUE_PER_STATE.value
+    query = read_filtered_query(
+        _get_filtered_query_file(query_name, database), database.dialect.name
+    )
+
+    return QueryResult(
+        query=query_name,
+        result=read_sql(query, database, params=get_filter_params(filters)),
+    )
+
+
+def query_filtered_revenue_per_category(
+    database: Engine, filters: QueryFilters
+) -> QueryResult:
+    """
+    Get the query for the revenue per category of the filtered orders
+
+    Args:
+        database (Engine): The database to get the data from
+        filters (QueryFilters): The filters pushed down into the query
+
+    Returns:
+        QueryResult: The query and the result
+    """
+    query_name = FilteredQueryEnum.FILTERED_REVENUE_PER_CATEGORY.value
+    query = read_filtered_query(
+        _get_filtered_query_file(query_name, database), database.dialect.name
+    )
+
+    return QueryResult(
+        query=query_name,
+        result=read_sql(query, database, params=get_filter_params(filters)),
+    )
+
+
+def run_filtered_queries(
+    database: Engine, filters: QueryFilters
+) -> dict[str, DataFrame]:
+    """
+    Run every filtered query with the given filters. The queries read the
+    aggregate_filtered_revenue and aggregate_filtered_category_revenue tables of
+    src/incremental.py, which the pipeline and the snapshot build with the tables.
+    Without them, the queries read the loaded tables instead
+
+    Args:
+        database (Engine): The database to get the data from
+        filters (QueryFilters): The filters pushed down into the queries
+
+    Returns:
+        dict[str, DataFrame]: A dictionary with keys as the query filenames and values the result of the query as a dataframe
+    """
+    query_results = {}
+
+    for query in [
+        query_filtered_revenue_by_month,
+        query_filtered_revenue_per_state,
+        query_filtered_revenue_per_category,
+    ]:
+        query_result = query(database, filters)
+        query_results[query_result.query] = query_result.result
 
     return query_results
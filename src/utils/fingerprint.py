@@ -0,0 +1,46 @@
+import hashlib
+import os
+from functools import lru_cache
+
+CHUNK_SIZE = 1 << 20  # Read the files in 1 MiB blocks
+
+
+def get_database_fingerprint(database_path: str) -> str:
+    """
+    Get a fingerprint that identifies the content of the database file.
+    The file is only hashed again when its size or modification time changes
+
+    Args:
+        database_path (str): The path to the database file
+
+    Returns:
+        str: The sha256 hex digest of the database file
+    """
+    return get_file_fingerprint(database_path)
+
+
+def get_file_fingerprint(path: str) -> str:
+    """
+    Get a fingerprint that identifies the content of a file, like the csv files the
+    pipeline extracts. The file is only hashed again when its size or modification time changes
+
+    Args:
+        path (str): The path to the file
+
+    Returns:
+        str: The sha256 hex digest of the file
+    """
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=32)
+def _hash_file(path: str, size: int, mtime_ns: int) -> str:
+    # size and mtime_ns are only part of the memoization key
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
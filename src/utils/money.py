@@ -0,0 +1,29 @@
+from pandas import Series
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(amounts: Series) -> Series:
+    """
+    Convert amounts in reais to integer cents
+
+    Args:
+        amounts (Series): The amounts, with at most two decimals
+
+    Returns:
+        Series: The amounts in cents, as int64
+    """
+    return (amounts * CENTS_PER_UNIT).round().astype("int64")
+
+
+def from_cents(cents: Series) -> Series:
+    """
+    Convert integer cents back to amounts in reais, once they are summed
+
+    Args:
+        cents (Series): The amounts in cents
+
+    Returns:
+        Series: The amounts in reais, as floats
+    """
+    return cents / CENTS_PER_UNIT
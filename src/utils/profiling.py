@@ -0,0 +1,223 @@
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+from pandas import DataFrame
+
+from src.config import ROOT_PATH
+
+PROC_STATUS_PATH = "/proc/self/status"
+PROC_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+TOP_ALLOCATIONS = 3  # Allocation sites kept per stage when tracing
+TRACEBACK_FRAMES = 32  # Deep enough to reach the project code from inside pandas
+PROJECT_ROOT_PATH = str(ROOT_PATH)
+
+
+class StageStats:
+    """Wall time, peak resident memory and processed rows of a pipeline stage"""
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.rows = 0
+        # Only filled in when the allocations are traced
+        self.traced_peak_mb: float | None = None
+        self.top_allocations: list[tuple[str, float]] = []
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def reset_peak_rss() -> None:
+    """
+    Reset the peak resident set size of the process, so the next reading only covers
+    what runs afterwards. Only supported on Linux, elsewhere the peak is process wide
+    """
+    try:
+        with open(PROC_CLEAR_REFS_PATH, "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the process
+
+    Returns:
+        float: The peak resident set size in MiB
+    """
+    try:
+        with open(PROC_STATUS_PATH, "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def measure_stage(stage: str, trace_allocations: bool = False) -> Iterator[StageStats]:
+    """
+    Measure the wall time and the peak resident memory of the wrapped block. The
+    block sets the rows attribute of the yielded stats itself
+
+    Args:
+        stage (str): The name of the stage
+        trace_allocations (bool, optional): Also record the peak of the Python allocations
+            and the lines that allocated the most with tracemalloc. It slows the block
+            down noticeably. Defaults to False
+
+    Yields:
+        StageStats: The stats, filled in when the block exits
+    """
+    stats = StageStats(stage)
+    if trace_allocations:
+        tracemalloc.start(TRACEBACK_FRAMES)
+    reset_peak_rss()
+    start = time.perf_counter()
+
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        stats.peak_rss_mb = get_peak_rss_mb()
+        if trace_allocations:
+            stats.traced_peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            stats.top_allocations = get_top_allocations(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+
+
+def get_top_allocations(
+    snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS
+) -> list[tuple[str, float]]:
+    """
+    Get the lines of the project holding the most memory in a tracemalloc snapshot.
+    Allocations made inside libraries are charged to the project line that called them
+
+    Args:
+        snapshot (tracemalloc.Snapshot): The snapshot
+        limit (int, optional): The number of lines. Defaults to TOP_ALLOCATIONS
+
+    Returns:
+        list[tuple[str, float]]: The file and line number with the MiB allocated there
+    """
+    sizes: dict[str, int] = {}
+
+    for statistic in snapshot.statistics("traceback"):
+        # Frames are ordered from the oldest call, walk back from the allocation
+        for frame in reversed(statistic.traceback):
+            if frame.filename.startswith(PROJECT_ROOT_PATH):
+                location = f"{os.path.relpath(frame.filename, PROJECT_ROOT_PATH)}:{frame.lineno}"
+                break
+        else:
+            location = (
+                f"{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}"
+            )
+        sizes[location] = sizes.get(location, 0) + statistic.size
+
+    top = sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [(location, size / (1024 * 1024)) for location, size in top]
+
+
+def get_dataframes_memory_mb(dataframes: dict[str, DataFrame]) -> dict[str, float]:
+    """
+    Get the memory held by each DataFrame, including the Python objects of the
+    object columns
+
+    Args:
+        dataframes (dict[str, DataFrame]): The dataframes, keyed by table name
+
+    Returns:
+        dict[str, float]: The MiB of each table, largest first
+    """
+    memory = {
+        table_name: dataframe.memory_usage(deep=True).sum() / (1024 * 1024)
+        for table_name, dataframe in dataframes.items()
+    }
+    return dict(sorted(memory.items(), key=lambda item: item[1], reverse=True))
+
+
+def format_stage_report(stats: list[StageStats]) -> str:
+    """
+    Format the stats of the stages as a table
+
+    Args:
+        stats (list[StageStats]): The stats of each stage
+
+    Returns:
+        str: The table, one line per stage
+    """
+    width = max([12] + [len(stage_stats.stage) + 2 for stage_stats in stats])
+    header = f"{'stage':<{width}}{'wall time (s)':>15}{'peak RSS (MiB)':>16}{'rows':>14}{'rows/s':>14}"
+    lines = [header, "-" * len(header)]
+
+    for stage_stats in stats:
+        lines.append(
+            f"{stage_stats.stage:<{width}}"
+            f"{stage_stats.seconds:>15.2f}"
+            f"{stage_stats.peak_rss_mb:>16.1f}"
+            f"{stage_stats.rows:>14,}"
+            f"{stage_stats.rows_per_second:>14,.0f}"
+        )
+
+    return "\n".join(lines)
+
+
+def format_memory_report(
+    stats: list[StageStats], tables_memory_mb: dict[str, float] | None = None
+) -> str:
+    """
+    Format where the memory goes: the DataFrame of each table, then each stage ranked
+    by peak resident memory with its traced peak and its largest allocation sites
+
+    Args:
+        stats (list[StageStats]): The stats of each stage
+        tables_memory_mb (dict[str, float], optional): The memory of each table, as
+            returned by get_dataframes_memory_mb
+
+    Returns:
+        str: The report
+    """
+    lines = []
+
+    if tables_memory_mb:
+        total = sum(tables_memory_mb.values())
+        width = max(len(table_name) for table_name in tables_memory_mb) + 2
+        header = f"{'table':<{width}}{'memory (MiB)':>14}{'share':>8}"
+        lines += [header, "-" * len(header)]
+        for table_name, memory_mb in tables_memory_mb.items():
+            share = memory_mb / total if total > 0 else 0.0
+            lines.append(f"{table_name:<{width}}{memory_mb:>14.1f}{share:>8.0%}")
+        lines += [f"{'total':<{width}}{total:>14.1f}", ""]
+
+    width = max([12] + [len(stage_stats.stage) + 2 for stage_stats in stats])
+    header = f"{'stage':<{width}}{'peak RSS (MiB)':>16}{'traced peak (MiB)':>19}  top allocations"
+    lines += [header, "-" * len(header)]
+
+    for stage_stats in sorted(stats, key=lambda item: item.peak_rss_mb, reverse=True):
+        traced = (
+            "-"
+            if stage_stats.traced_peak_mb is None
+            else f"{stage_stats.traced_peak_mb:.1f}"
+        )
+        allocations = ", ".join(
+            f"{location} ({memory_mb:.1f} MiB)"
+            for location, memory_mb in stage_stats.top_allocations
+        )
+        lines.append(
+            f"{stage_stats.stage:<{width}}{stage_stats.peak_rss_mb:>16.1f}{traced:>19}  {allocations}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,108 @@
+import re
+
+# Functions of the SQLite queries that DuckDB does not have or that behave differently
+FUNCTION_PATTERN = re.compile(r"\b(STRFTIME|JULIANDAY|DATE|CAST)\s*\(", re.IGNORECASE)
+COMMENT_PATTERN = re.compile(r"--[^\n]*")
+CAST_PATTERN = re.compile(r"(.*)\s+AS\s+(\w+)\s*$", re.IGNORECASE | re.DOTALL)
+
+
+def translate_sql(sql: str, dialect: str) -> str:
+    """
+    Translate a query written for SQLite to the SQL dialect of the database
+
+    Args:
+        sql (str): The SQLite query
+        dialect (str): The SQLAlchemy dialect name of the database, e.g. 'sqlite' or 'duckdb'
+
+    Returns:
+        str: The query for that dialect
+    """
+    if dialect != "duckdb":
+        return sql
+
+    # Comments mention function names too, drop them before rewriting
+    return _translate_duckdb(COMMENT_PATTERN.sub("", sql))
+
+
+def _translate_duckdb(sql: str) -> str:
+    parts = []
+    position = 0
+
+    for match in FUNCTION_PATTERN.finditer(sql):
+        if match.start() < position:
+            # Nested in a call that was already rewritten
+            continue
+
+        end = _find_closing_parenthesis(sql, match.end())
+        arguments = [
+            _translate_duckdb(argument)
+            for argument in _split_arguments(sql[match.end() : end])
+        ]
+        parts.append(sql[position : match.start()])
+        parts.append(_rewrite_call(match.group(1).upper(), arguments))
+        position = end + 1
+
+    parts.append(sql[position:])
+    return "".join(parts)
+
+
+def _rewrite_call(function: str, arguments: list[str]) -> str:
+    if function == "STRFTIME":
+        # SQLite takes the format first and parses text dates on the fly
+        date_format, value = arguments[0].strip(), arguments[1].strip()
+        if date_format == "'%s'":
+            return f"CAST(epoch(CAST({value} AS TIMESTAMP)) AS BIGINT)"
+        return f"strftime(CAST({value} AS TIMESTAMP), {date_format})"
+
+    if function == "JULIANDAY":
+        return (
+            f"(epoch(CAST({arguments[0].strip()} AS TIMESTAMP)) / 86400.0 + 2440587.5)"
+        )
+
+    if function == "DATE":
+        return f"CAST(CAST({arguments[0].strip()} AS TIMESTAMP) AS DATE)"
+
+    # CAST: SQLite truncates reals cast to integer, DuckDB rounds them
+    cast = CAST_PATTERN.match(arguments[0])
+    if cast is not None and cast.group(2).upper() == "INTEGER":
+        return f"CAST(TRUNC(CAST({cast.group(1).strip()} AS DOUBLE)) AS BIGINT)"
+    return f"CAST({arguments[0].strip()})"
+
+
+def _find_closing_parenthesis(sql: str, start: int) -> int:
+    depth, quoted = 1, False
+
+    for index in range(start, len(sql)):
+        character = sql[index]
+        if character == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+
+    raise ValueError(f"Unbalanced parenthesis in: {sql[start:]}")
+
+
+def _split_arguments(arguments: str) -> list[str]:
+    parts, depth, quoted, start = [], 0, False, 0
+
+    for index, character in enumerate(arguments):
+        if character == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif character == "," and depth == 0:
+            parts.append(arguments[start:index])
+            start = index + 1
+
+    parts.append(arguments[start:])
+    return parts
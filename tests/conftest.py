@@ -0,0 +1,53 @@
+from pandas import DataFrame
+from pytest import fixture
+
+from benchmarks.holidays_stub import serve_public_holidays
+from src.config import get_csv_to_table_mapping
+from src.extract import extract
+from src.synthetic import generate_dataset
+
+
+@fixture(scope="session")
+def synthetic_csv_folder(tmp_path_factory) -> str:
+    """Generate the synthetic dataset once for the whole test session.
+
+    The csv files are shared between the tests, copy the folder before changing them.
+    """
+    csv_folder = str(tmp_path_factory.mktemp("synthetic") / "dataset")
+    generate_dataset(csv_folder, scale_factor=0.01)
+    return csv_folder
+
+
+@fixture(scope="session")
+def public_holidays_url():
+    """Serve the public holidays stub for the whole test session."""
+    with serve_public_holidays() as url:
+        yield url
+
+
+@fixture(scope="session")
+def extracted_dataframes(synthetic_csv_folder) -> dict[str, DataFrame]:
+    return extract(synthetic_csv_folder, get_csv_to_table_mapping(), None)
+
+
+@fixture(scope="session")
+def extracted_dataframes_with_holidays(
+    synthetic_csv_folder, public_holidays_url
+) -> dict[str, DataFrame]:
+    return extract(
+        synthetic_csv_folder, get_csv_to_table_mapping(), public_holidays_url
+    )
+
+
+@fixture
+def synthetic_dataframes(extracted_dataframes) -> dict[str, DataFrame]:
+    """The extracted synthetic tables, copied so that a test can change them."""
+    return {name: df.copy() for name, df in extracted_dataframes.items()}
+
+
+@fixture
+def synthetic_dataframes_with_holidays(
+    extracted_dataframes_with_holidays,
+) -> dict[str, DataFrame]:
+    """The extracted synthetic tables and the public holidays, copied like above."""
+    return {name: df.copy() for name, df in extracted_dataframes_with_holidays.items()}
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from pytest import raises
+
+from src.cache import ResultCache
+
+
+def test_get_or_compute_caches_value():
+    """Test that a value is computed once and then served from the cache."""
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_compute("key", compute) == "value"
+    assert cache.get_or_compute("key", compute) == "value"
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
+    assert cache.get("missing", "default") == "default"
+
+
+def test_get_or_compute_single_flight():
+    """Test that concurrent callers share one computation."""
+    cache = ResultCache()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return len(calls)
+
+    def worker():
+        results.append(cache.get_or_compute("key", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [1] * 8
+
+
+def test_get_or_compute_does_not_cache_errors():
+    """Test that a failed computation is raised and retried on the next call."""
+    cache = ResultCache()
+
+    def fail():
+        raise ValueError("boom")
+
+    with raises(ValueError):
+        cache.get_or_compute("key", fail)
+
+    assert cache.get_or_compute("key", lambda: "value") == "value"
+
+
+def test_least_recently_used_entries_are_evicted():
+    """Test that the cache keeps at most max_entries values."""
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
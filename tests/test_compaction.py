@@ -0,0 +1,87 @@
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from pytest import raises
+
+from src.compaction import (
+    COMPACTED_GEOLOCATION_TABLE,
+    GEOLOCATION_TABLE,
+    compact_geolocation,
+)
+from src.extract import iter_extract
+
+
+def test_compact_geolocation_is_chunk_independent(synthetic_csv_folder):
+    """Test that the compacted table does not depend on the chunk size and matches a direct aggregation."""
+    csv_table_mapping = {"olist_geolocation_dataset.csv": GEOLOCATION_TABLE}
+
+    def compact(chunk_size):
+        chunks = iter_extract(
+            synthetic_csv_folder, csv_table_mapping, None, chunk_size=chunk_size
+        )
+        return dict(compact_geolocation(chunks, mode="compacted"))
+
+    compacted = compact(None)
+    assert list(compacted) == [COMPACTED_GEOLOCATION_TABLE]
+    assert_frame_equal(
+        compact(1_000)[COMPACTED_GEOLOCATION_TABLE],
+        compacted[COMPACTED_GEOLOCATION_TABLE],
+    )
+
+    (raw,) = [
+        chunk
+        for _, chunk in iter_extract(synthetic_csv_folder, csv_table_mapping, None)
+    ]
+    table = compacted[COMPACTED_GEOLOCATION_TABLE].set_index(
+        "geolocation_zip_code_prefix"
+    )
+    grouped = raw.groupby("geolocation_zip_code_prefix")
+    assert table["geolocation_rows"].sum() == len(raw)
+    assert_frame_equal(
+        table[["geolocation_lat", "geolocation_lng"]],
+        grouped[["geolocation_lat", "geolocation_lng"]].mean(),
+    )
+
+
+def test_compact_geolocation_modes():
+    """Test that the modes keep the raw table, the compacted one or both."""
+    geolocation = DataFrame(
+        {
+            "geolocation_zip_code_prefix": [1000, 1000, 1000, 2000],
+            "geolocation_lat": [-1.0, -3.0, -2.0, 5.0],
+            "geolocation_lng": [1.0, 3.0, 2.0, -5.0],
+            "geolocation_city": ["b", "a", "a", "c"],
+            "geolocation_state": ["SP", "SP", "SP", "RJ"],
+        }
+    )
+    sellers = DataFrame({"seller_id": ["x"]})
+    chunks = [
+        (GEOLOCATION_TABLE, geolocation.iloc[:2]),
+        (GEOLOCATION_TABLE, geolocation.iloc[2:]),
+        ("olist_sellers", sellers),
+    ]
+
+    assert [name for name, _ in compact_geolocation(chunks, "raw")] == [
+        GEOLOCATION_TABLE,
+        GEOLOCATION_TABLE,
+        "olist_sellers",
+    ]
+    assert [name for name, _ in compact_geolocation(chunks, "both")] == [
+        GEOLOCATION_TABLE,
+        GEOLOCATION_TABLE,
+        COMPACTED_GEOLOCATION_TABLE,
+        "olist_sellers",
+    ]
+
+    tables = dict(compact_geolocation(chunks, "compacted"))
+    assert list(tables) == [COMPACTED_GEOLOCATION_TABLE, "olist_sellers"]
+    assert tables[COMPACTED_GEOLOCATION_TABLE].to_dict("list") == {
+        "geolocation_zip_code_prefix": [1000, 2000],
+        "geolocation_lat": [-2.0, 5.0],
+        "geolocation_lng": [2.0, -5.0],
+        "geolocation_city": ["a", "c"],
+        "geolocation_state": ["SP", "RJ"],
+        "geolocation_rows": [3, 1],
+    }
+
+    with raises(ValueError):
+        list(compact_geolocation(chunks, "sampled"))
@@ -0,0 +1,140 @@
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from pytest import mark
+
+from src.customers import (
+    get_cohort_activity,
+    get_customer_orders,
+    get_customer_rfm,
+    get_rfm_scores,
+    summarize_cohorts,
+    summarize_rfm_scores,
+)
+from src.database import create_database_engine
+from src.inmemory import run_queries as run_in_memory_queries
+from src.load import load
+from src.transform import QueryEnum, run_queries
+
+CUSTOMER_QUERIES = [
+    QueryEnum.CUSTOMER_RFM_SEGMENTS.value,
+    QueryEnum.CUSTOMER_COHORT_RETENTION.value,
+]
+
+
+def make_customer_orders() -> DataFrame:
+    """Five customers: a, b and c buy again, d and e once. Payments are in cents."""
+    return DataFrame(
+        {
+            "customer_unique_id": ["a", "a", "a", "b", "b", "c", "c", "d", "e"],
+            "order_purchase_timestamp": [
+                "2017-01-05 10:00:00",
+                "2017-02-10 10:00:00",
+                "2017-04-01 10:00:00",
+                "2017-01-20 10:00:00",
+                "2017-01-25 10:00:00",
+                "2017-02-01 10:00:00",
+                "2017-03-15 10:00:00",
+                "2017-03-01 10:00:00",
+                "2017-04-10 10:00:00",
+            ],
+            "payment_value": [1000, 2000, 3000, 500, 500, 4000, 100, 20000, 700],
+        }
+    )
+
+
+def test_get_customer_orders():
+    """Test that only the delivered orders are kept, with their payments summed."""
+    orders = DataFrame(
+        {
+            "order_id": ["o1", "o2", "o3"],
+            "customer_id": ["c1", "c2", "c3"],
+            "order_status": ["delivered", "delivered", "canceled"],
+            "order_purchase_timestamp": ["2017-01-01", "2017-01-02", "2017-01-03"],
+            "order_delivered_customer_date": ["2017-01-05", "2017-01-06", None],
+        }
+    )
+    customers = DataFrame(
+        {"customer_id": ["c1", "c2", "c3"], "customer_unique_id": ["u1", "u1", "u2"]}
+    )
+    payments = DataFrame(
+        {"order_id": ["o1", "o1", "o2", "o3"], "payment_value": [100, 250, 75, 10]}
+    )
+
+    result = get_customer_orders(orders, customers, payments)
+    assert result.to_dict("list") == {
+        "customer_unique_id": ["u1", "u1"],
+        "order_purchase_timestamp": ["2017-01-01", "2017-01-02"],
+        "payment_value": [350, 75],
+    }
+
+
+def test_get_customer_rfm():
+    """Test the recency, frequency and monetary value of each customer and their scores."""
+    rfm = get_customer_rfm(make_customer_orders()).set_index("customer_unique_id")
+
+    assert rfm["recency"].to_dict() == {"a": 9, "b": 75, "c": 26, "d": 40, "e": 0}
+    assert rfm["frequency"].to_dict() == {"a": 3, "b": 2, "c": 2, "d": 1, "e": 1}
+    assert rfm["monetary"].to_dict() == {
+        "a": 60.0,
+        "b": 10.0,
+        "c": 41.0,
+        "d": 200.0,
+        "e": 7.0,
+    }
+    assert rfm["r_score"].to_dict() == {"a": 4, "b": 1, "c": 3, "d": 2, "e": 5}
+    assert rfm["f_score"].to_dict() == {"a": 3, "b": 2, "c": 2, "d": 1, "e": 1}
+    assert rfm["m_score"].to_dict() == {"a": 4, "b": 2, "c": 3, "d": 5, "e": 1}
+    assert rfm["segment"].to_dict() == {
+        "a": "Potential loyalist",
+        "b": "Hibernating",
+        "c": "About to sleep",
+        "d": "Hibernating",
+        "e": "New",
+    }
+
+
+def test_summarize_rfm_scores():
+    """Test that the segments are summarized in their order, without the empty ones."""
+    segments = summarize_rfm_scores(get_rfm_scores(make_customer_orders()))
+    expected = DataFrame(
+        {
+            "Segment": ["Potential loyalist", "New", "About to sleep", "Hibernating"],
+            "Customers": [1, 1, 1, 2],
+            "Recency": [9.0, 0.0, 26.0, 57.5],
+            "Frequency": [3.0, 1.0, 2.0, 1.5],
+            "Monetary": [60.0, 7.0, 41.0, 105.0],
+            "Revenue": [60.0, 7.0, 41.0, 210.0],
+        }
+    )
+    assert_frame_equal(segments, expected)
+
+
+def test_summarize_cohorts():
+    """Test that each customer counts once per month, in the cohort of its first order."""
+    retention = summarize_cohorts(get_cohort_activity(make_customer_orders()))
+    expected = DataFrame(
+        {
+            "Cohort": ["2017-01"] * 3 + ["2017-02"] * 2 + ["2017-03", "2017-04"],
+            "Months": [0, 1, 3, 0, 1, 0, 0],
+            "Customers": [2, 1, 1, 1, 1, 1, 1],
+            "Retention": [1.0, 0.5, 0.5, 1.0, 1.0, 1.0, 1.0],
+        }
+    )
+    assert_frame_equal(retention, expected, check_dtype=False)
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_customer_queries_match_in_memory(tmp_path, backend, synthetic_dataframes):
+    """Test that the customer queries give the same result on the database and in memory."""
+    dataframes = synthetic_dataframes
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(dataframes, database)
+    results = run_queries(database, queries=CUSTOMER_QUERIES)
+    expected = run_in_memory_queries(dataframes, queries=CUSTOMER_QUERIES)
+
+    for query_name in CUSTOMER_QUERIES:
+        assert_frame_equal(results[query_name], expected[query_name], obj=query_name)
+
+    segments = results[QueryEnum.CUSTOMER_RFM_SEGMENTS.value]
+    customers = dataframes["olist_customers"]["customer_unique_id"]
+    assert 0 < segments["Customers"].sum() <= customers.nunique()
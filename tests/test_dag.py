@@ -0,0 +1,191 @@
+import os
+import shutil
+import threading
+import time
+
+from pandas.testing import assert_frame_equal
+from pytest import mark, raises
+
+from src.config import get_csv_to_table_mapping
+from src.dag import Node, run_dag, sort_nodes
+from src.database import create_database_engine
+from src.pipeline import run_pipeline
+from src.transform import QueryEnum, run_queries
+
+
+class MemoryStore:
+    """Keeps the keys of the nodes that ran in a dictionary."""
+
+    def __init__(self) -> None:
+        self.keys, self.outputs = {}, {}
+
+    def lookup(self, node, key):
+        return self.keys.get(node.name) == key, self.outputs.get(node.name)
+
+    def save(self, node, key, output):
+        self.keys[node.name], self.outputs[node.name] = key, output
+
+
+def test_sort_nodes():
+    """Test that the nodes come after their inputs and that cycles are rejected."""
+    nodes = [
+        Node(name="c", stage="query", run=None, inputs=("a", "b")),
+        Node(name="b", stage="load", run=None, inputs=("a",)),
+        Node(name="a", stage="extract", run=None),
+    ]
+    assert [node.name for node in sort_nodes(nodes)] == ["a", "b", "c"]
+
+    with raises(ValueError):
+        sort_nodes([Node(name="a", stage="load", run=None, inputs=("b",))])
+    with raises(ValueError):
+        sort_nodes(
+            [
+                Node(name="a", stage="load", run=None, inputs=("b",)),
+                Node(name="b", stage="load", run=None, inputs=("a",)),
+            ]
+        )
+
+
+def test_run_dag_starts_nodes_when_their_inputs_are_ready():
+    """Test that a node does not wait for the nodes it does not need."""
+    slow_done = threading.Event()
+
+    def slow(inputs):
+        time.sleep(0.2)
+        slow_done.set()
+        return "slow"
+
+    def fast_dependent(inputs):
+        # Runs while the slow node is still running
+        return inputs["fast"] + ("" if slow_done.is_set() else " early")
+
+    nodes = [
+        Node(name="slow", stage="load", run=slow),
+        Node(name="fast", stage="load", run=lambda inputs: "fast"),
+        Node(name="query", stage="query", run=fast_dependent, inputs=("fast",)),
+    ]
+    outputs = run_dag(nodes, max_workers=3)
+    assert outputs == {"slow": "slow", "fast": "fast", "query": "fast early"}
+
+
+def test_run_dag_holds_locks():
+    """Test that the nodes with the same lock never run at the same time."""
+    running, overlaps = [], []
+
+    def write(inputs):
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+
+    nodes = [
+        Node(name=f"load:{index}", stage="load", run=write, lock="database")
+        for index in range(4)
+    ]
+    run_dag(nodes, max_workers=4)
+    assert overlaps == [1, 1, 1, 1]
+
+
+def test_run_dag_skips_up_to_date_nodes():
+    """Test that only the nodes whose key changed, and their dependents, run again."""
+    versions = {"a": 1, "b": 1}
+    calls = []
+
+    def make_node(name, inputs=(), lazy=False):
+        def run(inputs):
+            calls.append(name)
+            return name
+
+        key = None if lazy else (lambda: versions.get(name))
+        return Node(name=name, stage="load", run=run, inputs=inputs, key=key, lazy=lazy)
+
+    nodes = [
+        make_node("extract:a", lazy=True),
+        make_node("a", inputs=("extract:a",)),
+        make_node("extract:b", lazy=True),
+        make_node("b", inputs=("extract:b",)),
+        make_node("c", inputs=("a",)),
+    ]
+    store = MemoryStore()
+    skipped = []
+
+    run_dag(nodes, store=store)
+    assert sorted(calls) == ["a", "b", "c", "extract:a", "extract:b"]
+
+    calls.clear()
+    versions["a"] = 2
+    outputs = run_dag(
+        nodes,
+        store=store,
+        on_done=lambda node, output, was_skipped: was_skipped
+        and skipped.append(node.name),
+    )
+    assert sorted(calls) == ["a", "c", "extract:a"]
+    assert sorted(skipped) == ["b", "extract:b"]
+    assert outputs == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_run_dag_raises_node_errors():
+    """Test that the error of a node is raised and its dependents do not run."""
+    calls = []
+
+    def fail(inputs):
+        raise RuntimeError("extract failed")
+
+    nodes = [
+        Node(name="extract", stage="extract", run=fail),
+        Node(name="load", stage="load", run=calls.append, inputs=("extract",)),
+    ]
+    with raises(RuntimeError):
+        run_dag(nodes)
+    assert calls == []
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_run_pipeline_skips_up_to_date_steps(
+    tmp_path, backend, synthetic_csv_folder, public_holidays_url
+):
+    """Test that a rerun only loads the changed csv files and reruns the queries reading them."""
+    # The test changes a csv file, so it works on a copy of the shared dataset
+    csv_folder = str(tmp_path / "dataset")
+    shutil.copytree(synthetic_csv_folder, csv_folder)
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    csv_table_mapping = get_csv_to_table_mapping()
+
+    def run():
+        progress = []
+        results = run_pipeline(
+            database=database,
+            run_etl=True,
+            csv_folder=csv_folder,
+            csv_table_mapping=csv_table_mapping,
+            public_holidays_url=public_holidays_url,
+            on_progress=progress.append,
+        )
+        return results, [f"{step.stage}:{step.name}" for step in progress]
+
+    first_results, first_progress = run()
+    assert "load:olist_sellers" in first_progress
+
+    _, second_progress = run()
+    assert not any(step.startswith("load:") for step in second_progress)
+
+    # Touching a csv file without changing it keeps its load
+    sellers_path = os.path.join(csv_folder, "olist_sellers_dataset.csv")
+    os.utime(sellers_path, ns=(0, 0))
+    _, third_progress = run()
+    assert not any(step.startswith("load:") for step in third_progress)
+
+    with open(sellers_path, "a") as file:
+        file.write("s_new,1001,sao paulo,SP\n")
+    results, fourth_progress = run()
+    assert [step for step in fourth_progress if step.startswith("load:")] == [
+        "load:olist_sellers"
+    ]
+
+    assert list(results) == [query.value for query in QueryEnum]
+    expected = run_queries(database)
+    for query_name, result in expected.items():
+        assert_frame_equal(results[query_name], result)
+        if query_name != QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value:
+            assert_frame_equal(first_results[query_name], result)
@@ -0,0 +1,269 @@
+import json
+from pathlib import Path
+
+from pandas import DataFrame, read_sql, to_datetime
+from pandas.testing import assert_frame_equal
+from pytest import approx, mark, raises
+
+from benchmarks.query_results import CATEGORY_QUERIES, SYNTHETIC_QUERY_RESULTS_PATH
+from src.database import create_database_engine
+from src.incremental import build_aggregates
+from src.inmemory import get_category_shares
+from src.load import load
+from src.transform import (
+    FilteredQueryEnum,
+    QueryEnum,
+    QueryFilters,
+    get_filter_options,
+    run_filtered_queries,
+    run_queries,
+)
+from src.utils.sql_dialect import translate_sql
+
+
+def test_duckdb_matches_sqlite(tmp_path, synthetic_dataframes_with_holidays):
+    """Test that every query gives the same result on both backends."""
+    dataframes = synthetic_dataframes_with_holidays
+    results = {}
+    for backend in ["sqlite", "duckdb"]:
+        engine = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+        load(dataframes=dataframes, database=engine)
+        build_aggregates(engine)
+        results[backend] = run_queries(engine)
+        filters = QueryFilters(2017, 2018, ("SP", "RJ"), ("health_beauty",))
+        results[backend].update(run_filtered_queries(engine, filters))
+        engine.dispose()
+
+    assert results["duckdb"].keys() == results["sqlite"].keys()
+    for query_name, expected in results["sqlite"].items():
+        assert_frame_equal(
+            results["duckdb"][query_name], expected, check_dtype=False, obj=query_name
+        )
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_category_revenue_counts_each_payment_once(tmp_path, backend):
+    """Test that the payments of an order are shared between its categories by price."""
+    delivered = {
+        "customer_id": "c1",
+        "order_status": "delivered",
+        "order_delivered_customer_date": "2017-05-04 10:00:00",
+    }
+    canceled = {
+        "customer_id": "c1",
+        "order_status": "canceled",
+        "order_delivered_customer_date": None,
+    }
+    dataframes = {
+        "olist_orders": DataFrame(
+            [
+                {"order_id": "o1", **delivered},
+                {"order_id": "o2", **delivered},
+                {"order_id": "o3", **delivered},
+                {"order_id": "o4", **canceled},
+            ]
+        ),
+        "olist_order_items": DataFrame(
+            {
+                "order_id": ["o1", "o1", "o1", "o2", "o3", "o3", "o4"],
+                "order_item_id": [1, 2, 3, 1, 1, 2, 1],
+                "product_id": ["toy", "toy", "bed", "bed", "rake", "box", "toy"],
+                # In cents, like extract returns them
+                "price": [1000, 1000, 2000, 500, 3000, 1000, 10000],
+            }
+        ),
+        "olist_products": DataFrame(
+            {
+                "product_id": ["toy", "bed", "rake", "box"],
+                "product_category_name": ["brinquedos", "cama", "jardim", None],
+            }
+        ),
+        "product_category_name_translation": DataFrame(
+            {
+                "product_category_name": ["brinquedos", "cama", "jardim"],
+                "product_category_name_english": ["toys", "bed", "garden"],
+            }
+        ),
+        "olist_order_payments": DataFrame(
+            {
+                "order_id": ["o1", "o1", "o2", "o3", "o4"],
+                "payment_sequential": [1, 2, 1, 1, 1],
+                "payment_value": [3000, 1000, 700, 2000, 10000],
+            }
+        ),
+    }
+    engine = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(dataframes=dataframes, database=engine)
+
+    results = run_queries(
+        engine,
+        queries=[
+            QueryEnum.TOP_10_REVENUE_CATEGORIES.value,
+            QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value,
+        ],
+    )
+    engine.dispose()
+
+    # o1 pays 40.00 for 20.00 of toys and 20.00 of bed, o2 pays 7.00 for a bed,
+    # o3 pays 20.00 for 30.00 of garden and 10.00 without a category, which keeps
+    # its 5.00, and the canceled o4 counts for nothing
+    expected = DataFrame(
+        {
+            "Category": ["bed", "toys", "garden"],
+            "Num_order": [2, 1, 1],
+            "Revenue": [27.0, 20.0, 15.0],
+        }
+    )
+    assert_frame_equal(
+        results[QueryEnum.TOP_10_REVENUE_CATEGORIES.value],
+        expected,
+        check_dtype=False,
+    )
+    assert_frame_equal(
+        results[QueryEnum.TOP_10_LEAST_REVENUE_CATEGORIES.value],
+        expected[::-1].reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_category_queries_match_synthetic_query_results(
+    tmp_path, backend, synthetic_dataframes
+):
+    """Test the category queries against the files of python -m benchmarks.query_results --synthetic."""
+    engine = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(dataframes=synthetic_dataframes, database=engine)
+    results = run_queries(engine, queries=CATEGORY_QUERIES)
+    engine.dispose()
+
+    for query_name in CATEGORY_QUERIES:
+        with open(Path(SYNTHETIC_QUERY_RESULTS_PATH) / f"{query_name}.json") as file:
+            expected = DataFrame(json.load(file))
+        assert_frame_equal(
+            results[query_name], expected, check_dtype=False, obj=query_name
+        )
+
+
+def filter_delivered_orders(
+    dataframes: dict[str, DataFrame], filters: QueryFilters
+) -> DataFrame:
+    """The delivered orders of the years and states of the filters, with their month."""
+    orders = dataframes["olist_orders"].merge(
+        dataframes["olist_customers"][["customer_id", "customer_state"]],
+        on="customer_id",
+    )
+    orders = orders[
+        (orders["order_status"] == "delivered")
+        & orders["order_delivered_customer_date"].notna()
+    ]
+    delivered_at = to_datetime(orders["order_delivered_customer_date"])
+    orders = orders.assign(
+        year=delivered_at.dt.strftime("%Y"), month_no=delivered_at.dt.strftime("%m")
+    )
+    orders = orders[
+        orders["year"].astype(int).between(filters.start_year, filters.end_year)
+    ]
+    if filters.states:
+        orders = orders[orders["customer_state"].isin(filters.states)]
+    return orders[["order_id", "year", "month_no", "customer_state"]]
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+@mark.parametrize("aggregates", [True, False])
+def test_filtered_queries_match_the_tables(
+    tmp_path, backend, aggregates, synthetic_dataframes
+):
+    """Test the filtered queries, over the aggregates or the loaded tables, against the orders."""
+    dataframes = synthetic_dataframes
+    engine = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(dataframes=dataframes, database=engine)
+    if aggregates:
+        build_aggregates(engine)
+
+    # The options of the aggregates are the values of the delivered orders
+    options = get_filter_options(engine)
+    delivered = filter_delivered_orders(dataframes, QueryFilters(0, 9999, (), ()))
+    if aggregates:
+        assert options.years == sorted(delivered["year"].astype(int).unique())
+        assert options.states == sorted(delivered["customer_state"].unique())
+    else:
+        assert set(options.years) >= set(delivered["year"].astype(int))
+        assert set(options.states) >= set(delivered["customer_state"])
+
+    payments = (
+        dataframes["olist_order_payments"].groupby("order_id")["payment_value"].sum()
+    )
+    shares = get_category_shares(dataframes)
+    categories = tuple(shares["Category"].value_counts().index[:3])
+    if aggregates:
+        assert options.categories == sorted(shares["Category"].unique())
+    else:
+        assert set(options.categories) >= set(shares["Category"])
+
+    for filters in (
+        QueryFilters(2016, 2018, (), ()),
+        QueryFilters(2017, 2017, ("SP", "RJ", "MG"), ()),
+        QueryFilters(2017, 2018, ("SP",), categories),
+    ):
+        results = run_filtered_queries(engine, filters)
+        orders = filter_delivered_orders(dataframes, filters)
+        if filters.categories:
+            # Only the share of the selected categories counts
+            revenue = orders.merge(
+                shares[shares["Category"].isin(filters.categories)], on="order_id"
+            )
+        else:
+            revenue = orders.join(
+                payments.rename("Revenue"), on="order_id", how="inner"
+            )
+        revenue = revenue.assign(Revenue=revenue["Revenue"] / 100)
+
+        by_month = revenue.groupby(["year", "month_no"])["Revenue"].sum().reset_index()
+        assert_frame_equal(
+            results[FilteredQueryEnum.FILTERED_REVENUE_BY_MONTH.value],
+            by_month,
+            check_dtype=False,
+        )
+        per_state = revenue.groupby("customer_state", observed=True)["Revenue"].sum()
+        assert (
+            results[FilteredQueryEnum.FILTERED_REVENUE_PER_STATE.value]
+            .set_index("customer_state")["Revenue"]
+            .sort_index()
+            .to_dict()
+        ) == approx(per_state.to_dict())
+
+        category_shares = orders.merge(shares, on="order_id")
+        if filters.categories:
+            category_shares = category_shares[
+                category_shares["Category"].isin(filters.categories)
+            ]
+        per_category = category_shares.groupby("Category", observed=True).agg(
+            Num_order=("order_id", "size"), Revenue=("Revenue", "sum")
+        )
+        result = results[FilteredQueryEnum.FILTERED_REVENUE_PER_CATEGORY.value]
+        assert result["Revenue"].is_monotonic_decreasing
+        assert_frame_equal(
+            result.set_index("Category").sort_index(),
+            per_category.assign(Revenue=per_category["Revenue"] / 100),
+            check_dtype=False,
+        )
+    engine.dispose()
+
+
+def test_translate_sql_truncates_integer_casts(tmp_path):
+    """Test that DuckDB truncates like SQLite when casting reals to integers."""
+    engine = create_database_engine(str(tmp_path / "olist.duckdb"), "duckdb")
+    sql = translate_sql(
+        "SELECT CAST(2.7 AS INTEGER) AS a, CAST(-2.7 AS INTEGER) AS b, "
+        "julianday('2017-01-02') - julianday('2017-01-01 12:00:00') AS c, "
+        "CAST(STRFTIME('%Y', '2017-05-04 10:00:00') AS INTEGER) AS d",
+        "duckdb",
+    )
+    assert read_sql(sql, engine).iloc[0].tolist() == [2, -2, 0.5, 2017]
+    assert translate_sql("SELECT julianday(x)", "sqlite") == "SELECT julianday(x)"
+
+
+def test_unknown_backend():
+    """Test that an unknown backend is rejected."""
+    with raises(ValueError):
+        create_database_engine("olist.db", "postgres")
@@ -0,0 +1,77 @@
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from pytest import raises
+
+from src.config import get_csv_to_table_mapping
+from src.database import create_database_engine
+from src.encoding import ID_DICTIONARY_TABLE, IdEncoder, decode_ids, read_id_encoder
+from src.extract import extract, iter_extract
+from src.load import load, load_chunks
+from src.transform import run_queries
+
+
+def test_id_encoder_codes_are_stable():
+    """Test that an id keeps its code across chunks and after reloading the dictionary."""
+    encoder = IdEncoder()
+    first = encoder.encode(DataFrame({"order_id": ["b", "a", "b"], "price": [1, 2, 3]}))
+    second = encoder.encode(DataFrame({"order_id": ["c", "a"]}))
+
+    assert first["order_id"].tolist() == [0, 1, 0]
+    assert first["price"].tolist() == [1, 2, 3]
+    assert second["order_id"].tolist() == [2, 1]
+
+    dictionary = encoder.to_dataframe()
+    reloaded = IdEncoder(dictionary)
+    assert reloaded.encode(DataFrame({"order_id": ["d", "c"]}))[
+        "order_id"
+    ].tolist() == [3, 2]
+    assert decode_ids(second["order_id"], "order_id", dictionary).tolist() == ["c", "a"]
+
+    with raises(ValueError):
+        encoder.encode(DataFrame({"order_id": ["a", None]}))
+
+
+def test_encoded_database_matches(
+    tmp_path,
+    synthetic_csv_folder,
+    public_holidays_url,
+    synthetic_dataframes_with_holidays,
+):
+    """Test that the queries give the same results with encoded ids, also after reloading a table."""
+    csv_folder = synthetic_csv_folder
+    plain_dataframes = synthetic_dataframes_with_holidays
+    dataframes = extract(
+        csv_folder, get_csv_to_table_mapping(), public_holidays_url, encoder=IdEncoder()
+    )
+
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(plain_dataframes, database)
+    expected = run_queries(database)
+
+    encoded = create_database_engine(str(tmp_path / "encoded.db"), "sqlite")
+    assert dataframes["olist_orders"]["order_id"].dtype == "int64"
+    load(dataframes, encoded)
+    results = run_queries(encoded)
+
+    # The reloaded table gets the codes already used by the other tables
+    orders_only = {"olist_orders_dataset.csv": "olist_orders"}
+    load_chunks(
+        iter_extract(
+            csv_folder,
+            orders_only,
+            public_holidays_url=None,
+            chunk_size=100,
+            encoder=read_id_encoder(encoded),
+        ),
+        encoded,
+    )
+    reloaded_results = run_queries(encoded)
+
+    for query_name, expected_result in expected.items():
+        assert_frame_equal(results[query_name], expected_result, obj=query_name)
+        assert_frame_equal(
+            reloaded_results[query_name], expected_result, obj=query_name
+        )
+    assert len(read_id_encoder(encoded).to_dataframe()) == len(
+        dataframes[ID_DICTIONARY_TABLE]
+    )
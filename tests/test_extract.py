@@ -1,5 +1,10 @@
+from pandas import concat
+from pandas.testing import assert_frame_equal
+
+from benchmarks.holidays_stub import serve_public_holidays
+from src import config
 from src.config import DATASET_ROOT_PATH, PUBLIC_HOLIDAYS_URL, get_csv_to_table_mapping
-from src.extract import extract, get_public_holidays
+from src.extract import extract, get_public_holidays, iter_extract
 
 
 def test_get_public_holidays():
@@ -17,7 +22,11 @@ def test_extract():
     public_holidays_url = PUBLIC_HOLIDAYS_URL
     dataframes = extract(csv_folder, csv_table_mapping, public_holidays_url)
     assert len(dataframes) == len(csv_table_mapping) + 1
-    assert dataframes["public_holidays"].shape == (14, 7)
+    # The holidays of every year of the orders, 14 per year
+    assert dataframes["public_holidays"].shape == (
+        14 * len(config.PUBLIC_HOLIDAY_YEARS),
+        7,
+    )
     assert dataframes["olist_customers"].shape == (99441, 5)
     assert dataframes["olist_geolocation"].shape == (1000163, 5)
     assert dataframes["olist_order_items"].shape == (112650, 7)
@@ -27,3 +36,47 @@ def test_extract():
     assert dataframes["olist_products"].shape == (32951, 9)
     assert dataframes["olist_sellers"].shape == (3095, 4)
     assert dataframes["product_category_name_translation"].shape == (71, 2)
+
+
+def test_get_public_holidays_offline():
+    """Test the get_public_holidays function against the local stub of the API."""
+    with serve_public_holidays() as public_holidays_url:
+        public_holidays = get_public_holidays(public_holidays_url, "2017")
+    assert public_holidays.shape == (14, 7)
+    assert public_holidays["date"].dtype == "datetime64[ns]"
+
+
+def test_extract_public_holidays_of_every_year(tmp_path):
+    """Test that the holidays of every year of PUBLIC_HOLIDAY_YEARS are extracted."""
+    with serve_public_holidays() as public_holidays_url:
+        dataframes = extract(str(tmp_path), {}, public_holidays_url)
+    public_holidays = dataframes["public_holidays"]
+    years = public_holidays["date"].dt.year.astype(str).value_counts()
+    assert years.sort_index().to_dict() == {
+        year: 14 for year in config.PUBLIC_HOLIDAY_YEARS
+    }
+    assert public_holidays.shape == (14 * len(config.PUBLIC_HOLIDAY_YEARS), 7)
+
+
+def test_iter_extract_chunks(synthetic_csv_folder, synthetic_dataframes):
+    """Test that the chunks of each table add up to the table extracted at once."""
+    dataframes = synthetic_dataframes
+
+    chunks = {}
+    for table_name, chunk in iter_extract(
+        synthetic_csv_folder,
+        get_csv_to_table_mapping(),
+        public_holidays_url=None,
+        chunk_size=100,
+    ):
+        assert len(chunk) <= 100
+        chunks.setdefault(table_name, []).append(chunk)
+
+    assert list(chunks) == list(dataframes)
+    for table_name, table_chunks in chunks.items():
+        assert_frame_equal(
+            concat(table_chunks),
+            dataframes[table_name],
+            check_dtype=False,
+            check_categorical=False,
+        )
@@ -0,0 +1,96 @@
+import numpy as np
+from pandas import DataFrame, Series, Timedelta, to_datetime, to_timedelta
+from pandas.testing import assert_frame_equal
+from pytest import mark, raises
+
+from src.holidays import OrderVolume
+
+
+def make_purchase_timestamps(seed: int = 0) -> Series:
+    """Orders at random times from January 2017 to June 2018."""
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.uniform(0, 540, size=5000) * 86400)
+    seconds[0] = 0
+    timestamps = to_datetime("2017-01-01") + to_timedelta(seconds.astype("int64"), "s")
+    return Series(timestamps.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+HOLIDAYS = DataFrame(
+    {
+        "date": to_datetime(
+            ["2016-12-25", "2017-01-01", "2017-04-21", "2018-04-21", "2018-12-25"]
+        ),
+        "name": ["Christmas", "New Year", "Tiradentes", "Tiradentes", "Christmas"],
+    }
+)
+
+
+@mark.parametrize("window", [0, 3, 10])
+def test_holiday_impact_matches_counting_each_day(window):
+    """Test the windows against counting the orders of each day one by one."""
+    timestamps = make_purchase_timestamps()
+    volume = OrderVolume.from_timestamps(timestamps)
+    result = volume.holiday_impact(HOLIDAYS, window, baseline=14)
+
+    days = to_datetime(timestamps).dt.normalize()
+    first, last = days.min(), days.max()
+    per_day = days.value_counts()
+
+    def daily_orders(start, end):
+        covered = [
+            start + Timedelta(days=offset)
+            for offset in range((end - start).days)
+            if first <= start + Timedelta(days=offset) <= last
+        ]
+        return sum(per_day.get(day, 0) for day in covered), len(covered)
+
+    # The holidays outside the orders are left out
+    assert result["Date"].tolist() == ["2017-01-01", "2017-04-21", "2018-04-21"]
+    for row in result.itertuples(index=False):
+        date = to_datetime(row.Date)
+        start = date - Timedelta(days=window)
+        end = date + Timedelta(days=window + 1)
+        orders, window_days = daily_orders(start, end)
+        before = daily_orders(start - Timedelta(days=14), start)
+        after = daily_orders(end, end + Timedelta(days=14))
+        baseline = (before[0] + after[0]) / (before[1] + after[1])
+
+        assert row.Orders == orders
+        assert row[4] == orders / window_days  # Daily orders
+        assert row.Baseline == baseline
+        assert row.Lift == orders / window_days / baseline - 1
+
+
+def test_holiday_impact_is_cached_per_holiday_set_and_window():
+    """Test that each holiday set and window is compared once."""
+    volume = OrderVolume.from_timestamps(make_purchase_timestamps())
+    first = volume.holiday_impact(HOLIDAYS, 3)
+    first["Lift"] = 0.0
+
+    assert_frame_equal(
+        volume.holiday_impact(HOLIDAYS.iloc[::-1], 3),
+        volume.holiday_impact(HOLIDAYS, 3),
+    )
+    assert len(volume._impacts) == 1
+    assert (volume.holiday_impact(HOLIDAYS, 3)["Lift"] != 0).all()
+
+    volume.holiday_impact(HOLIDAYS, 5)
+    volume.holiday_impact(HOLIDAYS.iloc[:3], 3)
+    assert len(volume._impacts) == 3
+
+    with raises(ValueError):
+        volume.holiday_impact(HOLIDAYS, -1)
+
+
+def test_order_volume_from_daily_counts():
+    """Test that the daily counts of the database give the same volume as the timestamps."""
+    timestamps = make_purchase_timestamps(1)
+    days = to_datetime(timestamps).dt.strftime("%Y-%m-%d")
+    daily_counts = days.value_counts().rename_axis("day").reset_index(name="orders")
+
+    assert_frame_equal(
+        OrderVolume.from_daily_counts(daily_counts).holiday_impact(HOLIDAYS),
+        OrderVolume.from_timestamps(timestamps).holiday_impact(HOLIDAYS),
+    )
+    empty = OrderVolume.from_timestamps(Series([], dtype=object))
+    assert empty.holiday_impact(HOLIDAYS).empty
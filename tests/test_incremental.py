@@ -0,0 +1,168 @@
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from pytest import mark, raises
+
+from src.config import get_csv_to_table_mapping
+from src.database import create_database_engine
+from src.encoding import IdEncoder
+from src.extract import extract
+from src.incremental import (
+    build_aggregates,
+    has_aggregates,
+    ingest_batch,
+    read_aggregate_results,
+)
+from src.load import load
+from src.transform import QueryFilters, run_filtered_queries, run_queries
+
+ORDER_TABLES = ["olist_orders", "olist_order_items", "olist_order_payments"]
+
+
+def split_orders(
+    dataframes: dict[str, DataFrame], held_out: int
+) -> tuple[dict[str, DataFrame], list[dict[str, DataFrame]]]:
+    """Split the last orders, with their items and payments, into three batches."""
+    order_ids = dataframes["olist_orders"]["order_id"]
+    held_ids = order_ids.iloc[-held_out:]
+
+    base = {
+        table_name: table[~table["order_id"].isin(held_ids)]
+        if table_name in ORDER_TABLES
+        else table
+        for table_name, table in dataframes.items()
+    }
+    batches = [
+        {
+            table_name: dataframes[table_name][
+                dataframes[table_name]["order_id"].isin(batch_ids)
+            ]
+            for table_name in ORDER_TABLES
+        }
+        for batch_ids in (
+            held_ids.iloc[: held_out // 3],
+            held_ids.iloc[held_out // 3 : 2 * held_out // 3],
+            held_ids.iloc[2 * held_out // 3 :],
+        )
+    ]
+    return base, batches
+
+
+def assert_matches_full_recompute(database) -> None:
+    """Check the aggregates against the queries run on the whole tables."""
+    results = read_aggregate_results(database)
+    expected = run_queries(database, queries=list(results))
+    for query_name, result in results.items():
+        assert_frame_equal(
+            result, expected[query_name], check_dtype=False, check_exact=False
+        )
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_ingest_batch_matches_full_recompute(
+    tmp_path, monkeypatch, backend, synthetic_dataframes
+):
+    """Test that the delta-maintained aggregates match the queries after appends and upserts."""
+    # The touched keys of the aggregates are read in several statements
+    monkeypatch.setattr("src.incremental.KEY_LOOKUP_CHUNK_SIZE", 7)
+    dataframes = synthetic_dataframes
+    base, batches = split_orders(dataframes, held_out=90)
+
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(base, database)
+    for batch in batches:
+        ingest_batch(batch, database)
+    assert has_aggregates(database)
+    assert_matches_full_recompute(database)
+
+    # Updated orders, payments and customers replace the rows with the same keys,
+    # including values the enums of DuckDB do not have yet
+    orders = dataframes["olist_orders"].astype({"order_status": object})
+    delivered = orders[orders["order_status"] == "delivered"].head(10)
+    payments = dataframes["olist_order_payments"].head(10)
+    customers = dataframes["olist_customers"].astype({"customer_state": object})
+    ingest_batch(
+        {
+            "olist_orders": delivered.assign(order_status="canceled"),
+            "olist_order_payments": payments.assign(
+                payment_value=payments["payment_value"] + 5
+            ),
+            "olist_customers": customers.head(20).assign(customer_state="XX"),
+        },
+        database,
+    )
+    ingest_batch({"olist_orders": orders.tail(3).assign(order_status="lost")}, database)
+
+    assert_matches_full_recompute(database)
+    order_count = read_aggregate_results(database)["global_amount_order_status"]
+    assert order_count["Amount"].sum() == len(orders)
+
+    # The filtered queries read aggregates too, the same as built from the tables
+    filters = [
+        QueryFilters(2016, 2018, (), ()),
+        QueryFilters(2017, 2018, ("SP", "XX"), ("health_beauty", "bed_bath_table")),
+    ]
+    results = [
+        run_filtered_queries(database, query_filters) for query_filters in filters
+    ]
+    build_aggregates(database)
+    for query_filters, result in zip(filters, results):
+        for query_name, expected in run_filtered_queries(
+            database, query_filters
+        ).items():
+            assert_frame_equal(
+                result[query_name], expected, check_dtype=False, obj=query_name
+            )
+
+
+def test_ingest_batch_encodes_ids(tmp_path, synthetic_csv_folder, synthetic_dataframes):
+    """Test that a batch is encoded with the dictionary of an encoded database."""
+    dataframes = synthetic_dataframes
+    encoded = extract(
+        synthetic_csv_folder, get_csv_to_table_mapping(), None, encoder=IdEncoder()
+    )
+    base, _ = split_orders(encoded, held_out=30)
+    _, batches = split_orders(dataframes, held_out=30)
+
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(base, database)
+    for batch in batches:
+        ingest_batch(batch, database)
+
+    assert_matches_full_recompute(database)
+    assert run_queries(database, queries=["global_amount_order_status"])[
+        "global_amount_order_status"
+    ]["Amount"].sum() == len(dataframes["olist_orders"])
+
+
+def test_reload_rebuilds_stale_aggregates(tmp_path, synthetic_dataframes):
+    """Test that reloading an order table builds the aggregates again, or drops them for ingest_batch."""
+    dataframes = synthetic_dataframes
+    base, batches = split_orders(dataframes, held_out=30)
+
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(base, database)
+    ingest_batch(batches[0], database)
+
+    load({"olist_sellers": dataframes["olist_sellers"]}, database)
+    assert has_aggregates(database)
+
+    load(
+        {"olist_orders": base["olist_orders"]},
+        database,
+        rebuild_materializations=False,
+    )
+    assert not has_aggregates(database)
+
+    ingest_batch(batches[1], database)
+    assert_matches_full_recompute(database)
+
+    load({"olist_orders": dataframes["olist_orders"]}, database)
+    assert has_aggregates(database)
+    assert_matches_full_recompute(database)
+
+
+def test_ingest_batch_rejects_other_tables(tmp_path):
+    """Test that only the order tables can be ingested."""
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    with raises(ValueError):
+        ingest_batch({"olist_products": DataFrame()}, database)
@@ -0,0 +1,39 @@
+from pandas.testing import assert_frame_equal
+
+from src.database import create_database_engine
+from src.inmemory import run_queries as run_in_memory_queries
+from src.load import load
+from src.transform import QueryEnum, run_queries
+
+
+def test_in_memory_matches_sqlite(tmp_path, synthetic_dataframes_with_holidays):
+    """Test that every query gives the same result without the database."""
+    dataframes = synthetic_dataframes_with_holidays
+    engine = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(dataframes=dataframes, database=engine)
+    expected = run_queries(engine)
+    engine.dispose()
+
+    results = run_in_memory_queries(dataframes)
+
+    assert list(results) == [query.value for query in QueryEnum]
+    for query_name, expected_result in expected.items():
+        assert_frame_equal(results[query_name], expected_result, obj=query_name)
+
+
+def test_in_memory_selected_queries(synthetic_dataframes):
+    """Test that only the selected queries run and each result is reported."""
+    dataframes = synthetic_dataframes
+    reported = []
+    queries = [
+        QueryEnum.REVENUE_PER_STATE.value,
+        QueryEnum.GLOBAL_AMOUNT_ORDER_STATUS.value,
+    ]
+    results = run_in_memory_queries(
+        dataframes,
+        on_result=lambda result: reported.append(result.query),
+        queries=queries,
+    )
+
+    assert list(results) == queries
+    assert reported == queries
@@ -0,0 +1,176 @@
+import numpy as np
+from pandas import read_sql
+from pandas.testing import assert_frame_equal
+from pytest import mark, raises
+
+from src.database import create_database_engine
+from src.incremental import ingest_batch
+from src.leaderboard import (
+    LEADERBOARD_COLUMNS,
+    SELLER_METRICS_TABLE,
+    BoundedTopK,
+    build_seller_leaderboard,
+    get_seller_metrics,
+    has_seller_leaderboard,
+    read_seller_leaderboard,
+)
+from src.load import load
+from src.materializations import build_materializations
+from src.utils.fingerprint import get_database_fingerprint
+
+
+def test_bounded_top_k():
+    """Test that the board keeps the exact top of a set updated at random."""
+    rng = np.random.default_rng(0)
+    scores = {key: int(rng.integers(0, 1000)) for key in range(500)}
+
+    for descending in (True, False):
+        board = BoundedTopK(capacity=20, descending=descending)
+        board.refill(sorted(scores.items(), key=lambda item: board._rank(*item))[:21])
+        current = dict(scores)
+        for _ in range(2000):
+            key = int(rng.integers(0, 600))
+            score = None if rng.random() < 0.1 else int(rng.integers(0, 1000))
+            if score is None:
+                current.pop(key, None)
+            else:
+                current[key] = score
+            board.update(key, score)
+
+            ranked = sorted(current.items(), key=lambda item: board._rank(*item))
+            if not board.is_complete(10):
+                board.refill(ranked[:21])
+                board = BoundedTopK.from_json(board.to_json())
+            assert len(board) <= 20
+            assert board.top(10) == ranked[:10]
+
+
+def test_bounded_top_k_sorts_once_per_change(monkeypatch):
+    """Test that top reuses the ranking until an update changes the board."""
+    board = BoundedTopK(capacity=3)
+    board.refill([("a", 5), ("b", 4), ("c", 3), ("d", 2)])
+    ranks = []
+    rank = board._rank
+    monkeypatch.setattr(board, "_rank", lambda *item: ranks.append(item) or rank(*item))
+
+    top = board.top(3)
+    assert top == [("a", 5), ("b", 4), ("c", 3)]
+    top.clear()
+    assert board.top(2) == [("a", 5), ("b", 4)]
+    assert ranks == []
+
+    # Unchanged scores and keys behind the threshold leave the ranking as it is
+    board.update("b", 4)
+    board.update("e", 1)
+    board.update("e", None)
+    ranks.clear()
+    assert board.top(3) == [("a", 5), ("b", 4), ("c", 3)]
+    assert ranks == []
+
+    board.update("c", 6)
+    assert board.top(3) == [("c", 6), ("a", 5), ("b", 4)]
+    board.update("a", None)
+    assert board.top(3) == [("c", 6), ("b", 4)]
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_seller_leaderboard(tmp_path, monkeypatch, backend, synthetic_dataframes):
+    """Test that ingest_batch keeps the metrics and the top and bottom sellers exact."""
+    # Boards smaller than the sellers of the dataset, so sellers enter and leave them
+    monkeypatch.setattr("src.leaderboard.MAX_LEADERBOARD_SIZE", 6)
+    monkeypatch.setattr("src.leaderboard.LEADERBOARD_CAPACITY", 12)
+    dataframes = synthetic_dataframes
+    orders = dataframes["olist_orders"]
+    held_out = orders.iloc[-60:]
+
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load({**dataframes, "olist_orders": orders.iloc[:-60]}, database)
+    build_seller_leaderboard(database)
+
+    ingest_batch({"olist_orders": held_out.iloc[:30]}, database)
+    ingest_batch({"olist_orders": held_out.iloc[30:]}, database)
+
+    # Cancelling the orders of the best sellers makes them fall behind the board
+    items = dataframes["olist_order_items"]
+    best = read_seller_leaderboard(database, 5)["Seller"]
+    order_ids = items.loc[items["seller_id"].isin(best), "order_id"]
+    canceled = orders[
+        orders["order_id"].isin(order_ids) & (orders["order_status"] == "delivered")
+    ]
+    ingest_batch({"olist_orders": canceled.assign(order_status="canceled")}, database)
+    orders = orders.set_index("order_id")
+    orders.loc[canceled["order_id"], "order_status"] = "canceled"
+    current = {**dataframes, "olist_orders": orders.reset_index()}
+
+    expected = get_seller_metrics(current)
+    metrics = read_sql(f"SELECT * FROM {SELLER_METRICS_TABLE}", database)
+    assert_frame_equal(
+        metrics.sort_values("seller_id", ignore_index=True), expected, check_dtype=False
+    )
+
+    for direction, ascending in (("top", False), ("bottom", True)):
+        result = read_seller_leaderboard(database, 6, direction)
+        ranked = expected.sort_values(
+            ["revenue", "seller_id"], ascending=[ascending, True]
+        ).head(6)
+        assert result["Rank"].tolist() == list(range(1, 7))
+        assert result["Seller"].tolist() == ranked["seller_id"].tolist()
+        assert result["Revenue"].tolist() == (ranked["revenue"] / 100).tolist()
+        assert result["On-time rate"].between(0, 1).all()
+        assert result["City"].notna().all()
+
+
+def test_reload_rebuilds_seller_leaderboard(tmp_path, synthetic_dataframes):
+    """Test that reloading the items builds the leaderboard again, and reading never builds it."""
+    dataframes = synthetic_dataframes
+
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(dataframes, database)
+    assert not has_seller_leaderboard(database)
+    missing = read_seller_leaderboard(database, 5, "bottom")
+    assert missing.empty
+    assert missing.columns.tolist() == LEADERBOARD_COLUMNS
+    assert not has_seller_leaderboard(database)
+
+    assert "seller_leaderboard" in build_materializations(database)
+    assert build_materializations(database) == []
+    first = read_seller_leaderboard(database, 5, "bottom")
+    assert first.columns.tolist() == LEADERBOARD_COLUMNS
+
+    load({"olist_customers": dataframes["olist_customers"]}, database)
+    assert has_seller_leaderboard(database)
+
+    load({"olist_order_items": dataframes["olist_order_items"]}, database)
+    assert has_seller_leaderboard(database)
+    assert_frame_equal(read_seller_leaderboard(database, 5, "bottom"), first)
+
+    load(
+        {"olist_order_items": dataframes["olist_order_items"]},
+        database,
+        rebuild_materializations=False,
+    )
+    assert not has_seller_leaderboard(database)
+    assert read_seller_leaderboard(database, 5, "bottom").empty
+    build_seller_leaderboard(database)
+    assert_frame_equal(read_seller_leaderboard(database, 5, "bottom"), first)
+
+    with raises(ValueError):
+        read_seller_leaderboard(database, 5, "middle")
+    with raises(ValueError):
+        read_seller_leaderboard(database, 500)
+
+
+def test_reading_seller_leaderboard_keeps_fingerprint(tmp_path, synthetic_dataframes):
+    """Test that reading the leaderboard leaves the database file untouched."""
+    database_path = str(tmp_path / "olist.db")
+    database = create_database_engine(database_path, "sqlite")
+    load(synthetic_dataframes, database)
+
+    for built in (False, True):
+        if built:
+            build_materializations(database)
+        database.dispose()
+        fingerprint = get_database_fingerprint(database_path)
+        read_seller_leaderboard(database, 10, "top")
+        database.dispose()
+        assert get_database_fingerprint(database_path) == fingerprint
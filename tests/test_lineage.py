@@ -0,0 +1,151 @@
+from pathlib import Path
+
+from pandas.testing import assert_frame_equal
+
+import src.snapshot
+from src import config
+from src.config import QUERIES_ROOT_PATH
+from src.database import create_database_engine
+from src.lineage import (
+    get_affected_queries,
+    get_changed_tables,
+    get_query_tables,
+    read_sql_tables,
+    read_table_loads,
+    record_table_loads,
+)
+from src.load import has_stale_money_columns, load
+from src.snapshot import export_snapshot, load_snapshot
+from src.transform import QueryEnum, run_queries
+from src.utils.money import from_cents
+
+
+def test_query_tables_cover_the_sql():
+    """Test that every query declares its tables, at least those its SQL file reads."""
+    query_tables = get_query_tables()
+    assert list(query_tables) == [query.value for query in QueryEnum]
+
+    for query_name, tables in query_tables.items():
+        sql_path = Path(QUERIES_ROOT_PATH) / f"{query_name}.sql"
+        if sql_path.exists():
+            assert read_sql_tables(sql_path.read_text()) <= set(tables), query_name
+
+
+def test_read_sql_tables_skips_common_table_expressions():
+    """Test that the names of the common table expressions are not taken for tables."""
+    sql = """
+    -- FROM comment_table
+    WITH totals AS (SELECT order_id FROM olist_orders)
+    SELECT * FROM totals JOIN olist_order_payments p ON p.order_id = totals.order_id
+    """
+    assert read_sql_tables(sql) == {"olist_orders", "olist_order_payments"}
+
+
+def test_get_affected_queries():
+    """Test that a table only affects the queries that read it."""
+    assert get_affected_queries(["olist_sellers"]) == [
+        QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value
+    ]
+    assert get_affected_queries(["public_holidays"]) == [
+        QueryEnum.ORDERS_PER_DAY_AND_HOLIDAYS_2017.value,
+        QueryEnum.HOLIDAY_IMPACT.value,
+    ]
+    assert get_affected_queries(["olist_order_reviews"]) == []
+    assert get_affected_queries(["olist_orders"]) == [
+        query.value for query in QueryEnum
+    ]
+
+
+def test_table_loads(tmp_path):
+    """Test that each load gives a table a new load id."""
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    assert read_table_loads(database) == {}
+
+    record_table_loads(database, ["olist_orders", "olist_sellers"])
+    first = read_table_loads(database)
+    record_table_loads(database, ["olist_sellers"])
+    second = read_table_loads(database)
+
+    assert set(second) == {"olist_orders", "olist_sellers"}
+    assert get_changed_tables(first, second) == {"olist_sellers"}
+    assert get_changed_tables({}, second) == {"olist_orders", "olist_sellers"}
+
+
+def test_export_snapshot_only_reruns_affected_queries(
+    tmp_path, monkeypatch, synthetic_dataframes_with_holidays
+):
+    """Test that a snapshot reruns the queries of the reloaded tables and keeps the others."""
+    dataframes = synthetic_dataframes_with_holidays
+    database_path = str(tmp_path / "olist.db")
+    snapshot_folder = str(tmp_path / "snapshot")
+    database = create_database_engine(database_path, "sqlite")
+    load(dataframes, database)
+    export_snapshot(database, database_path, snapshot_folder)
+    figures_folder = Path(snapshot_folder) / "figures"
+    first_figures = {
+        path.name: path.read_bytes() for path in figures_folder.glob("*.pickle")
+    }
+
+    ran_queries = []
+
+    def recording_run_queries(database, queries=None, **kwargs):
+        ran_queries.append(queries)
+        return run_queries(database, queries=queries, **kwargs)
+
+    monkeypatch.setattr(src.snapshot, "run_queries", recording_run_queries)
+
+    sellers = dataframes["olist_sellers"]
+    load({"olist_sellers": sellers.assign(seller_zip_code_prefix=1001)}, database)
+    database.dispose()
+    export_snapshot(database, database_path, snapshot_folder)
+
+    distance_query = QueryEnum.FREIGHT_VALUE_DISTANCE_RELATIONSHIP.value
+    assert ran_queries == [[distance_query]]
+
+    snapshot = load_snapshot(database_path, snapshot_folder)
+    assert snapshot is not None
+    expected = run_queries(database)
+    assert sorted(snapshot.query_results) == sorted(expected)
+    for query_name, result in expected.items():
+        assert_frame_equal(snapshot.query_results[query_name], result)
+
+    for path in figures_folder.glob("*.pickle"):
+        if path.stem != distance_query:
+            assert path.read_bytes() == first_figures[path.name]
+
+
+def test_snapshot_main_reloads_money_stored_as_reais(
+    tmp_path,
+    monkeypatch,
+    synthetic_csv_folder,
+    public_holidays_url,
+    synthetic_dataframes_with_holidays,
+):
+    """Test that building the snapshot loads again a database that stores reais."""
+    dataframes = synthetic_dataframes_with_holidays
+    database_path = str(tmp_path / "olist.db")
+    database = create_database_engine(database_path, "sqlite")
+    load(dataframes, database)
+    expected = run_queries(database)
+    payments = dataframes["olist_order_payments"]
+    load(
+        {
+            "olist_order_payments": payments.assign(
+                payment_value=lambda rows: from_cents(rows["payment_value"])
+            )
+        },
+        database,
+    )
+    database.dispose()
+
+    monkeypatch.setattr(src.snapshot, "get_database_path", lambda: database_path)
+    monkeypatch.setattr(config, "DATASET_ROOT_PATH", synthetic_csv_folder)
+    monkeypatch.setattr(config, "PUBLIC_HOLIDAYS_URL", public_holidays_url)
+    monkeypatch.setattr(config, "SNAPSHOT_ROOT_PATH", str(tmp_path / "snapshot"))
+    src.snapshot.main()
+
+    assert not has_stale_money_columns(database)
+    snapshot = load_snapshot(database_path, config.SNAPSHOT_ROOT_PATH)
+    assert snapshot is not None
+    for query_name, result in expected.items():
+        assert_frame_equal(snapshot.query_results[query_name], result, obj=query_name)
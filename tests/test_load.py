@@ -0,0 +1,86 @@
+from pandas import read_sql
+from pandas.testing import assert_frame_equal
+from pytest import mark
+from sqlalchemy import create_engine
+
+from src.config import get_csv_to_table_mapping
+from src.database import create_database_engine
+from src.extract import iter_extract
+from src.load import has_stale_money_columns, load, load_chunks
+from src.utils.money import from_cents
+
+
+def test_load_chunks_matches_load(tmp_path, synthetic_csv_folder, synthetic_dataframes):
+    """Test that streaming the chunks gives the same tables as loading the dataframes."""
+    csv_folder = synthetic_csv_folder
+    csv_table_mapping = get_csv_to_table_mapping()
+
+    database = create_engine(f"sqlite:///{tmp_path / 'load.db'}")
+    load(synthetic_dataframes, database)
+
+    streamed = create_engine(f"sqlite:///{tmp_path / 'streamed.db'}")
+    loaded_rows = {}
+    load_chunks(
+        iter_extract(
+            csv_folder, csv_table_mapping, public_holidays_url=None, chunk_size=250
+        ),
+        streamed,
+        on_progress=loaded_rows.__setitem__,
+    )
+
+    assert list(loaded_rows) == list(csv_table_mapping.values())
+    for table_name in csv_table_mapping.values():
+        expected = read_sql(f"SELECT * FROM {table_name}", database)
+        assert_frame_equal(read_sql(f"SELECT * FROM {table_name}", streamed), expected)
+        assert loaded_rows[table_name] == len(expected)
+
+
+def test_load_chunks_creates_duckdb_enums(
+    tmp_path, synthetic_csv_folder, synthetic_dataframes
+):
+    """Test that the categorical columns are stored as enums and keep their values."""
+    csv_folder = synthetic_csv_folder
+    csv_table_mapping = {"olist_customers_dataset.csv": "olist_customers"}
+
+    customers = synthetic_dataframes["olist_customers"]
+    assert customers["customer_state"].dtype == "category"
+
+    database = create_database_engine(str(tmp_path / "olist.duckdb"), "duckdb")
+    load_chunks(
+        iter_extract(
+            csv_folder, csv_table_mapping, public_holidays_url=None, chunk_size=250
+        ),
+        database,
+    )
+
+    column_types = read_sql("DESCRIBE olist_customers", database).set_index(
+        "column_name"
+    )["column_type"]
+    assert column_types["customer_state"].startswith("ENUM(")
+    assert column_types["customer_city"].startswith("ENUM(")
+    stored = read_sql(
+        "SELECT customer_city, customer_state FROM olist_customers", database
+    )
+    for column in ["customer_city", "customer_state"]:
+        assert stored[column].tolist() == customers[column].tolist()
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_has_stale_money_columns(tmp_path, backend, synthetic_dataframes):
+    """Test that a database storing the money as reais is told apart from one in cents."""
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    assert not has_stale_money_columns(database)
+
+    load(synthetic_dataframes, database)
+    assert not has_stale_money_columns(database)
+
+    payments = synthetic_dataframes["olist_order_payments"]
+    load(
+        {
+            "olist_order_payments": payments.assign(
+                payment_value=lambda rows: from_cents(rows["payment_value"])
+            )
+        },
+        database,
+    )
+    assert has_stale_money_columns(database)
@@ -0,0 +1,67 @@
+import json
+
+from pandas.testing import assert_frame_equal
+from sqlalchemy import text
+
+from src.database import create_database_engine
+from src.load import load
+from src.planner import get_query_plan
+from src.transform import get_query_implementations
+
+
+def load_synthetic_database(tmp_path, backend: str, dataframes):
+    engine = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load(dataframes=dataframes, database=engine)
+    return engine
+
+
+def test_implementations_return_the_same_result(
+    tmp_path, synthetic_dataframes_with_holidays
+):
+    """Test that the implementations of each query are interchangeable on both backends."""
+    for backend in ["sqlite", "duckdb"]:
+        engine = load_synthetic_database(
+            tmp_path, backend, synthetic_dataframes_with_holidays
+        )
+        for query_name, implementations in get_query_implementations().items():
+            results = [query(engine).result for query in implementations.values()]
+            for result in results[1:]:
+                assert_frame_equal(result, results[0], obj=query_name)
+        engine.dispose()
+
+
+def test_query_plan_is_persisted_per_fingerprint(
+    tmp_path, synthetic_dataframes_with_holidays
+):
+    """Test that the plan is reused until the data changes."""
+    engine = load_synthetic_database(
+        tmp_path, "sqlite", synthetic_dataframes_with_holidays
+    )
+    plan_path = str(tmp_path / "query_plan.json")
+
+    plan = get_query_plan(engine, plan_path)
+    assert plan.keys() == {
+        query_name
+        for query_name, implementations in get_query_implementations().items()
+        if len(implementations) > 1
+    }
+
+    # A persisted choice is trusted as long as the fingerprint matches
+    with open(plan_path) as file:
+        content = json.load(file)
+    (fingerprint,) = content["plans"]
+    forced = {query_name: "pandas" for query_name in plan}
+    content["plans"][fingerprint]["implementations"] = forced
+    with open(plan_path, "w") as file:
+        json.dump(content, file)
+    assert get_query_plan(engine, plan_path) == forced
+
+    with engine.begin() as connection:
+        connection.execute(
+            text("DELETE FROM olist_orders WHERE order_status = 'canceled'")
+        )
+    engine.dispose()
+
+    get_query_plan(engine, plan_path)
+    with open(plan_path) as file:
+        assert len(json.load(file)["plans"]) == 2
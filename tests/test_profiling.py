@@ -0,0 +1,35 @@
+from pandas import DataFrame
+
+from src.utils.profiling import (
+    format_memory_report,
+    get_dataframes_memory_mb,
+    measure_stage,
+)
+
+
+def test_measure_stage_traces_allocations():
+    """Test that traced stages report their peak and the lines that allocated."""
+    with measure_stage("allocate", trace_allocations=True) as stats:
+        blocks = [bytearray(1024 * 1024) for _ in range(8)]
+        stats.rows = len(blocks)
+
+    assert stats.traced_peak_mb >= 8
+    assert stats.top_allocations[0][0].startswith("tests/test_profiling.py:")
+
+    with measure_stage("untraced") as untraced:
+        pass
+    assert untraced.traced_peak_mb is None
+    assert untraced.top_allocations == []
+
+
+def test_get_dataframes_memory_mb():
+    """Test that tables are ranked by their deep memory usage."""
+    dataframes = {
+        "small": DataFrame({"value": [1, 2, 3]}),
+        "large": DataFrame({"text": ["x" * 1000] * 1000}),
+    }
+    memory = get_dataframes_memory_mb(dataframes)
+
+    assert list(memory) == ["large", "small"]
+    assert memory["large"] > 0.9
+    assert "large" in format_memory_report([], memory)
@@ -0,0 +1,139 @@
+import numpy as np
+from pandas.testing import assert_frame_equal
+from pytest import mark, raises
+
+from src.database import create_database_engine
+from src.incremental import ingest_batch
+from src.load import load
+from src.sketches import (
+    DELIVERY_PERCENTILES,
+    QuantileSketch,
+    build_delivery_sketches,
+    get_delivery_times,
+    has_delivery_sketches,
+    read_delivery_time_percentiles,
+)
+
+
+def assert_rank_error(values, estimates, quantiles, tolerance) -> None:
+    """Check that each estimate falls within tolerance of its quantile, in rank."""
+    values = np.sort(values)
+    for quantile, estimate in zip(quantiles, estimates):
+        low = np.searchsorted(values, estimate, side="left") / len(values)
+        high = np.searchsorted(values, estimate, side="right") / len(values)
+        assert low - tolerance <= quantile <= high + tolerance
+
+
+def test_quantile_sketch_accuracy():
+    """Test that the sketch stays small and estimates the tails within 1% of rank."""
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=2, sigma=0.6, size=200_000)
+    quantiles = [0.01, 0.1, 0.5, 0.9, 0.99, 0.999]
+
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 37):
+        sketch.add(chunk)
+
+    assert sketch.count == len(values)
+    assert len(sketch._means) <= 2 * sketch.compression
+    assert_rank_error(values, sketch.quantiles(quantiles), quantiles, 0.01)
+    assert sketch.quantiles([0, 1]).tolist() == [values.min(), values.max()]
+    assert np.isnan(QuantileSketch().quantiles([0.5])).all()
+
+
+def test_quantile_sketch_merge_and_serialization():
+    """Test that merged sketches summarize the union and survive a JSON round trip."""
+    rng = np.random.default_rng(1)
+    parts = [rng.exponential(scale, size=20_000) for scale in (1, 5, 20)]
+    quantiles = [0.5, 0.9, 0.99]
+
+    merged = QuantileSketch()
+    for part in parts:
+        sketch = QuantileSketch()
+        sketch.add(part)
+        merged.merge(QuantileSketch.from_json(sketch.to_json()))
+
+    values = np.concatenate(parts)
+    assert merged.count == len(values)
+    assert_rank_error(values, merged.quantiles(quantiles), quantiles, 0.01)
+
+    restored = QuantileSketch.from_json(merged.to_json())
+    np.testing.assert_array_equal(
+        restored.quantiles(quantiles), merged.quantiles(quantiles)
+    )
+
+
+@mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_delivery_time_percentiles(tmp_path, backend, synthetic_dataframes):
+    """Test the percentiles per state and month, and their update by ingest_batch."""
+    dataframes = synthetic_dataframes
+    orders = dataframes["olist_orders"]
+    held_out = orders.iloc[-60:]
+
+    database = create_database_engine(str(tmp_path / f"olist.{backend}"), backend)
+    load({**dataframes, "olist_orders": orders.iloc[:-60]}, database)
+    build_delivery_sketches(database, chunk_size=500)
+
+    # New orders are merged into the sketches, a changed order rebuilds them
+    ingest_batch({"olist_orders": held_out.iloc[:30]}, database)
+    ingest_batch({"olist_orders": held_out.iloc[30:]}, database)
+    delivered = orders[orders["order_status"] == "delivered"]
+    ingest_batch(
+        {"olist_orders": delivered.head(5).assign(order_status="canceled")}, database
+    )
+    orders = orders.set_index("order_id")
+    orders.loc[delivered.head(5)["order_id"], "order_status"] = "canceled"
+    current = {**dataframes, "olist_orders": orders.reset_index()}
+
+    delivery_times = get_delivery_times(current)
+    for dimension, column in (("state", "State"), ("month", "Month")):
+        result = read_delivery_time_percentiles(database, dimension)
+        groups = delivery_times.groupby(dimension)["days"]
+        assert result[column].tolist() == list(groups.groups)
+        for row, (_, days) in zip(result.itertuples(index=False), groups):
+            assert row.Orders == len(days)
+            # Within one value of the exact percentile, whatever the interpolation
+            assert_rank_error(
+                days.to_numpy(),
+                [row.p50, row.p90, row.p99],
+                DELIVERY_PERCENTILES,
+                1 / len(days) + 0.01,
+            )
+
+
+def test_reload_rebuilds_delivery_sketches(tmp_path, synthetic_dataframes):
+    """Test that reloading the orders builds the sketches again, and reading never builds them."""
+    dataframes = synthetic_dataframes
+
+    database = create_database_engine(str(tmp_path / "olist.db"), "sqlite")
+    load(dataframes, database)
+    assert not has_delivery_sketches(database)
+    missing = read_delivery_time_percentiles(database, "month")
+    assert missing.empty
+    assert missing.columns.tolist() == ["Month", "Orders", "p50", "p90", "p99"]
+    assert not has_delivery_sketches(database)
+
+    build_delivery_sketches(database)
+    first = read_delivery_time_percentiles(database, "month")
+    assert first.columns.tolist() == missing.columns.tolist()
+    assert not first.empty
+
+    load({"olist_sellers": dataframes["olist_sellers"]}, database)
+    assert has_delivery_sketches(database)
+
+    load({"olist_orders": dataframes["olist_orders"]}, database)
+    assert has_delivery_sketches(database)
+    assert_frame_equal(read_delivery_time_percentiles(database, "month"), first)
+
+    load(
+        {"olist_orders": dataframes["olist_orders"]},
+        database,
+        rebuild_materializations=False,
+    )
+    assert not has_delivery_sketches(database)
+    assert read_delivery_time_percentiles(database, "month").empty
+    build_delivery_sketches(database)
+    assert_frame_equal(read_delivery_time_percentiles(database, "month"), first)
+
+    with raises(ValueError):
+        read_delivery_time_percentiles(database, "seller")
@@ -0,0 +1,74 @@
+import numpy as np
+from pandas import DataFrame
+
+from src.spatial import (
+    ZipPrefixIndex,
+    get_freight_value_distance_relationship,
+    haversine_km,
+)
+
+
+def test_haversine_km():
+    """Test the distance between Sao Paulo and Rio de Janeiro and between identical points."""
+    distances = haversine_km(
+        np.array([-23.5505, -10.0]),
+        np.array([-46.6333, 20.0]),
+        np.array([-22.9068, -10.0]),
+        np.array([-43.1729, 20.0]),
+    )
+    assert abs(distances[0] - 361) < 2
+    assert distances[1] == 0
+
+
+def test_zip_prefix_index_lookup():
+    """Test that raw rows are averaged per prefix and unknown prefixes give NaN."""
+    index = ZipPrefixIndex.from_geolocation(
+        DataFrame(
+            {
+                "geolocation_zip_code_prefix": [3000, 1000, 1000],
+                "geolocation_lat": [-3.0, -1.0, -2.0],
+                "geolocation_lng": [3.0, 1.0, 2.0],
+            }
+        )
+    )
+    lat, lng = index.lookup(np.array([1000, 2000, 3000, 4000]))
+    np.testing.assert_array_equal(lat, [-1.5, np.nan, -3.0, np.nan])
+    np.testing.assert_array_equal(lng, [1.5, np.nan, 3.0, np.nan])
+
+
+def test_get_freight_value_distance_relationship():
+    """Test that the delivered items with known coordinates get their distance."""
+    orders = DataFrame(
+        {
+            "order_id": ["a", "b", "c"],
+            "customer_id": ["x", "y", "z"],
+            "order_status": ["delivered", "canceled", "delivered"],
+        }
+    )
+    items = DataFrame(
+        {
+            "order_id": ["c", "a", "b", "a"],
+            "seller_id": ["s1", "s1", "s1", "s2"],
+            # In cents, like extract returns them
+            "freight_value": [300, 100, 200, 400],
+        }
+    )
+    customers = DataFrame(
+        {"customer_id": ["x", "y", "z"], "customer_zip_code_prefix": [1, 1, 9]}
+    )
+    sellers = DataFrame({"seller_id": ["s1", "s2"], "seller_zip_code_prefix": [1, 2]})
+    geolocation = DataFrame(
+        {
+            "geolocation_zip_code_prefix": [1, 2],
+            "geolocation_lat": [0.0, 0.0],
+            "geolocation_lng": [0.0, 1.0],
+        }
+    )
+
+    result = get_freight_value_distance_relationship(
+        orders, items, customers, sellers, geolocation
+    )
+
+    # Order c has an unknown customer prefix and order b is not delivered
+    assert result["freight_value"].tolist() == [1.0, 4.0]
+    np.testing.assert_allclose(result["distance_km"], [0.0, 111.2], atol=0.1)
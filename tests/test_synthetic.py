@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from src.config import get_csv_to_table_mapping
+from src.extract import extract
+from src.synthetic import generate_dataset
+
+
+def test_generate_dataset(tmp_path):
+    """Test that the synthetic dataset has the real columns and consistent keys."""
+    csv_table_mapping = get_csv_to_table_mapping()
+    rows = generate_dataset(str(tmp_path), scale_factor=0.01, seed=7)
+    dataframes = extract(str(tmp_path), csv_table_mapping, public_holidays_url=None)
+
+    assert len(dataframes) == len(csv_table_mapping)
+    assert {table: len(dataframe) for table, dataframe in dataframes.items()} == rows
+    assert dataframes["olist_customers"].shape == (994, 5)
+    assert dataframes["olist_geolocation"].shape[1] == 5
+    assert dataframes["olist_order_items"].shape[1] == 7
+    assert dataframes["olist_order_payments"].shape[1] == 5
+    assert dataframes["olist_order_reviews"].shape[1] == 7
+    assert dataframes["olist_orders"].shape == (994, 8)
+    assert dataframes["olist_products"].shape == (330, 9)
+    assert dataframes["olist_sellers"].shape == (31, 4)
+    assert dataframes["product_category_name_translation"].shape == (71, 2)
+
+    orders = dataframes["olist_orders"]
+    items = dataframes["olist_order_items"]
+    assert orders["order_id"].is_unique
+    assert (
+        orders["customer_id"].isin(dataframes["olist_customers"]["customer_id"]).all()
+    )
+    assert items["order_id"].isin(orders["order_id"]).all()
+    assert items["product_id"].isin(dataframes["olist_products"]["product_id"]).all()
+    assert items["seller_id"].isin(dataframes["olist_sellers"]["seller_id"]).all()
+    assert dataframes["olist_order_payments"]["order_id"].isin(orders["order_id"]).all()
+
+
+def test_generate_dataset_is_deterministic(tmp_path):
+    """Test that a seed always gives the same files, whatever the chunk size."""
+    generate_dataset(str(tmp_path / "a"), scale_factor=0.01, seed=7)
+    generate_dataset(str(tmp_path / "b"), scale_factor=0.01, seed=7, chunk_size=97)
+
+    for csv_file in get_csv_to_table_mapping():
+        assert (
+            Path(tmp_path / "a" / csv_file).read_bytes()
+            == Path(tmp_path / "b" / csv_file).read_bytes()
+        )